@@ -19,7 +19,7 @@ Response, json, is_callable, log, log_dammit
 dist = pkg_resources.get_distribution('aspen')
 __version__ = dist.version
 WINDOWS = sys.platform[:3] == 'win'
-NETWORK_ENGINES = ['cheroot']
+NETWORK_ENGINES = ['cheroot', 'direct']
 
 for entrypoint in pkg_resources.iter_entry_points(group='aspen.network_engines'):
     NETWORK_ENGINES.append(entrypoint.name)
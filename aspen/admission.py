@@ -0,0 +1,118 @@
+"""Shed load with fast 503s, rather than queueing requests without bound.
+
+If website.max_concurrency or website.concurrency_limits is set, then
+Website.handle_safely admits each request to a Pool before handling it. A Pool
+has a fixed number of slots for requests in flight. A request counts against
+the pool for the longest matching prefix in concurrency_limits, or else against
+max_concurrency. When a pool is full we answer 503 with a Retry-After header
+straight away, so that when something downstream slows down, clients hear
+about it quickly and threads don't pile up behind it.
+
+If website.queue_target is set, a request that finds its pool full may wait a
+little for a slot, per CoDel: as long as the queue has drained at some point
+in the last INTERVAL, a request waits up to INTERVAL; once it hasn't, we're
+overloaded rather than bursting, and a request waits only up to queue_target.
+
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import threading
+import time
+
+
+INTERVAL = 0.1      # seconds; per CoDel
+RETRY_AFTER = 1     # seconds; what we tell clients we've turned away
+
+
+class Pool(object):
+    """Model a limited number of slots for requests in flight.
+    """
+
+    def __init__(self, limit, target=0, interval=INTERVAL):
+        """Takes a number of slots, and optionally CoDel parameters in seconds.
+        """
+        self.limit = limit
+        self.target = target
+        self.interval = interval
+        self.inflight = 0
+        self.waiting = 0
+        self.shed = 0
+        self.last_empty = time.time()   # the last time no one was waiting
+        self._cond = threading.Condition(threading.Lock())
+
+    def acquire(self):
+        """Take a slot and return True, or return False if there's no room.
+        """
+        with self._cond:
+            if self.inflight < self.limit:
+                self.inflight += 1
+                if not self.waiting:
+                    self.last_empty = time.time()
+                return True
+            if not self.target:
+                self.shed += 1
+                return False
+
+            now = time.time()
+            if now - self.last_empty > self.interval:
+                timeout = self.target   # standing queue; fail fast
+            else:
+                timeout = self.interval
+            deadline = now + timeout
+            self.waiting += 1
+            try:
+                while self.inflight >= self.limit:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        self.shed += 1
+                        return False
+                    self._cond.wait(remaining)
+                self.inflight += 1
+                return True
+            finally:
+                self.waiting -= 1
+                if not self.waiting:
+                    self.last_empty = time.time()
+
+    def release(self):
+        """Give back a slot from acquire.
+        """
+        with self._cond:
+            self.inflight -= 1
+            self._cond.notify()
+
+
+class Admission(object):
+    """Model a set of Pools, keyed by URL path prefix.
+    """
+
+    def __init__(self, limit, limits=(), target=0):
+        """Takes a default limit (0 for none), a list of (prefix, limit), and a
+        queue target in seconds.
+        """
+        self.default = Pool(limit, target) if limit else None
+        self.pools = [ (prefix, Pool(n, target))
+                       for prefix, n in sorted( limits
+                                              , key=lambda x: len(x[0])
+                                              , reverse=True
+                                               )
+                      ]
+
+    def pool_for(self, path):
+        """Given a raw URL path, return the Pool for it, or None.
+        """
+        for prefix, pool in self.pools:
+            if path.startswith(prefix):
+                return pool
+        return self.default
+
+    def items(self):
+        """Return a list of (prefix, Pool) tuples, with None for the default.
+        """
+        out = list(self.pools)
+        if self.default is not None:
+            out.append((None, self.default))
+        return out
@@ -35,6 +35,7 @@ KNOBS = \
     , 'network_address':    ( (('0.0.0.0', 8080), socket.AF_INET)
                             , parse.network_address
                              )
+    , 'network_fd':         (lambda: [], parse.file_descriptors)
     , 'project_root':       (None, parse.identity)
     , 'logging_threshold':  (0, int)
     , 'www_root':           (None, parse.identity)
@@ -42,22 +43,53 @@ KNOBS = \
 
     # Extended Options
     # 'name':               (default, from_unicode)
+    , 'access_log_sample':  (1.0, parse.sample_rate)
+    , 'backlog':            (socket.SOMAXCONN, parse.positive_int)
     , 'changes_reload':     (False, parse.yes_no)
     , 'charset_dynamic':    ('UTF-8', parse.charset)
     , 'charset_static':     (None, parse.charset)
+    , 'collect_metrics':    (True, parse.yes_no)
+    , 'compression':        (False, parse.yes_no)
+    , 'compression_level':  (6, parse.compression_level)
+    , 'compression_min_size': (1024, parse.non_negative_int)
+    , 'concurrency_limits': (lambda: [], parse.concurrency_limits)
+    , 'drain_timeout':      (5, parse.seconds)
     , 'indices':            ( lambda: ['index.html', 'index.json', 'index'] +
                                       ['index.html.spt', 'index.json.spt', 'index.spt']
                             , parse.list_
                              )
+    , 'instrument_hooks':   (False, parse.yes_no)
+    , 'keep_alive_requests': (0, parse.non_negative_int)
     , 'list_directories':   (False, parse.yes_no)
+    , 'max_body_size':      (10485760, parse.non_negative_int)
+    , 'max_concurrency':    (0, parse.non_negative_int)
+    , 'max_requests':       (0, parse.non_negative_int)
+    , 'max_requests_jitter': (0, parse.non_negative_int)
+    , 'max_rss':            (0, parse.non_negative_int)
+    , 'max_threads':        (0, parse.non_negative_int)
     , 'media_type_default': ('text/plain', parse.media_type)
     , 'media_type_json':    ('application/json', parse.media_type)
+    , 'metrics_path':       (None, parse.url_path)
+    , 'profiling_secret':   (None, parse.identity)
+    , 'queue_target':       (0, parse.seconds)
     , 'renderer_default':   ('stdlib_percent', parse.renderer)
+    , 'request_timeout':    (0, parse.seconds)
+    , 'request_timeouts':   (lambda: [], parse.request_timeouts)
+    , 'reuse_port':         (False, parse.reuse_port)
     , 'show_tracebacks':    (False, parse.yes_no)
+    , 'slow_request_threshold': (0, parse.seconds)
+    , 'socket_timeout':     (10, parse.seconds)
+    , 'threads':            (10, parse.positive_int)
+    , 'workers':            (0, parse.workers)
      }
 
 DEFAULT_CONFIG_FILE = 'configure-aspen.py'
 
+# Resolve this now: configure changes the working directory before it calls
+# mimetypes.init, and our __file__ may be relative to the one we started in.
+ASPENS_MIMETYPES = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                'mime.types')
+
 # Configurable
 # ============
 # Designed as a singleton.
@@ -135,8 +167,7 @@ class Configurable(object):
         # regardless of the user's configuration preferences
 
         # mimetypes
-        aspens_mimetypes = os.path.join(os.path.dirname(__file__), 'mime.types')
-        mimetypes.knownfiles += [aspens_mimetypes]
+        mimetypes.knownfiles += [ASPENS_MIMETYPES]
         # mimetypes.init is called below after the user has a turn.
 
         # XXX register codecs here
@@ -287,9 +318,12 @@ class Configurable(object):
         # network_engine
 
         ## Load modules
+        ## Only load the one we want, since the others may need packages that
+        ## aren't installed.
         ENGINES = {}
         for entrypoint in pkg_resources.iter_entry_points(group='aspen.network_engines'):
-            ENGINES[entrypoint.name] = entrypoint.load()
+            if entrypoint.name == self.network_engine:
+                ENGINES[entrypoint.name] = entrypoint.load()
         
         if self.network_engine in ENGINES:
             # found in a module
@@ -317,6 +351,8 @@ class Configurable(object):
             self.network_port = self.network_address[1]
         else:
             self.network_port = None
+        self.network_socket = None  # set to a listening socket to serve on it
+        self.extra_sockets = []     # more listening sockets to serve on
 
         # hooks
         self.hooks = Hooks()
@@ -328,6 +364,8 @@ class Configurable(object):
         self.hooks.error_late = []
         self.hooks.outbound = []
         self.hooks.shutdown = []
+        if self.instrument_hooks:
+            self.hooks.instrument()
 
 
         # Set up core logic as hooks.
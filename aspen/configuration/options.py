@@ -4,6 +4,7 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import optparse
+import socket
 
 import aspen
 
@@ -54,6 +55,13 @@ def OptionParser():
                             "[0.0.0.0:8080]")
                     , default=DEFAULT
                      )
+    basic.add_option( "--network_fd"
+                    , help=("a comma-separated list of file descriptors of "
+                            "listening sockets to serve on, instead of "
+                            "binding to --network_address; systemd socket "
+                            "activation (LISTEN_FDS) does this for you []")
+                    , default=DEFAULT
+                     )
     basic.add_option( "-e", "--network_engine"
                     , help=( "the HTTP engine to use, one of "
                            + "{%s}" % ','.join(aspen.NETWORK_ENGINES)
@@ -84,6 +92,19 @@ def OptionParser():
                                      "often configured from the command "
                                      "line. But who knows?"
                                     )
+    extended.add_option( "--access_log_sample"
+                       , help=("the fraction of non-error responses to "
+                               "include in the access log, from 0 to 1; "
+                               "errors (4xx and 5xx) are always logged [1]")
+                       , default=DEFAULT
+                        )
+    extended.add_option( "--backlog"
+                       , help=("how many connections may wait to be accepted "
+                               "before the kernel starts refusing them (this "
+                               "is cheroot's request_queue_size) [%d]"
+                               % socket.SOMAXCONN)
+                       , default=DEFAULT
+                        )
     extended.add_option( "--changes_reload"
                        , help=("if set to yes/true/1, changes to configuration"
                                " files and Python modules will cause aspen to "
@@ -105,6 +126,41 @@ def OptionParser():
                                "just leave this unset []")
                        , default=DEFAULT
                         )
+    extended.add_option( "--collect_metrics"
+                       , help=("if set to {yes,true,1}, aspen will keep "
+                               "per-resource request counts and latency "
+                               "histograms in website.metrics [yes]")
+                       , default=DEFAULT
+                        )
+    extended.add_option( "--compression"
+                       , help=("if set to {yes,true,1}, dynamic and static "
+                               "responses will be compressed with gzip or "
+                               "deflate, per the request's Accept-Encoding "
+                               "header [no]")
+                       , default=DEFAULT
+                        )
+    extended.add_option( "--compression_level"
+                       , help=("the zlib compression level to use, from 1 "
+                               "(fastest) to 9 (smallest) [6]")
+                       , default=DEFAULT
+                        )
+    extended.add_option( "--compression_min_size"
+                       , help=("responses with string bodies smaller than "
+                               "this many bytes won't be compressed [1024]")
+                       , default=DEFAULT
+                        )
+    extended.add_option( "--concurrency_limits"
+                       , help=("a comma-separated list of /prefix=n; at most "
+                               "n requests under each URL path prefix are "
+                               "handled at once, and the rest get 503 []")
+                       , default=DEFAULT
+                        )
+    extended.add_option( "--drain_timeout"
+                       , help=("when stopping or reloading, wait this many "
+                               "seconds for in-flight requests to finish "
+                               "before closing their connections [5]")
+                       , default=DEFAULT
+                        )
     extended.add_option( "--indices"
                        , help=("a comma-separated list of filenames to look "
                                "for when a directory is requested directly; "
@@ -113,12 +169,62 @@ def OptionParser():
                                "[index.html, index.json]")
                        , default=DEFAULT
                         )
+    extended.add_option( "--instrument_hooks"
+                       , help=("if set to {yes,true,1}, aspen will record call "
+                               "counts and latencies for each hook in "
+                               "website.hooks.timings [no]")
+                       , default=DEFAULT
+                        )
+    extended.add_option( "--keep_alive_requests"
+                       , help=("if set, close a keep-alive connection after "
+                               "serving this many requests on it [0]")
+                       , default=DEFAULT
+                        )
     extended.add_option( "--list_directories"
                        , help=("if set to {yes,true,1}, aspen will serve a "
                                "directory listing when no index is available "
                                "[no]")
                        , default=DEFAULT
                         )
+    extended.add_option( "--max_body_size"
+                       , help=("the largest request body, in bytes, that "
+                               "the asyncio and direct engines will buffer; "
+                               "they answer bigger ones with 413 (0 for no "
+                               "limit) [10485760]")
+                       , default=DEFAULT
+                        )
+    extended.add_option( "--max_concurrency"
+                       , help=("if set, handle at most this many requests at "
+                               "once (besides those under a prefix in "
+                               "--concurrency_limits), and answer the rest "
+                               "with 503 [0]")
+                       , default=DEFAULT
+                        )
+    extended.add_option( "--max_requests"
+                       , help=("if set, each worker process is replaced after "
+                               "serving about this many requests; only used "
+                               "with --workers [0]")
+                       , default=DEFAULT
+                        )
+    extended.add_option( "--max_requests_jitter"
+                       , help=("add a random number of requests up to this to "
+                               "each worker's max_requests, so that they "
+                               "aren't all replaced at once [0]")
+                       , default=DEFAULT
+                        )
+    extended.add_option( "--max_rss"
+                       , help=("if set, each worker process is replaced once "
+                               "its resident set grows past this many "
+                               "megabytes; only used with --workers [0]")
+                       , default=DEFAULT
+                        )
+    extended.add_option( "--max_threads"
+                       , help=("if more than --threads, cheroot's pool of "
+                               "worker threads grows up to this many while "
+                               "connections are waiting for one, and shrinks "
+                               "back when they're idle [0]")
+                       , default=DEFAULT
+                        )
     extended.add_option( "--media_type_default"
                        , help=("this is set as the Content-Type for resources "
                                "of otherwise unknown media type [text/plain]")
@@ -129,6 +235,27 @@ def OptionParser():
                                "resources [application/json]")
                        , default=DEFAULT
                         )
+    extended.add_option( "--metrics_path"
+                       , help=("if set, aspen will serve metrics in the "
+                               "Prometheus text format at this URL path, "
+                               "e.g., /metrics, bypassing hooks and "
+                               "simplates []")
+                       , default=DEFAULT
+                        )
+    extended.add_option( "--profiling_secret"
+                       , help=("if set, requests with an X-Aspen-Profile "
+                               "header or aspen_profile querystring "
+                               "parameter signed with this secret will be "
+                               "profiled; see aspen.profiling []")
+                       , default=DEFAULT
+                        )
+    extended.add_option( "--queue_target"
+                       , help=("if set, a request over a concurrency limit "
+                               "may wait for a slot, for up to this many "
+                               "seconds once a queue builds up (per CoDel), "
+                               "before getting a 503 [0]")
+                       , default=DEFAULT
+                        )
     extended.add_option( "--renderer_default"
                     , help=( "the renderer to use by default; one of "
                            + "{%s}" % ','.join(aspen.RENDERERS)
@@ -136,11 +263,56 @@ def OptionParser():
                             )
                     , default=DEFAULT
                      )
+    extended.add_option( "--request_timeout"
+                       , help=("if set, give each request this many seconds "
+                               "(besides those under a prefix in "
+                               "--request_timeouts), and answer 503 once "
+                               "it's out of time [0]")
+                       , default=DEFAULT
+                        )
+    extended.add_option( "--request_timeouts"
+                       , help=("a comma-separated list of /prefix=seconds; "
+                               "requests under each URL path prefix get that "
+                               "long before we answer 503, and 0 means no "
+                               "deadline []")
+                       , default=DEFAULT
+                        )
+    extended.add_option( "--reuse_port"
+                       , help=("if set to {yes,true,1}, each worker process "
+                               "binds its own socket with SO_REUSEPORT, and "
+                               "the kernel balances connections among them; "
+                               "only used with --workers [no]")
+                       , default=DEFAULT
+                        )
     extended.add_option( "--show_tracebacks"
                        , help=("if set to {yes,true,1}, 500s will have a "
                                "traceback in the browser [no]")
                        , default=DEFAULT
                         )
+    extended.add_option( "--slow_request_threshold"
+                       , help=("if set to a number of seconds, aspen will log "
+                               "the stack of any request that runs longer "
+                               "than that, and again each time that much more "
+                               "time passes; 0 turns this off [0]")
+                       , default=DEFAULT
+                        )
+    extended.add_option( "--socket_timeout"
+                       , help=("close a connection after this many seconds "
+                               "without hearing from the client [10]")
+                       , default=DEFAULT
+                        )
+    extended.add_option( "--threads"
+                       , help=("the number of worker threads that serve "
+                               "connections [10]")
+                       , default=DEFAULT
+                        )
+    extended.add_option( "--workers"
+                       , help=("if set to a number, aspen will fork that many "
+                               "worker processes to serve the website, "
+                               "supervised by a master process; 0 serves "
+                               "from a single process [0]")
+                       , default=DEFAULT
+                        )
 
 
     optparser.add_option_group(basic)
@@ -40,6 +40,86 @@ def yes_no(s):
         return False
     raise ValueError("must be either yes/true/1 or no/false/0")
 
+def compression_level(value):
+    level = int(value)
+    if not 1 <= level <= 9:
+        raise ValueError("must be an integer from 1 to 9")
+    return level
+
+def non_negative_int(value):
+    number = int(value)
+    if number < 0:
+        raise ValueError("must be a non-negative integer")
+    return number
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise ValueError("must be a positive integer")
+    return number
+
+def workers(value):
+    number = non_negative_int(value)
+    if number and aspen.WINDOWS:
+        raise ValueError("can't fork worker processes on Windows")
+    return number
+
+def reuse_port(value):
+    from aspen.network_engines import SO_REUSEPORT
+    reuse = yes_no(value)
+    if reuse and SO_REUSEPORT is None:
+        raise ValueError("SO_REUSEPORT isn't available on this platform")
+    return reuse
+
+def sample_rate(value):
+    rate = float(value)
+    if not 0.0 <= rate <= 1.0:
+        raise ValueError("must be a number from 0 to 1")
+    return rate
+
+def seconds(value):
+    seconds = float(value)
+    if seconds < 0:
+        raise ValueError("must be a non-negative number of seconds")
+    return seconds
+
+def url_path(value):
+    typecheck(value, unicode)
+    if not value.startswith('/'):
+        raise ValueError("must start with /")
+    return value.encode('US-ASCII')
+
+def by_prefix(value, parse_one, name):
+    """Given a string like /api/=20,/search=5, return a list of (prefix, n).
+
+    Each n is parsed with parse_one, and name is what to call it in errors.
+
+    """
+    typecheck(value, unicode)
+    out = []
+    for item in value.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        prefix, equals, n = item.rpartition('=')
+        if not equals or not prefix.startswith('/'):
+            raise ValueError("must be a comma-separated list of /prefix=%s"
+                             % name)
+        out.append((prefix.encode('US-ASCII'), parse_one(n)))
+    return out
+
+def concurrency_limits(value):
+    return by_prefix(value, positive_int, 'limit')
+
+def request_timeouts(value):
+    return by_prefix(value, seconds, 'seconds')
+
+def file_descriptors(value):
+    """Given a string like 3,4, return a list of ints.
+    """
+    typecheck(value, unicode)
+    return [non_negative_int(fd) for fd in value.split(',') if fd.strip()]
+
 def list_(value):
     """Return a tuple of (bool, list).
 
@@ -4,29 +4,42 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 
+# http://www.w3.org/Protocols/rfc2616/rfc2616-sec9.html
+METHODS = [ 'OPTIONS', 'GET', 'HEAD', 'POST', 'PUT', 'DELETE', 'TRACE'
+          , 'CONNECT'
+           ]
+
+# Precompute the method flags for each standard method, so that populating a
+# context is a single dict.update instead of a loop of writes.
+FLAGS = dict((m, dict((n, n == m) for n in METHODS)) for m in METHODS)
+NO_FLAGS = dict((n, False) for n in METHODS)
+
+
 class Context(dict):
     """Model the execution context for a Resource.
+
+    We only build one of these when something actually asks for
+    request.context, which is to say dynamic resources and any hooks that use
+    it. Static resources never pay for it.
+
     """
 
     def __init__(self, request):
         """Takes a Request object.
         """
-        self.website    = None # set in dynamic_resource.py
-        self.body       = request.body
-        self.headers    = request.headers
-        self.cookie     = request.headers.cookie
-        self.path       = request.line.uri.path
-        self.qs         = request.line.uri.querystring
-        self.request    = request
-        self.socket     = None
-        self.channel    = None
-        self.context    = self
-
-        # http://www.w3.org/Protocols/rfc2616/rfc2616-sec9.html
-        for method in ['OPTIONS', 'GET', 'HEAD', 'POST', 'PUT', 'DELETE',
-                       'TRACE', 'CONNECT']:
-            self[method] = (method == request.line.method)
-            setattr(self, method, self[method])
+        dict.__init__( self
+                     , website  = None # set in dynamic_resource.py
+                     , body     = request.body
+                     , headers  = request.headers
+                     , cookie   = request.headers.cookie
+                     , path     = request.line.uri.path
+                     , qs       = request.line.uri.querystring
+                     , request  = request
+                     , socket   = None
+                     , channel  = None
+                      )
+        self['context'] = self
+        self.update(FLAGS.get(request.line.method, NO_FLAGS))
 
     def __getattr__(self, name):
         try:
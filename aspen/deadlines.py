@@ -0,0 +1,64 @@
+"""Give each request a time budget, and answer 503 once it's spent.
+
+If website.request_timeout or website.request_timeouts is set, then
+Website.handle_safely stamps each request with a deadline, as a timestamp at
+request.context['deadline']. A request gets the timeout for the longest
+matching prefix in request_timeouts, or else request_timeout. Hooks and
+simplates can call request.deadline_remaining() to see how many seconds they
+have left, and pass that along to anything downstream that takes a timeout.
+
+We can't interrupt a thread, so under threaded engines we enforce the deadline
+between stages of the pipeline: before and after each list of inbound hooks
+(dispatch happens in inbound_core), and before page two and rendering. If the
+deadline has passed, we raise Response(503), which is handled like any other
+error. A stage that's already running gets to finish. Under gevent we can do
+better, and the engine raises Response(503) wherever the request next yields
+(see Engine.start_timeout).
+
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import time
+
+from aspen import Response
+
+
+class Deadlines(object):
+    """Model request timeouts, keyed by URL path prefix.
+    """
+
+    def __init__(self, timeout, timeouts=()):
+        """Takes a default timeout in seconds (0 for none), and a list of
+        (prefix, seconds). A prefix with 0 seconds has no deadline, even if
+        there's a default.
+        """
+        self.default = timeout or None
+        timeouts = [(prefix, seconds or None) for prefix, seconds in timeouts]
+        self.timeouts = sorted(timeouts, key=lambda x: len(x[0]), reverse=True)
+
+    def timeout_for(self, path):
+        """Given a raw URL path, return a timeout in seconds, or None.
+        """
+        for prefix, timeout in self.timeouts:
+            if path.startswith(prefix):
+                return timeout
+        return self.default
+
+    def stamp(self, request):
+        """Given a Request, set its deadline, starting now.
+        """
+        timeout = self.timeout_for(request.line.uri.path.raw)
+        if timeout is not None:
+            request.context['deadline'] = time.time() + timeout
+
+
+def check(request, stage):
+    """Given a Request and a description of where we are, raise 503 if the
+    request is out of time.
+    """
+    remaining = request.deadline_remaining()
+    if remaining is not None and remaining <= 0:
+        raise Response(503, "Request deadline exceeded %s." % stage)
@@ -3,9 +3,19 @@
 When files change on the filesystem or we receive HUP, we want to re-execute
 ourselves.
 
-For thoughts on a more sophisticated approach, see:
-
-    http://sync.in/aspen-reloading
+We don't want to drop connections while we do it, though. So the listening
+sockets are handed across the exec (see hand_off and inherited_sockets): the
+kernel keeps queueing connections on them while we restart, and the new
+process picks up where we left off. In a single process, graceful stops accepting and
+drains in-flight requests before re-executing. Under aspen.prefork the master
+re-executes while the old workers keep serving, and stops them once it has
+started new ones.
+
+The listening sockets needn't be ours to begin with, either. Under systemd's
+socket activation (see activated_fds), or with website.network_fd, we serve on
+sockets someone else opened, and hand those across the exec in just the same
+way. Then restarts never refuse connections, and one process can serve on
+several sockets, say a public port and an admin Unix socket.
 
 """
 from __future__ import absolute_import
@@ -14,13 +24,26 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import os
+import signal
+import socket
 import sys
+import threading
+import traceback
 
 import aspen
 
 
 extras = set()
 mtimes = {}
+listeners = []      # listening sockets to hand to our next incarnation
+
+INHERITED_FDS = str('ASPEN_INHERITED_FDS')  # environment variables for the
+DRAIN_PIDS = str('ASPEN_DRAIN_PIDS')        # hand-off
+
+LISTEN_FDS = str('LISTEN_FDS')              # per systemd's sd_listen_fds(3)
+LISTEN_PID = str('LISTEN_PID')
+LISTEN_FDNAMES = str('LISTEN_FDNAMES')
+SD_LISTEN_FDS_START = 3
 
 
 ###############################################################################
@@ -59,6 +82,7 @@ def _do_execv():
     """
     args = sys.argv[:]
     aspen.log_dammit("Re-executing %s." % ' '.join(args))
+    aspen.logging.flush()   # atexit won't run for us
 
     if sys.platform[:4] == 'java':
         from _systemrestart import SystemRestart
@@ -71,6 +95,14 @@ def _do_execv():
         os.chdir(_startup_cwd)
         if max_cloexec_files:
             _set_cloexec()
+        if listeners and not aspen.WINDOWS:
+            fds = []
+            for sock in listeners:
+                fd = sock.fileno()
+                flags = fcntl.fcntl(fd, fcntl.F_GETFD)
+                fcntl.fcntl(fd, fcntl.F_SETFD, flags & ~fcntl.FD_CLOEXEC)
+                fds.append(str(fd))
+            os.environ[INHERITED_FDS] = str(','.join(fds))
         os.execv(sys.executable, args)
 
 
@@ -156,9 +188,111 @@ def check_all():
 # Setup
 # =====
 
-def install(website):
-    """Given a Website instance, start a loop over check_all.
+def hand_off(*socks):
+    """Given listening sockets, arrange to pass them on when we re-execute.
+
+    We keep duplicates, so that they stay open even after the network engine
+    closes its own when it stops. The first socket is the one for
+    website.network_address, and the rest are website.extra_sockets.
+
+    """
+    global listeners
+    listeners = [socket.fromfd(sock.fileno(), sock.family, sock.type)
+                 for sock in socks]
+
+def inherited_sockets():
+    """Return a list of the listening sockets handed to us, maybe empty.
+    """
+    fds = os.environ.pop(INHERITED_FDS, '')
+    return adopt([int(fd) for fd in fds.split(',') if fd])
+
+def activated_fds():
+    """Return a list of descriptors passed to us per systemd's socket
+    activation protocol, maybe empty.
+
+    We clear the environment variables, so that our children don't think
+    they're meant for them.
+
+    """
+    nfds = os.environ.pop(LISTEN_FDS, None)
+    pid = os.environ.pop(LISTEN_PID, None)
+    os.environ.pop(LISTEN_FDNAMES, None)
+    if nfds is None or pid is None or int(pid) != os.getpid():
+        return []
+    return range(SD_LISTEN_FDS_START, SD_LISTEN_FDS_START + int(nfds))
+
+def adopt(fds):
+    """Given a list of descriptors for listening sockets, return sockets.
+
+    The sockets have descriptors of their own, so we close the ones we're
+    given.
+
+    """
+    sockets = []
+    for fd in fds:
+        sockets.append(from_fd(fd))
+        os.close(fd)
+    return sockets
+
+def from_fd(fd):
+    """Given a descriptor for a listening socket, return a socket object.
+
+    We can't ask Python 2 what family the socket is, but we can look at its
+    address. We ask as if it were AF_UNIX, which has the roomiest addresses.
+
+    """
+    probe = socket.fromfd(fd, getattr(socket, 'AF_UNIX', socket.AF_INET6),
+                          socket.SOCK_STREAM)
+    try:
+        name = probe.getsockname()
+    finally:
+        probe.close()
+    if isinstance(name, basestring):
+        family = socket.AF_UNIX
+    elif len(name) == 4:
+        family = socket.AF_INET6
+    else:
+        family = socket.AF_INET
+    # On Python 2, fromfd gives us a bare _socket.socket, whose makefile is a
+    # stdio file that can't cope with a timeout. Wrap it like any other.
+    sock = socket.socket(_sock=socket.fromfd(fd, family, socket.SOCK_STREAM))
+    sock.setblocking(True)  # it may have been non-blocking in a past life
+    return sock
+
+def graceful(website):
+    """Given a Website, return a replacement for execute that drains it first.
+
+    Only the main thread re-executes: if the checker thread notices a change,
+    it sends us HUP. Otherwise the main thread would return from website.start
+    once the engine stops, and exit out from under us.
+
+    """
+    state = {'requested': False, 'draining': False}
+    def execute():
+        if threading.current_thread().name != 'MainThread':
+            if not state['requested']:
+                state['requested'] = True
+                os.kill(os.getpid(), signal.SIGHUP)
+            return
+        if state['draining']:
+            return
+        state['draining'] = True
+        aspen.log_dammit("Draining requests before re-executing.")
+        try:
+            website.stop()
+        except:
+            aspen.log_dammit(traceback.format_exc())
+        _do_execv()
+    return execute
+
+def install_extras(website):
+    """Given a Website instance, watch its configuration scripts for changes.
     """
     for script_path in website.configuration_scripts:
         if_changes(script_path)
+
+def install(website):
+    """Given a Website instance, start a loop over check_all.
+    """
+    install_extras(website)
     website.network_engine.start_checking(check_all)
@@ -5,6 +5,9 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import time
+
+from aspen.metrics import Histogram
 
 
 class Hooks(object):
@@ -15,11 +18,121 @@ class Hooks(object):
     >>> hooks.run('point_a', thing)
     ...
 
+    Lists assigned to a Hooks object are wrapped in a HookList, which compiles
+    itself to a single function the first time it's run, and again after it's
+    mutated. Call instrument to start timing each hook; the results are in
+    self.timings, a dict of (hook name, function name) to Histogram.
+
     """
 
+    timings = None
+
+    def __setattr__(self, name, value):
+        if isinstance(value, (list, tuple)) and name != 'timings':
+            value = HookList(value, name, self)
+        object.__setattr__(self, name, value)
+
     def run(self, hook_name, thing):
         """Takes an attribute name and a request/response/website.
         """
-        for func in getattr(self, hook_name, []):
-            thing = func(thing) or thing
-        return thing
+        hooks = self.__dict__.get(hook_name)
+        if hooks is None:
+            return thing
+        run = hooks._run                        # inlined HookList.run
+        if run is None:
+            run = hooks._run = hooks.compile()
+        return run(thing)
+
+    def instrument(self):
+        """Start recording call counts and latencies for each hook.
+        """
+        if self.timings is None:
+            object.__setattr__(self, 'timings', {})
+            for value in self.__dict__.values():
+                if isinstance(value, HookList):
+                    value.invalidate()
+
+
+def mutates(name):
+    """Given the name of a list method, return an override that invalidates.
+    """
+    method = getattr(list, name)
+    def mutate(self, *a, **kw):
+        self._run = None
+        return method(self, *a, **kw)
+    mutate.__name__ = str(name)
+    return mutate
+
+
+class HookList(list):
+    """Model a list of hook functions that knows how to compile itself.
+    """
+
+    def __init__(self, funcs=(), name='', hooks=None):
+        list.__init__(self, funcs)
+        self.name = name
+        self.hooks = hooks
+        self._run = None
+
+    def invalidate(self):
+        self._run = None
+
+    def run(self, thing):
+        """Takes a request/response/website and runs it through each hook.
+        """
+        run = self._run
+        if run is None:
+            run = self._run = self.compile()
+        return run(thing)
+
+    def compile(self):
+        """Return a function that calls each of our hooks in turn.
+
+        The loop is unrolled, with the functions bound as default arguments so
+        that calling each one is a local lookup.
+
+        """
+        funcs = list(self)
+        timings = self.hooks.timings if self.hooks is not None else None
+        if timings is not None:
+            funcs = [timed(func, self.name, timings) for func in funcs]
+        if not funcs:
+            return lambda thing: thing
+
+        names = ['f%d' % i for i in range(len(funcs))]
+        source = ["def run(thing, %s):" % ', '.join('%s=%s' % (n, n)
+                                                    for n in names)]
+        source += ["    thing = %s(thing) or thing" % n for n in names]
+        source += ["    return thing"]
+        namespace = dict(zip(names, funcs))
+        exec compile('\n'.join(source), '<hooks.%s>' % self.name, 'exec') \
+                                                                    in namespace
+        return namespace['run']
+
+
+for name in ( '__setitem__', '__delitem__', '__setslice__', '__delslice__'
+            , '__iadd__', '__imul__', 'append', 'extend', 'insert', 'pop'
+            , 'remove', 'reverse', 'sort'
+             ):
+    setattr(HookList, name, mutates(name))
+del name
+
+
+def timed(func, hook_name, timings):
+    """Given a hook function, a hook name, and a dict, return a wrapper.
+    """
+    name = '%s.%s' % ( getattr(func, '__module__', None) or '?'
+                     , getattr(func, '__name__', None) or repr(func)
+                      )
+    histogram = timings.get((hook_name, name))
+    if histogram is None:
+        histogram = timings[(hook_name, name)] = Histogram()
+    record = histogram.record
+    clock = time.time
+    def wrapper(thing):
+        start = clock()
+        try:
+            return func(thing)
+        finally:
+            record(clock() - start)
+    return wrapper
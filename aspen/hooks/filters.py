@@ -19,7 +19,7 @@ def by_regex(hook, regex_tuples, default=True):
                            for regex, disposition in regex_tuples.iteritems() ]
     def filtered_hook(request):
         for regex, disposition in regex_res:
-            if regex.matches(request.line.uri):
+            if regex.match(request.line.uri):
                 if disposition:
                     return hook(request)
                 else:
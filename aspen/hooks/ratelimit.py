@@ -0,0 +1,182 @@
+"""Limit the rate of requests per client, in process, with token buckets.
+
+Each client gets a bucket that holds up to burst tokens, and refills at rate
+tokens per second. A request takes a token, and if there isn't one we raise a
+429. Install the hook in inbound_early, and use a filter to apply it to less
+than all requests:
+
+    from aspen.hooks.filters import by_regex
+    from aspen.hooks.ratelimit import by_header, token_bucket
+
+    limit = token_bucket(rate=5, burst=20, key=by_header('X-Api-Key'))
+    website.hooks.inbound_early.append(by_regex(limit, {'^/search': True},
+                                                default=False))
+
+Buckets live in a bounded table, split into shards that each have their own
+lock. We only refill a bucket when its client comes back, and when a shard is
+full we drop the bucket that's gone unused the longest. A full bucket is no
+different from a missing one, so that's only lossy under a flood of clients;
+size the table for the clients you expect.
+
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import itertools
+import math
+import threading
+import time
+from collections import deque
+
+from aspen import Response
+
+
+SIZE = 10000        # how many clients to keep track of
+SHARDS = 16
+
+
+# Keys
+# ====
+# A key function takes a request and returns a key for its client's bucket,
+# or None to let the request through without counting it.
+
+def by_ip(request):
+    """Key on the IP address of the client at the other end of the socket.
+    """
+    return request.remote_addr
+
+def by_forwarded_ip(request):
+    """Key on the IP address our proxy saw, per X-Forwarded-For.
+
+    That's the last address in the header: any before it came from the client,
+    and can't be trusted. Only use this behind a proxy that sets the header.
+
+    """
+    forwarded = request.headers.get('X-Forwarded-For')
+    if forwarded is None:
+        return request.remote_addr
+    return forwarded.split(b',')[-1].strip()
+
+def by_user(request):
+    """Key on request.context['user'] (see aspen.auth), skipping anonymous users.
+    """
+    user = request.context.get('user')
+    if user is None or user.ANON:
+        return None
+    return user.token
+
+def by_header(name):
+    """Given a header name (an API key, say), return a key function for it.
+    """
+    def by_header(request):
+        return request.headers.get(name)
+    return by_header
+
+
+# Buckets
+# =======
+
+class Buckets(object):
+    """Model a bounded, sharded table of token buckets.
+
+    Each shard is a lock, a dict of key => (tokens, last seen, tick), and a
+    queue of (tick, key) in the order we took from them. A key that comes back
+    leaves a stale entry in the queue, which we skip when we evict, and drop
+    when the queue gets long.
+
+    """
+
+    def __init__(self, rate, burst, size=SIZE, shards=SHARDS):
+        """Takes tokens per second, bucket size, table size, and shard count.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.capacity = max(size // shards, 1)
+        self.shards = [(threading.Lock(), {}, deque()) for i in range(shards)]
+        self.ticks = itertools.count()
+
+    def take(self, key):
+        """Given a key, take a token from its bucket.
+
+        Return a tuple: whether we got one, how many tokens are left, and how
+        many seconds until the next one.
+
+        """
+        now = time.time()
+        lock, table, queue = self.shards[hash(key) % len(self.shards)]
+        with lock:
+            bucket = table.get(key)
+            if bucket is None:
+                tokens = self.burst
+            else:
+                tokens, then, tick = bucket
+                tokens = min(self.burst, tokens + (now - then) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            tick = next(self.ticks)
+            table[key] = (tokens, now, tick)
+            queue.append((tick, key))
+            if len(table) > self.capacity:
+                evict(table, queue)
+            elif len(queue) > 2 * self.capacity:
+                compact(table, queue)
+        wait = 0 if tokens >= 1 else (1 - tokens) / self.rate
+        return allowed, tokens, wait
+
+    def __len__(self):
+        return sum(len(table) for lock, table, queue in self.shards)
+
+
+def evict(table, queue):
+    """Given a shard's table and queue, drop its least recently used bucket.
+    """
+    while queue:
+        tick, key = queue.popleft()
+        bucket = table.get(key)
+        if bucket is not None and bucket[2] == tick:
+            del table[key]
+            return
+
+def compact(table, queue):
+    """Given a shard's table and queue, drop the stale entries from the queue.
+    """
+    queue.clear()
+    queue.extend(sorted((tick, key) for key, (tokens, then, tick)
+                                    in table.iteritems()))
+
+
+# Hook
+# ====
+
+def token_bucket(rate, burst=None, key=by_ip, size=SIZE, shards=SHARDS):
+    """Return an inbound hook that limits each client to rate requests/second.
+
+    Clients may burst up to burst requests (rate, by default) before that
+    kicks in. The key function (by_ip, by default) picks the client's bucket.
+
+    """
+    if rate <= 0:
+        raise ValueError("rate must be positive, not %r" % rate)
+    if burst is None:
+        burst = max(rate, 1)
+    buckets = Buckets(rate, burst, size, shards)
+
+    def rate_limited(request):
+        client = key(request)
+        if client is None:
+            return request
+        allowed, tokens, wait = buckets.take(client)
+        if not allowed:
+            seconds = str(int(math.ceil(wait)))
+            raise Response(429, headers={ 'Retry-After': seconds
+                                        , 'RateLimit-Limit': str(int(burst))
+                                        , 'RateLimit-Remaining': '0'
+                                        , 'RateLimit-Reset': seconds
+                                         })
+        return request
+
+    rate_limited.buckets = buckets
+    return rate_limited
@@ -39,6 +39,7 @@ status_strings = {
     415 : "Unsupported Media Type",
     416 : "Requested range not satisfiable",
     417 : "Expectation Failed",
+    429 : "Too Many Requests",
     500 : "Internal Server Error",
     501 : "Not Implemented",
     502 : "Bad Gateway",
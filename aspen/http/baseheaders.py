@@ -17,10 +17,15 @@ class BaseHeaders(CaseInsensitiveMapping):
        has good notes on why we do everything as pure bytes here
     """
 
+    __slots__ = ['_cookie']
+
     def __init__(self, d):
         """Takes headers as a dict or str.
         """
         typecheck(d, (dict, str))
+        self._cookie = None
+        if not d:
+            return  # nothing to parse, e.g. for a new Response
         if isinstance(d, str):
             def genheaders():
                 for line in d.splitlines():
@@ -31,14 +36,28 @@ class BaseHeaders(CaseInsensitiveMapping):
         CaseInsensitiveMapping.__init__(self, genheaders)
 
 
-        # Cookie
-        # ======
+    # Cookie
+    # ======
+    # SimpleCookie parsing is regex-heavy, and most requests and responses
+    # never look at cookies, so we only parse the Cookie header on demand.
+
+    def cookie(self):
+        """Lazily parse the Cookie header into a SimpleCookie.
+        """
+        if self._cookie is None:
+            self._cookie = SimpleCookie()
+            try:
+                self._cookie.load(self.get('Cookie', b''))
+            except CookieError:
+                pass # XXX really?
+        return self._cookie
+    cookie = property(cookie)
 
-        self.cookie = SimpleCookie()
-        try:
-            self.cookie.load(self.get('Cookie', b''))
-        except CookieError:
-            pass # XXX really?
+    def cookie_touched(self):
+        """Return a boolean, whether the cookie attribute has been accessed.
+        """
+        return self._cookie is not None
+    cookie_touched = property(cookie_touched)
 
 
     def __setitem__(self, name, value):
@@ -51,6 +70,13 @@ class BaseHeaders(CaseInsensitiveMapping):
             raise CRLFInjection
         super(BaseHeaders, self).__setitem__(name, value)
 
+    def add(self, name, value):
+        """Extend to protect against CRLF injection, as with __setitem__.
+        """
+        if '\n' in value:
+            raise CRLFInjection
+        super(BaseHeaders, self).add(name, value)
+
 
     def raw(self):
         """Return the headers as a string, formatted for an HTTP message.
@@ -0,0 +1,173 @@
+"""Compress response bodies per the request's Accept-Encoding header.
+
+This is wired into Website.do_outbound, and is turned on with the compression
+knob. We support the gzip and deflate content-codings (RFC 2616, sec. 3.5).
+String bodies are compressed in one go, and get an accurate Content-Length.
+Iterable bodies are compressed chunk by chunk as they're served, so we never
+buffer them, but we can't know their length ahead of time.
+
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import zlib
+
+
+# Media types that are already compressed, so that compressing them again only
+# burns CPU. Anything under image/, audio/, or video/ is assumed compressed,
+# except for a few text-based image formats.
+
+COMPRESSED_PREFIXES = (b'image/', b'audio/', b'video/')
+UNCOMPRESSED_IMAGES = set([b'image/svg+xml', b'image/x-icon', b'image/bmp'])
+COMPRESSED_TYPES = set([ b'application/gzip'
+                       , b'application/octet-stream'
+                       , b'application/pdf'
+                       , b'application/x-7z-compressed'
+                       , b'application/x-bzip2'
+                       , b'application/x-gzip'
+                       , b'application/x-rar-compressed'
+                       , b'application/zip'
+                        ])
+
+# Map content-codings to zlib wbits. gzip is the zlib deflate stream with a
+# gzip wrapper (+16), and HTTP's "deflate" is the stream with a zlib wrapper.
+
+WBITS = {b'gzip': 16 + zlib.MAX_WBITS, b'deflate': zlib.MAX_WBITS}
+PREFERENCE = (b'gzip', b'deflate')
+
+
+def is_compressible(media_type):
+    """Given a Content-Type header value, return a boolean.
+    """
+    media_type = media_type.split(b';', 1)[0].strip().lower()
+    if media_type in COMPRESSED_TYPES:
+        return False
+    if media_type.startswith(COMPRESSED_PREFIXES):
+        return media_type in UNCOMPRESSED_IMAGES
+    return True
+
+
+def negotiate(accept_encoding):
+    """Given an Accept-Encoding header value, return a content-coding or None.
+
+    We return the acceptable coding (gzip or deflate) with the highest
+    q-value, preferring gzip on a tie.
+
+    """
+    qvalues = {}
+    for coding in accept_encoding.split(b','):
+        coding, _, params = coding.partition(b';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith(b'q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        qvalues[coding] = q
+
+    wildcard = qvalues.get(b'*', 0.0)
+    best, best_q = None, 0.0
+    for coding in PREFERENCE:
+        q = qvalues.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def add_vary(headers):
+    """Given a Headers object, make sure it varies on Accept-Encoding.
+    """
+    vary = headers.get(b'Vary', b'')
+    names = [name.strip().lower() for name in vary.split(b',')]
+    if b'*' in names or b'accept-encoding' in names:
+        return
+    headers[b'Vary'] = vary + b', Accept-Encoding' if vary else \
+                       b'Accept-Encoding'
+
+
+class Compressed(object):
+    """Model an iterable body that's compressed chunk by chunk as it's served.
+
+    Servers call close on the body they're given, so we pass that on to the
+    body we wrap.
+
+    """
+
+    def __init__(self, body, coding, level, charset):
+        """Takes an iterable body, a content-coding, a level, and a charset for
+        unicode chunks.
+        """
+        self.body = body
+        self.coding = coding
+        self.level = level
+        self.charset = charset
+
+    def __iter__(self):
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED,
+                                      WBITS[self.coding])
+        for chunk in self.body:
+            if isinstance(chunk, unicode):
+                chunk = chunk.encode(self.charset)
+            chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+        yield compressor.flush()
+
+    def close(self):
+        close = getattr(self.body, 'close', None)
+        if close is not None:
+            close()
+
+
+def compress(response, min_size=1024, level=6):
+    """Given a Response object, compress its body in place if we should.
+
+    Responses that have no body (1xx, 204, 304), that are only part of the
+    entity (206, or anything with Content-Range), that are already encoded,
+    that have an already-compressed media type, or whose string body is
+    shorter than min_size bytes are left alone. Otherwise the response gets a
+    Vary: Accept-Encoding header, and if the client accepts gzip or deflate
+    then the body is compressed, and Content-Encoding and Content-Length are
+    set accordingly. Unicode is encoded with the response's charset first.
+
+    """
+    code = response.code
+    if code < 200 or code in (204, 206, 304):
+        return response
+    headers = response.headers
+    if b'Content-Encoding' in headers or b'Content-Range' in headers:
+        return response
+    if not is_compressible(headers.get(b'Content-Type', b'')):
+        return response
+
+    body = response.body
+    if isinstance(body, unicode):
+        body = body.encode(response.charset)
+    if isinstance(body, str) and len(body) < min_size:
+        return response
+
+    add_vary(headers)
+    request = response.request
+    if request is None:
+        return response
+    coding = negotiate(request.headers.get(b'Accept-Encoding', b''))
+    if coding is None:
+        return response
+
+    if isinstance(body, str):
+        compressor = zlib.compressobj(level, zlib.DEFLATED, WBITS[coding])
+        body = compressor.compress(body) + compressor.flush()
+        headers[b'Content-Length'] = str(len(body))
+    else:
+        body = Compressed(body, coding, level, response.charset)
+        if b'Content-Length' in headers:
+            headers.popall(b'Content-Length')
+    response.body = body
+    headers[b'Content-Encoding'] = coding
+    return response
@@ -19,6 +19,8 @@ class Mapping(dict):
 
     """
 
+    __slots__ = ()
+
     def __getitem__(self, name):
         """Given a name, return the last value or raise Response(400).
         """
@@ -90,6 +92,8 @@ class Mapping(dict):
 
 class CaseInsensitiveMapping(Mapping):
 
+    __slots__ = ()
+
     def __init__(self, *a, **kw):
         if a:
             d = a[0]
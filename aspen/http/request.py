@@ -36,9 +36,9 @@ import cgi
 import mimetypes
 import re
 import sys
+import time
 import urllib
 import urlparse
-from cStringIO import StringIO
 
 from aspen import Response
 from aspen.http.baseheaders import BaseHeaders
@@ -174,43 +174,56 @@ class PathPart(unicode):
         obj.params = params
         return obj
 
+
+# Shared pieces
+# =============
+# These are immutable, and nearly every request would otherwise allocate its
+# own copy of them, so we share them between requests.
+
+EMPTY = UnicodeWithRaw(b'')
+ZERO = IntWithRaw(0)
+HTTP = UnicodeWithRaw(b'http')
+HTTPS = UnicodeWithRaw(b'https')
+
+
 ###########
 # Request #
 ###########
 
-class Request(str):
+class Request(object):
     """Represent an HTTP Request message. It's bytes, dammit. But lazy.
     """
 
-    socket = None
-    resource = None
-    original_resource = None
-    server_software = ''
-    fs = '' # the file on the filesystem that will handle this request
+    # We used to subclass str, which meant no __slots__ and a __dict__ on
+    # every request. Now we're a plain object with a fixed set of slots. If
+    # you need to hang something else off of a request, use request.context.
 
-    # NB: no __slots__ for str:
-    #   http://docs.python.org/reference/datamodel.html#__slots__
+    __slots__ = [ 'line', 'headers', 'body', '_context', 'server_software'
+                , 'website', 'socket', 'resource', 'original_resource', 'fs'
+                , 'auth', 'remote_addr'
+                 ]
 
 
-    def __new__(cls, method=b'GET', uri=b'/', server_software=b'',
-                version=b'HTTP/1.1', headers=b'', body=None):
+    def __init__(self, method=b'GET', uri=b'/', server_software=b'',
+                 version=b'HTTP/1.1', headers=b'', body=None):
         """Takes five bytestrings and an iterable of bytestrings.
         """
-        obj = str.__new__(cls, '') # start with an empty string, see below for
-                                   # laziness
-        obj.server_software = server_software
+        self.server_software = server_software
+        self.remote_addr = None     # the client's IP address, if we know it
+        self.socket = None
+        self.resource = None
+        self.original_resource = None
+        self.fs = '' # the file on the filesystem that will handle this request
+        self._context = None
         try:
-            obj.line = Line(method, uri, version)
+            self.line = Line(method, uri, version)
             if not headers:
                 headers = b'Host: localhost'
-            obj.headers = Headers(headers)
-            if body is None:
-                body = StringIO('')
-            obj.body = Body( obj.headers
-                           , body
-                           , obj.server_software
-                            )
-            obj.context = Context(obj)
+            self.headers = Headers(headers)
+            self.body = Body( self.headers
+                            , body
+                            , self.server_software
+                             )
         except UnicodeError:
             # Figure out where the error occurred.
             # ====================================
@@ -226,7 +239,6 @@ class Request(str):
 
             raise Response(400, "Request is undecodable. "
                                 "(%s:%d)" % (filename, frame.f_lineno))
-        return obj
 
 
     @classmethod
@@ -240,37 +252,67 @@ class Request(str):
         their gunicorn. :-/
 
         """
-        return cls(*kick_against_goad(environ))
+        request = cls(*kick_against_goad(environ))
+        request.remote_addr = environ.get('REMOTE_ADDR')
+        return request
+
+
+    # Lazy context.
+    # =============
+    # Static resources never look at the context, so we only build it when
+    # someone (a dynamic resource, or a hook) asks for it.
+
+    def _get_context(self):
+        if self._context is None:
+            self._context = Context(self)
+        return self._context
+
+    def _set_context(self, context):
+        self._context = context
+
+    context = property(_get_context, _set_context)
+
+    def deadline_remaining(self):
+        """Return how many seconds this request has left, or None.
+
+        The deadline is at context['deadline'], if anywhere (see
+        aspen.deadlines). Once it's passed, this is zero or less.
+
+        """
+        if self._context is None:
+            return None
+        deadline = self._context.get('deadline')
+        if deadline is None:
+            return None
+        return deadline - time.time()
 
 
-    # Extend str to lazily load bytes.
-    # ================================
+    # Behave like a bytestring.
+    # =========================
     # When working with a Request object interactively or in a debugging
     # situation we want it to behave transparently string-like. We don't want
     # to read bytes off the wire if we can avoid it, though, because for mega
-    # file uploads and such this could have a big impact.
+    # file uploads and such this could have a big impact. So we only build
+    # the whole message when someone actually asks for it, and we don't hang
+    # on to it afterwards.
 
-    _raw = "" # XXX We should reset this when subobjects are mutated.
     def __str__(self):
-        """Lazily load the body and return the whole message.
+        """Return the whole message as a bytestring.
         """
-        if not self._raw:
-            fmt = "%s\r\n%s\r\n\r\n%s"
-            self._raw = fmt % (self.line.raw, self.headers.raw, self.body.raw)
-        return self._raw
+        fmt = "%s\r\n%s\r\n\r\n%s"
+        return fmt % (self.line.raw, self.headers.raw, self.body.raw)
 
     def __repr__(self):
-        return str.__repr__(str(self))
+        return repr(str(self))
 
-    # str defines rich comparisons, so we have to extend those and not simply
-    # __cmp__ (http://docs.python.org/reference/datamodel.html#object.__lt__)
+    def __lt__(self, other): return str(self) < other
+    def __le__(self, other): return str(self) <= other
+    def __eq__(self, other): return str(self) == other
+    def __ne__(self, other): return str(self) != other
+    def __gt__(self, other): return str(self) > other
+    def __ge__(self, other): return str(self) >= other
 
-    def __lt__(self, other): return str.__lt__(str(self), other)
-    def __le__(self, other): return str.__le__(str(self), other)
-    def __eq__(self, other): return str.__eq__(str(self), other)
-    def __ne__(self, other): return str.__ne__(str(self), other)
-    def __gt__(self, other): return str.__gt__(str(self), other)
-    def __ge__(self, other): return str.__ge__(str(self), other)
+    __hash__ = object.__hash__
 
 
     # Public Methods
@@ -338,9 +380,9 @@ class Line(unicode):
         """Takes three bytestrings.
         """
         raw = " ".join([method, uri, version])
-        method = Method(method)
+        method = METHODS.get(method) or Method(method)
         uri = URI(uri)
-        version = Version(version)
+        version = VERSIONS.get(version) or Version(version)
         decoded = u" ".join([method, uri, version])
 
         obj = super(Line, cls).__new__(cls, decoded)
@@ -423,6 +465,9 @@ class Method(unicode):
         obj.raw = raw
         return obj
 
+# Method objects are immutable, so we share one for each standard method.
+METHODS = dict((str(raw), Method(str(raw))) for raw in STANDARD_METHODS)
+
 
 # Request -> Line -> URI
 # ......................
@@ -442,20 +487,23 @@ class URI(unicode):
         # split str and not unicode so we can store .raw for each subobj
         uri = urlparse.urlsplit(raw)
 
+        # For a Request-URI these are empty 99.99999999% of the time, in
+        # which case we use the shared EMPTY and ZERO objects.
+
         # scheme is going to be ASCII 99.99999999% of the time
-        scheme = UnicodeWithRaw(uri.scheme)
+        scheme = UnicodeWithRaw(uri.scheme) if uri.scheme else EMPTY
 
         # let's decode username and password as url-encoded UTF-8
-        no_None = lambda o: o if o is not None else ""
-        parse = lambda o: UnicodeWithRaw(urllib.unquote(no_None(o)))
+        parse = lambda o: UnicodeWithRaw(urllib.unquote(o)) if o else EMPTY
         username = parse(uri.username)
         password = parse(uri.password)
 
         # host we will decode as IDNA, which may raise UnicodeError
-        host = UnicodeWithRaw(no_None(uri.hostname), 'IDNA')
+        host = uri.hostname
+        host = UnicodeWithRaw(host, 'IDNA') if host else EMPTY
 
         # port is IntWithRaw (will be 0 if absent), which is fine
-        port = IntWithRaw(uri.port)
+        port = IntWithRaw(uri.port) if uri.port is not None else ZERO
 
         # path and querystring get bytes and do their own parsing
         path = Path(uri.path)  # further populated in gauntlet
@@ -485,6 +533,9 @@ def extract_rfc2396_params(path):
     * path should be raw so we don't split or operate on a decoded character
     * output is decoded
     """
+    if b';' not in path:
+        return _extract_no_params(path)
+
     pathsegs = path.lstrip(b'/').split(b'/')
     def decode(input): 
         return urllib.unquote(input).decode('UTF-8')
@@ -503,6 +554,57 @@ def extract_rfc2396_params(path):
         segments_with_params.append(PathPart(segment, params))
     return segments_with_params
 
+def _extract_no_params(path):
+    """Fast path for extract_rfc2396_params, for paths with no ;params.
+
+    All of the segments share a single empty params Mapping.
+
+    """
+    params = Mapping()
+    pathsegs = path.lstrip(b'/').split(b'/')
+    if b'%' not in path:
+        # Nothing to unquote, so nothing to split differently after decoding.
+        pathsegs = path.decode('UTF-8').lstrip('/').split('/')
+        return [PathPart(segment, params) for segment in pathsegs]
+    return [ PathPart(urllib.unquote(segment).decode('UTF-8'), params)
+             for segment in pathsegs
+            ]
+
+
+# Path cache
+# ==========
+# Sites tend to get the same paths over and over, so we cache the decoded
+# path and its parts, keyed by raw path. The cache is bounded: when it's full
+# we evict an arbitrary entry. Cached PathPart objects (and their params) are
+# shared between requests, so treat them as read-only.
+
+PATH_CACHE_SIZE = 1024
+__path_cache__ = dict()
+__path_cache_stats__ = dict(misses=0)   # hits aren't counted, to keep them fast
+
+def parse_path(raw):
+    """Given a raw path, return a tuple (decoded, parts), with caching.
+
+    The parts are a tuple of PathPart objects, per extract_rfc2396_params.
+
+    """
+    try:
+        return __path_cache__[raw]
+    except KeyError:
+        __path_cache_stats__['misses'] += 1
+
+    parsed = ( urllib.unquote(raw).decode('UTF-8')
+             , tuple(extract_rfc2396_params(raw))
+              )
+
+    if len(__path_cache__) >= PATH_CACHE_SIZE:
+        try:
+            __path_cache__.popitem()
+        except KeyError:    # another thread emptied it
+            pass
+    __path_cache__[raw] = parsed
+    return parsed
+
 
 # Request -> Line -> URI -> Path
 
@@ -513,35 +615,80 @@ class Path(Mapping):
 
     """
 
+    __slots__ = ['raw', 'decoded', 'parts']
+
     def __init__(self, raw):
         self.raw = raw
-        self.decoded = urllib.unquote(raw).decode('UTF-8')
-        self.parts = extract_rfc2396_params(raw) 
+        self.decoded, parts = parse_path(raw)
+        self.parts = list(parts)
 
 
 # Request -> Line -> URI -> Querystring
 
+def _unquote_plus(raw):
+    """Given a bytestring, return a bytestring, unquoted per urllib.unquote_plus.
+    """
+    if b'+' in raw:
+        raw = raw.replace(b'+', b' ')
+    if b'%' in raw:
+        raw = urllib.unquote(raw)
+    return raw
+
+def _decode_value(raw):
+    """Given a raw bytestring from a querystring, return unicode.
+    """
+    # unicode(s, 'utf-8') skips the codec registry lookup that s.decode does.
+    return unicode(_unquote_plus(raw), 'utf-8')
+
+
 class Querystring(Mapping):
     """Represent an HTTP querystring.
+
+    We parse the raw querystring in a single pass, straight into the mapping.
+    Values are decoded as we go (they have to be: dict(qs), dict.update and
+    friends read the underlying dict directly), but the whole decoded string
+    is only computed if someone asks for it.
+
     """
 
+    __slots__ = ['raw', '_decoded']
+
     def __init__(self, raw):
         """Takes a string of type application/x-www-form-urlencoded.
         """
-        self.decoded = urllib.unquote_plus(raw).decode('UTF-8')
+        if isinstance(raw, unicode):
+            raw = raw.encode('ASCII')   # it's raw, dammit
         self.raw = raw
+        self._decoded = None
+
+        # We split pairs the same way cgi.parse_qs does (keep_blank_values=True,
+        # strict_parsing=False), which is on both & and ;. We only split on
+        # ASCII bytes, and an ASCII byte always ends a UTF-8 sequence, so if
+        # every piece decodes then so does the whole querystring, and a bad one
+        # is still a bad request.
+
+        pairs = raw.split(b'&')
+        if b';' in raw:
+            pairs = [pair for chunk in pairs for pair in chunk.split(b';')]
+        for pair in pairs:
+            if not pair:
+                continue
+            key, _, value = pair.partition(b'=')
+            key = _decode_value(key)
+            value = _decode_value(value)
+            values = dict.get(self, key)
+            if values is None:
+                dict.__setitem__(self, key, [value])
+            else:
+                values.append(value)
 
-        # parse_qs does its own unquote_plus'ing ...
-        as_dict = cgi.parse_qs( raw
-                              , keep_blank_values = True
-                              , strict_parsing = False
-                               )
-
-        # ... but doesn't decode to unicode.
-        for k, vals in as_dict.items():
-            as_dict[k.decode('UTF-8')] = [v.decode('UTF-8') for v in vals]
-
-        Mapping.__init__(self, as_dict)
+    def decoded(self):
+        """The whole querystring, unquoted and decoded.
+        """
+        if self._decoded is None:
+            self._decoded = _decode_value(self.raw)
+        return self._decoded
+    decoded = property(decoded)
 
 
 # Request -> Line -> Version
@@ -584,6 +731,9 @@ class Version(unicode):
         obj.raw = raw           # 'HTTP/1.1'
         return obj
 
+# Version objects are immutable, so we share one for each supported version.
+VERSIONS = dict((str(raw), Version(str(raw))) for raw in versions)
+
 
 # Request -> Headers
 # ------------------
@@ -592,6 +742,8 @@ class Headers(BaseHeaders):
     """Model headers in an HTTP Request message.
     """
 
+    __slots__ = ['host', 'scheme']
+
     def __init__(self, raw):
         """Extend BaseHeaders to add extra attributes.
         """
@@ -611,8 +763,7 @@ class Headers(BaseHeaders):
         # ======
         # http://docs.python.org/library/wsgiref.html#wsgiref.util.guess_scheme
 
-        scheme = 'https' if self.get('HTTPS', False) else 'http'
-        self.scheme = UnicodeWithRaw(scheme)
+        self.scheme = HTTPS if self.get('HTTPS', False) else HTTP
 
 
 # Request -> Body
@@ -622,8 +773,10 @@ class Body(Mapping):
     """Represent the body of an HTTP request.
     """
 
+    __slots__ = ['raw']
+
     def __init__(self, headers, fp, server_software):
-        """Takes a str, a file-like object, and another str.
+        """Takes a str, a file-like object or None, and another str.
 
         If the Mapping API is used (in/one/all/has), then the iterable will be
         read and parsed as media of type application/x-www-form-urlencoded or
@@ -649,9 +802,11 @@ class Body(Mapping):
 
 
     def _read_raw(self, server_software, fp):
-        """Given str and a file-like object, return a bytestring.
+        """Given str and a file-like object (or None), return a bytestring.
         """
-        if not server_software.startswith('Rocket'):  # normal
+        if fp is None:                                              # no body
+            raw = b''
+        elif not server_software.startswith('Rocket'):              # normal
             raw = fp.read()
         else:                                                       # rocket
 
@@ -8,23 +8,31 @@ import os
 import re
 import sys
 
-from aspen.utils import ascii_dammit
+from aspen.exceptions import CRLFInjection
 from aspen.http import status_strings
-from aspen.http.baseheaders import BaseHeaders as Headers
+from aspen.http.baseheaders import BaseHeaders
 
 
 class CloseWrapper(object):
     """Conform to WSGI's facility for running code *after* a response is sent.
+
+    If the response's own body has a close method (a file, a generator), we
+    call it, since the server only sees us.
+
     """
 
-    def __init__(self, request, body):
+    def __init__(self, request, body, original=None):
         self.request = request
         self.body = body
+        self.original = original
 
     def __iter__(self):
         return iter(self.body)
 
     def close(self):
+        close = getattr(self.original, 'close', None)
+        if close is not None:
+            close()
         socket = getattr(self.request, "socket", None)
         if socket is not None:
             pass
@@ -45,6 +53,54 @@ class CloseWrapper(object):
 charset_re = re.compile("^[A-Za-z0-9:_()+.-]{1,40}$")
 
 
+def to_ascii(s, what):
+    """Given a string and a description of it, return a US-ASCII bytestring.
+
+    Raise ValueError if the string isn't US-ASCII.
+
+    """
+    # NB: Spelling it 'ascii' hits CPython's fast path, skipping the codec
+    # registry.
+    try:
+        if isinstance(s, unicode):
+            s = s.encode('ascii')
+        else:
+            unicode(s, 'ascii')     # NB: We throw away this unicode!
+    except UnicodeError:
+        safe = repr(s).lstrip('u').strip('\'"')
+        raise ValueError("Header %s %s must be US-ASCII." % (what, safe))
+    return s
+
+
+class Headers(BaseHeaders):
+    """Model headers in an HTTP Response message.
+
+    Names and values are validated and stored as US-ASCII bytestrings when
+    they're set, so that we can hand them straight to WSGI.
+
+    """
+
+    __slots__ = ()
+
+    def __setitem__(self, name, value):
+        name = to_ascii(name, 'key').title()
+        value = to_ascii(value, 'value')
+        if b'\n' in value:
+            raise CRLFInjection
+        dict.__setitem__(self, name, [value])
+
+    def add(self, name, value):
+        name = to_ascii(name, 'key').title()
+        value = to_ascii(value, 'value')
+        if b'\n' in value:
+            raise CRLFInjection
+        values = dict.get(self, name)
+        if values is None:
+            dict.__setitem__(self, name, [value])
+        else:
+            values.append(value)
+
+
 class Response(Exception):
     """Represent an HTTP Response message.
     """
@@ -84,33 +140,36 @@ class Response(Exception):
                 headers = headers.items()
             for k, v in headers:
                 self.headers[k] = v
-        self.headers.cookie.load(self.headers.get('Cookie', b''))
 
     def __call__(self, environ, start_response):
-        wsgi_status = str(self)
-        for morsel in self.headers.cookie.values():
-            self.headers.add('Set-Cookie', morsel.OutputString())
-        wsgi_headers = []
-        for k, vals in self.headers.iteritems():
-            try:        # XXX This is a hack. It's red hot, baby.
-                k = k.encode('US-ASCII')
-            except UnicodeEncodeError:
-                k = ascii_dammit(k)
-                raise ValueError("Header key %s must be US-ASCII.")
-            for v in vals:
-                try:    # XXX This also is a hack. It is also red hot, baby.
-                    v = v.encode('US-ASCII')
-                except UnicodeEncodeError:
-                    v = ascii_dammit(v)
-                    raise ValueError("Header value %s must be US-ASCII.")
-                wsgi_headers.append((k, v))
-
-        start_response(wsgi_status, wsgi_headers)
+        status, headers, body = self.to_wire()
+        start_response(status, headers)
+        return CloseWrapper(self.request, body, self.body)
+
+    def to_wire(self):
+        """Return a status bytestring, a list of headers, and a body iterable.
+
+        Everything is a US-ASCII bytestring, ready for WSGI or for a network
+        engine that writes responses itself (see network_engines.direct_).
+
+        """
+        status = str(self)
+        if self.headers.cookie_touched or 'Cookie' in self.headers:
+            for morsel in self.headers.cookie.values():
+                self.headers.add('Set-Cookie', morsel.OutputString())
+        # Headers are already US-ASCII bytestrings (see Headers above).
+        headers = [ (k, v) for k, vals in self.headers.iteritems()
+                           for v in vals
+                   ]
         body = self.body
-        if isinstance(body, basestring):
+        if isinstance(body, str):           # the common case
             body = [body]
-        body = (x.encode('ascii') if isinstance(x, unicode) else x for x in body)
-        return CloseWrapper(self.request, body)
+        elif isinstance(body, unicode):
+            body = [body.encode('ascii')]
+        else:
+            body = (x.encode('ascii') if isinstance(x, unicode) else x
+                    for x in body)
+        return status, headers, body
 
     def __repr__(self):
         return "<Response: %s>" % str(self)
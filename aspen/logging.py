@@ -1,8 +1,8 @@
 """Aspen logging. It's simple.
 
 There are log and log_dammit functions that take arbitrary positional
-arguments, stringify them, write them to stdout, and flush stdout. Each line
-written is prepended with process and thread identifiers. The philosophy is
+arguments, stringify them, and write them to stdout. Each line written is
+prepended with process and thread identifiers. The philosophy is
 that additional abstraction layers above Aspen can handle timestamping along
 with piping to files, rotation, etc. PID and thread id are best handled inside
 the process, however.
@@ -15,6 +15,11 @@ that your application will have its own wrapper(s).
 
 Unicode objects are encoded as UTF-8. Bytestrings are passed through as-is.
 
+Lines aren't written directly. They go into a bounded in-memory buffer, and a
+background thread writes them out in batches (see BatchWriter below), so that
+request threads never wait on stdout. Call flush to write out whatever is
+waiting; we do that for you at exit and before re-executing.
+
 """
 from __future__ import absolute_import
 from __future__ import division
@@ -22,6 +27,8 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 from __future__ import with_statement
+import atexit
+import collections
 import os
 import pprint
 import sys
@@ -31,7 +38,7 @@ import threading
 
 LOGGING_THRESHOLD = -1
 PID = os.getpid()
-LOCK = threading.Lock()
+START_LOCK = threading.Lock()
 
 
 def stringify(o):
@@ -46,26 +53,145 @@ def stringify(o):
     return o
 
 
+def format_prefix(ident, name):
+    """Given a thread's ident and name, return the str log lines start with.
+    """
+    return stringify("pid-%s thread-%s (%s) " % (os.getpid(), ident, name))
+
+
+def format_item(item):
+    """Given an item from WRITER's buffer, return a str.
+
+    Most items are log lines already. To leave formatting to the writer
+    thread, write a (format, record) tuple instead, and we'll call
+    format(record) (see Website.log_access).
+
+    """
+    if isinstance(item, tuple):
+        format, record = item
+        return format(record)
+    return stringify(item)
+
+
 def log(*messages, **kw):
     level = kw.get('level', 0)
     if level >= LOGGING_THRESHOLD:
         # Be sure to use Python 2.5-compatible threading API.
         t = threading.currentThread()
-        fmt = "pid-%s thread-%s (%s) %%s" % ( PID
-                                            , thread.get_ident()
-                                            , t.getName()
-                                             )
+        prefix = format_prefix(thread.get_ident(), t.getName())
+        write = WRITER.write
         for message in messages:
             message = stringify(message)
             for line in message.splitlines():
-                with LOCK:
-                    # Log lines can get interleaved, but that's okay, because
-                    # we prepend lines with thread identifiers that can be used
-                    # to reassemble log messages per-thread.
-                    print(fmt % line.decode('utf8'))
-                    sys.stdout.flush()
+                # Log lines can get interleaved, but that's okay, because we
+                # prepend lines with thread identifiers that can be used to
+                # reassemble log messages per-thread.
+                write(prefix + line)
+
+
+def flush():
+    """Write out any log lines that are waiting.
+    """
+    WRITER.flush()
 
 
 def log_dammit(*messages):
     log(*messages, **{'level': 1})
     #log(*messages, level=1)  <-- SyntaxError in Python 2.5
+
+
+class BatchWriter(object):
+    """Buffer items in a ring buffer and write them out in batches.
+
+    Items are formatted with format and written to stdout (looked up each
+    time, so it can be swapped out) from a daemon thread, which wakes up every
+    interval seconds, or as soon as batch_size items are waiting. If the
+    buffer fills up because we're not keeping up, then we drop the oldest
+    items, and count them in self.dropped. Call flush to write out whatever
+    is waiting, e.g., at shutdown.
+
+    Under gevent with threading monkey-patched the writer is a greenlet. If
+    threading isn't patched it's a real thread, which is what we want, since
+    then writing to stdout doesn't hold up the hub.
+
+    """
+
+    def __init__(self, format=stringify, capacity=8192, batch_size=256,
+                                                                interval=0.5):
+        self.format = format
+        self.buffer = collections.deque(maxlen=capacity)
+        self.batch_size = batch_size
+        self.interval = interval
+        self.dropped = 0
+        self._reported = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pid = None
+
+    def write(self, item):
+        """Given an item, buffer it for writing. Never blocks on I/O.
+        """
+        buffer = self.buffer
+        if len(buffer) == buffer.maxlen:
+            self.dropped += 1   # approximate under contention; that's okay
+        buffer.append(item)
+        if self._pid != os.getpid():
+            self._start()
+        if len(buffer) >= self.batch_size:
+            self._wake.set()
+
+    def flush(self):
+        """Write out everything that's waiting, and flush stdout.
+        """
+        with self._lock:
+            buffer = self.buffer
+            lines = []
+            dropped = self.dropped
+            if dropped > self._reported:
+                lines.append(b"(dropped %d lines from a full buffer)\n"
+                             % (dropped - self._reported))
+                self._reported = dropped
+            while buffer:
+                try:
+                    item = buffer.popleft()
+                except IndexError:  # someone else got it
+                    break
+                lines.append(self.format(item) + b'\n')
+            if lines:
+                sys.stdout.write(b''.join(lines))
+                sys.stdout.flush()
+
+    def _start(self):
+        """Start a writer thread for this process.
+
+        We do this lazily, and again after a fork, since threads don't
+        survive forking.
+
+        """
+        with START_LOCK:
+            if self._pid == os.getpid():
+                return
+            if self._pid is None:
+                atexit.register(self.flush)
+            else:
+                # We've forked, and the parent's writer may have been holding
+                # the lock when it happened.
+                self._lock = threading.Lock()
+            self._pid = os.getpid()
+            self._wake = threading.Event()
+            writer = threading.Thread(target=self._run, name="aspen-log-writer")
+            writer.setDaemon(True)
+            writer.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                pass    # nowhere to log it, and we mustn't die
+
+
+
+WRITER = BatchWriter(format_item)
@@ -0,0 +1,313 @@
+"""Aspen keeps some metrics about itself. This module models them.
+
+Latencies (in seconds) are recorded in histograms with a fixed set of
+log-linear buckets, in the manner of HdrHistogram: each power of two from
+about a microsecond to a few minutes is split into SUB_BUCKETS equal buckets.
+A bucket is then at most 1/SUB_BUCKETS as wide as the values in it, so
+percentiles are accurate to within about 3% regardless of magnitude.
+
+Recording takes no lock. We lean on the GIL, which means that under heavy
+contention the odd increment may be lost. That's fine for monitoring, and it
+keeps the per-request cost to a few list operations.
+
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import math
+
+
+SUB_BUCKETS = 32
+MIN_EXPONENT = -19      # values below 2**-20 seconds (~1us) go in bucket 0
+MAX_EXPONENT = 8        # values of 2**8 seconds (~4m) and up go in the last
+NBUCKETS = (MAX_EXPONENT - MIN_EXPONENT + 1) * SUB_BUCKETS
+
+
+def bucket_for(value):
+    """Given a number, return the index of its histogram bucket.
+    """
+    if value <= 0:
+        return 0
+    mantissa, exponent = math.frexp(value)   # 0.5 <= mantissa < 1
+    if exponent < MIN_EXPONENT:
+        return 0
+    if exponent > MAX_EXPONENT:
+        return NBUCKETS - 1
+    sub = int((mantissa - 0.5) * 2 * SUB_BUCKETS)
+    return (exponent - MIN_EXPONENT) * SUB_BUCKETS + sub
+
+
+def upper_bound(index):
+    """Given a bucket index, return the largest value that falls in it.
+    """
+    exponent, sub = divmod(index, SUB_BUCKETS)
+    exponent += MIN_EXPONENT
+    return math.ldexp(0.5 + (sub + 1) / (2 * SUB_BUCKETS), exponent)
+
+
+class Histogram(object):
+    """Model a distribution of non-negative numbers, e.g., latencies.
+    """
+
+    def __init__(self):
+        self.counts = [0] * NBUCKETS
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def record(self, value):
+        """Given a non-negative number, record it.
+        """
+        self.counts[bucket_for(value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def buckets(self):
+        """Return a list of (upper bound, count) tuples for non-empty buckets.
+        """
+        counts = self.counts[:]
+        return [(upper_bound(i), n) for i, n in enumerate(counts) if n]
+
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+    def percentile(self, p, buckets=None):
+        """Given a number from 0 to 100, return an upper bound for that
+        percentile, accurate to the bucket size.
+        """
+        if buckets is None:
+            buckets = self.buckets()
+        total = sum(n for bound, n in buckets)
+        if not total:
+            return 0.0
+        rank = p / 100 * total
+        seen = 0
+        for bound, n in buckets:
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def snapshot(self):
+        """Return a dict of summary statistics and non-empty buckets.
+        """
+        buckets = self.buckets()
+        return { 'count': self.count
+               , 'sum': self.sum
+               , 'max': self.max
+               , 'p50': self.percentile(50, buckets)
+               , 'p90': self.percentile(90, buckets)
+               , 'p99': self.percentile(99, buckets)
+               , 'buckets': buckets
+                }
+
+
+class ResourceMetrics(object):
+    """Model the metrics we keep for each resource.
+    """
+
+    __slots__ = ['count', 'errors', 'dispatch', 'page_two', 'render', 'total']
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.dispatch = Histogram()
+        self.page_two = Histogram()
+        self.render = Histogram()
+        self.total = Histogram()
+
+    def snapshot(self):
+        return { 'count': self.count
+               , 'errors': self.errors
+               , 'dispatch': self.dispatch.snapshot()
+               , 'page_two': self.page_two.snapshot()
+               , 'render': self.render.snapshot()
+               , 'total': self.total.snapshot()
+                }
+
+
+class Registry(object):
+    """Model a collection of ResourceMetrics, keyed by request.fs.
+
+    Requests that don't dispatch to a file are recorded under ''. If the
+    registry is disabled, get returns None, and callers skip timing.
+
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.resources = {}
+
+    def get(self, fs):
+        """Given a filesystem path, return a ResourceMetrics object or None.
+        """
+        if not self.enabled:
+            return None
+        metrics = self.resources.get(fs)
+        if metrics is None:
+            # setdefault is atomic, so racing threads get the same object.
+            metrics = self.resources.setdefault(fs, ResourceMetrics())
+        return metrics
+
+    def record(self, fs, code, elapsed):
+        """Given a filesystem path, a status code, and seconds, record them.
+        """
+        metrics = self.get(fs)
+        if metrics is not None:
+            metrics.count += 1
+            if code >= 500:
+                metrics.errors += 1
+            metrics.total.record(elapsed)
+
+    def snapshot(self):
+        """Return a dict of request.fs to a dict of metrics.
+        """
+        return dict((fs, metrics.snapshot())
+                    for fs, metrics in self.resources.items())
+
+
+# Prometheus
+# ==========
+# We serve these at website.metrics_path, in the Prometheus text format:
+#
+#   http://prometheus.io/docs/instrumenting/exposition_formats/
+#
+# Our fine-grained buckets are rolled up into a conventional set of coarse
+# ones, which is accurate to within the size of a fine bucket.
+
+EXPORT_BOUNDS = ( 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5
+                , 1.0, 2.5, 5.0, 10.0
+                 )
+
+def _export_end(bound):
+    """Given an export bound, return the index of the first fine bucket past it.
+    """
+    index = bucket_for(bound)
+    if upper_bound(index) <= bound:
+        index += 1
+    return index
+
+EXPORT_ENDS = [_export_end(bound) for bound in EXPORT_BOUNDS]
+PHASES = ( ('request', 'total', "handling requests")
+         , ('dispatch', 'dispatch', "dispatching requests to files")
+         , ('page_two', 'page_two', "executing page two of simplates")
+         , ('render', 'render', "rendering content pages")
+          )
+
+
+def escape(value):
+    """Given a label value, return it escaped for the text format.
+    """
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def cumulative(histogram):
+    """Given a Histogram, return a list of cumulative counts per export bound,
+    with a final count for +Inf.
+    """
+    counts = histogram.counts[:]
+    out = []
+    total = start = 0
+    for end in EXPORT_ENDS:
+        total += sum(counts[start:end])
+        out.append(total)
+        start = end
+    out.append(total + sum(counts[start:]))
+    return out
+
+
+def exposition(website):
+    """Given a Website, return its metrics in the Prometheus text format.
+    """
+    from aspen import resources, sockets
+    from aspen.http import request
+
+    lines = []
+    def metric(name, kind, help, samples):
+        lines.append("# HELP %s %s" % (name, help))
+        lines.append("# TYPE %s %s" % (name, kind))
+        for labels, value in samples:
+            lines.append("%s%s %s" % (name, labels, repr(float(value))))
+
+    snapshot = sorted(website.metrics.resources.items())
+    labelled = [('{fs="%s"}' % escape(fs), m) for fs, m in snapshot]
+
+    metric( "aspen_requests_total", "counter", "Requests handled, by resource."
+          , [(labels, m.count) for labels, m in labelled]
+           )
+    metric( "aspen_request_errors_total", "counter"
+          , "Requests that ended in a 5xx, by resource."
+          , [(labels, m.errors) for labels, m in labelled]
+           )
+    bounds = [repr(bound) for bound in EXPORT_BOUNDS] + ['+Inf']
+    for prefix, attr, doing in PHASES:
+        name = "aspen_%s_seconds" % prefix
+        lines.append("# HELP %s Time spent %s, by resource." % (name, doing))
+        lines.append("# TYPE %s histogram" % name)
+        for fs, m in snapshot:
+            histogram = getattr(m, attr)
+            label = escape(fs)
+            counts = cumulative(histogram)
+            for bound, count in zip(bounds, counts):
+                lines.append('%s_bucket{fs="%s",le="%s"} %d'
+                             % (name, label, bound, count))
+            lines.append('%s_sum{fs="%s"} %r' % (name, label, histogram.sum))
+            lines.append('%s_count{fs="%s"} %d' % (name, label, counts[-1]))
+
+    metric( "aspen_resource_cache_entries", "gauge"
+          , "Resources in the resource cache."
+          , [('', len(resources.__cache__))]
+           )
+    metric( "aspen_resource_cache_hits_total", "counter"
+          , "Resource cache lookups that found a fresh resource."
+          , [('', resources.__stats__['hits'])]
+           )
+    metric( "aspen_resource_cache_misses_total", "counter"
+          , "Resource cache lookups that (re)loaded a resource."
+          , [('', resources.__stats__['misses'])]
+           )
+    metric( "aspen_path_cache_entries", "gauge"
+          , "URL paths in the parsed path cache used for dispatch."
+          , [('', len(request.__path_cache__))]
+           )
+    metric( "aspen_path_cache_misses_total", "counter"
+          , "URL paths that had to be parsed for dispatch."
+          , [('', request.__path_cache_stats__['misses'])]
+           )
+    metric( "aspen_sockets_active", "gauge", "Open Socket.IO sockets."
+          , [('', len(sockets.__sockets__))]
+           )
+
+    workers = website.network_engine.worker_stats()
+    if workers is not None:
+        metric( "aspen_worker_threads", "gauge", "Worker threads."
+              , [('', workers['threads'])]
+               )
+        metric( "aspen_worker_threads_idle", "gauge"
+              , "Worker threads not handling a connection."
+              , [('', workers['idle'])]
+               )
+        metric( "aspen_worker_queue_length", "gauge"
+              , "Connections waiting for a worker thread."
+              , [('', workers['queued'])]
+               )
+
+    if website.admission is not None:
+        pools = [ ('{prefix="%s"}' % escape(prefix or ''), pool)
+                  for prefix, pool in website.admission.items()
+                 ]
+        metric( "aspen_requests_in_flight", "gauge"
+              , "Requests being handled, by concurrency limit prefix."
+              , [(labels, pool.inflight) for labels, pool in pools]
+               )
+        metric( "aspen_requests_shed_total", "counter"
+              , "Requests turned away with 503, by concurrency limit prefix."
+              , [(labels, pool.shed) for labels, pool in pools]
+               )
+
+    lines.append('')
+    return '\n'.join(lines).encode('UTF-8')
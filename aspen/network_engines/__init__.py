@@ -10,12 +10,60 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import os
+import socket
+import sys
 import time
+from email.utils import formatdate
 
 from aspen.sockets.buffer import ThreadedBuffer
 from aspen.sockets.loop import ThreadedLoop
 
 
+BACKLOG = socket.SOMAXCONN
+SO_REUSEPORT = getattr(socket, 'SO_REUSEPORT', None)
+if SO_REUSEPORT is None and sys.platform.startswith('linux'):
+    SO_REUSEPORT = 15   # Python 2 doesn't export it
+
+
+def listen(address, sockfam, reuse_port=False, backlog=BACKLOG):
+    """Given an address and a socket family, return a listening socket.
+
+    Engines serve on this if it's set as website.network_socket, which lets us
+    share it among processes, and hand it across an exec.
+
+    """
+    sock = socket.socket(sockfam, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, SO_REUSEPORT, 1)
+    if isinstance(address, basestring):
+        sock.bind(address)
+        os.chmod(address, 0777)     # so everyone can use it, as per cheroot
+    else:
+        # Accepted sockets inherit this. Cheroot sets it on its own sockets.
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.bind(address)
+    sock.listen(backlog)
+    return sock
+
+
+_date = [None, None]    # [second, formatted]
+
+def http_date():
+    """Return the current time formatted for a Date header.
+
+    Engines that write responses themselves call this for every response, so
+    we only format once a second.
+
+    """
+    now = int(time.time())
+    if _date[0] != now:
+        _date[1] = str(formatdate(now, usegmt=True))
+        _date[0] = now
+    return _date[1]
+
+
 class BaseEngine(object):
 
     def __init__(self, name, website):
@@ -26,6 +74,12 @@ class BaseEngine(object):
 
     def bind(self):
         """Bind to a socket, based on website.sockfam and website.address.
+
+        If website.network_socket is set, it's a socket that's already bound
+        and listening, and we should serve on that instead. If there are any
+        website.extra_sockets, those are listening too, and we should serve
+        on them as well (optional).
+
         """
 
     def start(self):
@@ -44,6 +98,25 @@ class BaseEngine(object):
         """Stop the loop that runs check_all (optional).
         """
 
+    def worker_stats(self):
+        """Return a dict of worker thread counts, or None (optional).
+
+        The dict has keys threads (the number of workers), idle (the number of
+        those not handling a connection), and queued (connections waiting for
+        a worker).
+
+        """
+        return None
+
+    def start_timeout(self, seconds, exception):
+        """Arrange for exception to be raised in the current request after
+        seconds, and return an object with a cancel method, or None (optional).
+
+        We can't do this with threads. See aspen.deadlines.
+
+        """
+        return None
+
 
 # Threaded
 # ========
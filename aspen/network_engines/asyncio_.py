@@ -0,0 +1,448 @@
+"""An engine on an asyncio event loop.
+
+This is written against trollius, the Python 2 port of asyncio. Install it
+with `pip install aspen[asyncio]`, and use it with `--network_engine=asyncio`.
+
+Connections are handled on the event loop, so idle keep-alive connections cost
+a buffer and no thread. We parse HTTP/1.1 ourselves, with keep-alive,
+pipelining, chunked request bodies, and Expect: 100-continue. Then we call the
+website as a WSGI app in a bounded pool of threads, since simplates and hooks
+block. Response bodies are read out in that thread too, and written back on
+the loop.
+
+The event loop runs in its own thread, so that the main thread can take
+signals and drain us from a signal handler (see aspen.execution.graceful).
+
+Socket.IO sockets run on the same pool of threads. A socket's loop only asks
+for a thread to run a tick when a message is waiting, so idle sockets don't
+tie up threads. That means a socket resource that sends without receiving
+anything won't get to run; use a threaded engine for that.
+
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import sys
+import threading
+import time
+import traceback
+import urllib
+from cStringIO import StringIO
+
+import trollius as asyncio
+from trollius import From, Return
+from concurrent.futures import ThreadPoolExecutor
+
+import aspen
+from aspen.network_engines import ThreadedEngine, http_date, listen
+from aspen.sockets.buffer import ThreadedBuffer
+from aspen.sockets.loop import Die
+
+
+SOFTWARE = b"Aspen! asyncio!"
+MAX_HEADERS = 100
+LIMIT = 65536           # the longest line we'll read
+
+STATUS_CONTINUE = b"HTTP/1.1 100 Continue\r\n\r\n"
+INTERNAL_SERVER_ERROR = b"500 Internal Server Error"
+HOP_BY_HOP = set([b'connection', b'keep-alive', b'transfer-encoding'])
+NO_BODY = (b'1', b'204', b'304')
+
+
+class BadRequest(Exception):
+    status = b"400 Bad Request"
+
+class TooLarge(BadRequest):
+    status = b"413 Request Entity Too Large"
+
+
+# Socket.IO
+# =========
+
+class AsyncioBuffer(ThreadedBuffer):
+    """A thread-safe buffer that tells our socket's loop when it's fed.
+    """
+
+    def _put(self, item):
+        ThreadedBuffer._put(self, item)
+        loop = getattr(self._socket, 'loop', None)
+        if self._name == 'incoming' and isinstance(loop, AsyncioLoop):
+            loop.wake()
+
+
+class AsyncioLoop(object):
+    """Model a socket's loop as a task that runs ticks in the thread pool.
+    """
+
+    def __init__(self, socket):
+        self.socket = socket
+        self.engine = socket.website.network_engine
+        self.please_stop = threading.Event()
+        self.task = None
+        self._waiting = None
+
+    def start(self):
+        self.engine.loop.call_soon_threadsafe(self._start)
+
+    def _start(self):
+        self._waiting = asyncio.Event(loop=self.engine.loop)
+        if self.socket.incoming.queue:
+            self._waiting.set()
+        self.task = asyncio.ensure_future(self.run(), loop=self.engine.loop)
+
+    @asyncio.coroutine
+    def run(self):
+        loop = self.engine.loop
+        while not self.please_stop.is_set():
+            if not self.socket.incoming.queue:
+                self._waiting.clear()
+                yield From(self._waiting.wait())
+                continue
+            yield From(loop.run_in_executor(None, self.socket.tick))
+
+    def wake(self):
+        if self._waiting is not None:
+            self.engine.loop.call_soon_threadsafe(self._waiting.set)
+
+    def stop(self):
+        self.please_stop.set()
+        self.socket.incoming.put(Die)   # unblock a tick that's in recv
+        self.wake()
+
+
+# Engine
+# ======
+
+class Engine(ThreadedEngine):
+
+    loop = None
+    servers = ()
+    thread = None
+
+    def bind(self):
+        self.loop = asyncio.new_event_loop()
+        self.executor = ThreadPoolExecutor(max_workers=self.website.threads)
+        self.loop.set_default_executor(self.executor)
+        self.connections = {}   # StreamWriter => whether it's mid-request
+        self.stopping = False
+
+        sock = self.website.network_socket
+        if sock is None:
+            sock = listen( self.website.network_address
+                         , self.website.network_sockfam
+                         , backlog=self.website.backlog
+                          )
+        self.servers = []
+        for sock in [sock] + list(self.website.extra_sockets):
+            sock.setblocking(False)
+            server = asyncio.start_server( self.handle
+                                         , sock=sock
+                                         , limit=LIMIT
+                                         , loop=self.loop
+                                          )
+            self.servers.append(self.loop.run_until_complete(server))
+
+    def start(self):
+        self.thread = threading.Thread(target=self.loop.run_forever,
+                                       name="aspen-asyncio")
+        self.thread.daemon = True
+        self.thread.start()
+        while self.thread.is_alive():
+            self.thread.join(1)     # with a timeout, so we can take signals
+
+    def stop(self):
+        """Stop accepting, let in-flight requests finish, and stop the loop.
+        """
+        if self.thread is None or not self.thread.is_alive():
+            return
+        done = threading.Event()
+        def drain():
+            task = asyncio.ensure_future(self.drain(), loop=self.loop)
+            task.add_done_callback(lambda f: (self.loop.stop(), done.set()))
+        self.loop.call_soon_threadsafe(drain)
+        done.wait(self.website.drain_timeout + 1)
+        self.thread.join(1)
+        self.executor.shutdown(wait=False)
+
+    @asyncio.coroutine
+    def drain(self):
+        self.stopping = True
+        for server in self.servers:
+            server.close()
+        deadline = time.time() + self.website.drain_timeout
+        while time.time() < deadline:
+            for writer, busy in list(self.connections.items()):
+                if not busy:
+                    writer.close()
+            if not self.connections:
+                break
+            yield From(asyncio.sleep(0.05, loop=self.loop))
+        for writer in list(self.connections):
+            writer.close()
+
+    def start_checking(self, check_all):
+        def loop():
+            while True:
+                check_all()
+                time.sleep(0.5)
+        checker = threading.Thread(target=loop)
+        checker.daemon = True
+        checker.start()
+
+
+    # HTTP
+    # ====
+
+    @asyncio.coroutine
+    def handle(self, reader, writer):
+        """Serve requests from one connection until it's done.
+        """
+        self.connections[writer] = False
+        limit = self.website.keep_alive_requests
+        served = 0
+        try:
+            while not self.stopping:
+                try:
+                    line = yield From(self.read_line(reader))
+                    if not line:
+                        break           # they hung up, or went quiet
+                    self.connections[writer] = True
+                    request = yield From(self.read_request(line, reader,
+                                                           writer))
+                except BadRequest, exc:
+                    writer.write(b"HTTP/1.1 %s\r\n"
+                                 b"Content-Length: 0\r\n"
+                                 b"Connection: close\r\n\r\n" % exc.status)
+                    aspen.log("Bad request: %s" % exc)
+                    break
+                environ, keep_alive = request
+                served += 1
+                if served == limit:
+                    keep_alive = False
+                response = yield From(self.loop.run_in_executor( None
+                                                               , call_app
+                                                               , self.website
+                                                               , environ
+                                                                ))
+                keep_alive = self.write_response(writer, environ, response,
+                                                 keep_alive)
+                yield From(writer.drain())
+                self.connections[writer] = False
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError,
+                IOError):
+            pass    # short or slow read, an overlong line, or a reset connection
+        except Exception:
+            aspen.log_dammit(traceback.format_exc())
+        finally:
+            self.connections.pop(writer, None)
+            writer.close()
+
+    @asyncio.coroutine
+    def read_line(self, reader):
+        """Read a line, or return b'' on EOF or timeout.
+        """
+        try:
+            line = yield From(asyncio.wait_for(reader.readline(),
+                                               self.website.socket_timeout,
+                                               loop=self.loop))
+        except asyncio.TimeoutError:
+            line = b''
+        raise Return(line)
+
+    @asyncio.coroutine
+    def read_exactly(self, reader, n):
+        """Read n bytes, raising TimeoutError if they're slow to arrive.
+        """
+        data = yield From(asyncio.wait_for(reader.readexactly(n),
+                                           self.website.socket_timeout,
+                                           loop=self.loop))
+        raise Return(data)
+
+    @asyncio.coroutine
+    def read_request(self, line, reader, writer):
+        """Read the rest of a request, and return a WSGI environ and whether
+        the client wants to keep the connection open.
+        """
+        while line in (b'\r\n', b'\n'):     # RFC 2616 sec 4.1: ignore these
+            line = yield From(self.read_line(reader))
+        parts = line.split()
+        if len(parts) != 3 or not parts[2].startswith(b'HTTP/'):
+            raise BadRequest("malformed request line")
+        method, uri, version = parts
+
+        headers = []
+        while True:
+            line = yield From(self.read_line(reader))
+            if not line:
+                raise BadRequest("incomplete headers")
+            if line in (b'\r\n', b'\n'):
+                break
+            if line[0] in b' \t' and headers:   # folded
+                name, value = headers[-1]
+                headers[-1] = (name, value + b' ' + line.strip())
+                continue
+            if b':' not in line:
+                raise BadRequest("malformed header")
+            name, value = line.split(b':', 1)
+            headers.append((name.strip(), value.strip()))
+            if len(headers) > MAX_HEADERS:
+                raise BadRequest("too many headers")
+
+        environ = make_environ(method, uri, version, headers, writer)
+        connection = environ.get('HTTP_CONNECTION', b'').lower()
+        if version == b'HTTP/1.1':
+            keep_alive = connection != b'close'
+        else:
+            keep_alive = connection == b'keep-alive'
+
+        # We buffer the whole body, so refuse one that's too big before we
+        # tell the client to go ahead and send it.
+        max_size = self.website.max_body_size
+        chunked = b'chunked' in environ.get('HTTP_TRANSFER_ENCODING', b'')
+        length = 0
+        if not chunked:
+            try:
+                length = int(environ.get('CONTENT_LENGTH') or 0)
+            except ValueError:
+                raise BadRequest("bad Content-Length")
+            if max_size and length > max_size:
+                raise TooLarge("body of %d bytes" % length)
+
+        if environ.get('HTTP_EXPECT', b'').lower() == b'100-continue':
+            writer.write(STATUS_CONTINUE)
+
+        if chunked:
+            body = yield From(self.read_chunked(reader, max_size))
+            environ['CONTENT_LENGTH'] = str(len(body))
+        else:
+            body = b''
+            if length > 0:
+                body = yield From(self.read_exactly(reader, length))
+        environ['wsgi.input'] = StringIO(body)
+        raise Return((environ, keep_alive))
+
+    @asyncio.coroutine
+    def read_chunked(self, reader, max_size):
+        chunks = []
+        total = 0
+        while True:
+            line = yield From(self.read_line(reader))
+            try:
+                size = int(line.split(b';', 1)[0].strip(), 16)
+            except ValueError:
+                raise BadRequest("bad chunk size")
+            if size == 0:
+                break
+            total += size
+            if max_size and total > max_size:
+                raise TooLarge("chunked body over %d bytes" % max_size)
+            chunk = yield From(self.read_exactly(reader, size + 2))  # and CRLF
+            chunks.append(chunk[:-2])
+        while True:                                             # trailers
+            line = yield From(self.read_line(reader))
+            if line in (b'\r\n', b'\n', b''):
+                break
+        raise Return(b''.join(chunks))
+
+    def write_response(self, writer, environ, response, keep_alive):
+        """Write a response, and return whether to keep the connection open.
+        """
+        status, headers, chunks = response
+        names = set(name.lower() for name, value in headers)
+        if b'connection' in names:
+            for name, value in headers:
+                if name.lower() == b'connection' and value.lower() == b'close':
+                    keep_alive = False
+        if b'content-length' not in names and not status.startswith(NO_BODY):
+            if environ['REQUEST_METHOD'] == b'HEAD':
+                keep_alive = False  # we can't tell how long it would be
+            else:
+                headers.append((b'Content-Length',
+                                str(sum(len(chunk) for chunk in chunks))))
+
+        out = [b"HTTP/1.1 %s\r\n" % status]
+        for name, value in headers:
+            if name.lower() not in HOP_BY_HOP:
+                out.append(b"%s: %s\r\n" % (name, value))
+        if b'date' not in names:
+            out.append(b"Date: %s\r\n" % http_date())
+        out.append(b"Server: %s\r\n" % SOFTWARE)
+        if not keep_alive:
+            out.append(b"Connection: close\r\n")
+        elif environ['SERVER_PROTOCOL'] == b'HTTP/1.0':
+            out.append(b"Connection: keep-alive\r\n")
+        out.append(b"\r\n")
+        if environ['REQUEST_METHOD'] != b'HEAD':
+            out.extend(chunks)
+        writer.write(b''.join(out))
+        return keep_alive
+
+    Buffer = AsyncioBuffer
+    Loop = AsyncioLoop
+
+
+def make_environ(method, uri, version, headers, writer):
+    """Given the parts of a request and a StreamWriter, return a WSGI environ.
+    """
+    path, _, querystring = uri.partition(b'?')
+    if path.startswith(b'http://') or path.startswith(b'https://'):
+        path = b'/' + path.split(b'/', 3)[-1]   # absolute URI
+    sockname = writer.get_extra_info('sockname')
+    peername = writer.get_extra_info('peername')
+    environ = { 'REQUEST_METHOD': method
+              , 'SCRIPT_NAME': b''
+              , 'PATH_INFO': urllib.unquote(path)
+              , 'QUERY_STRING': querystring
+              , 'SERVER_PROTOCOL': version
+              , 'SERVER_SOFTWARE': SOFTWARE
+              , 'SERVER_NAME': b''
+              , 'SERVER_PORT': b''
+              , 'REMOTE_ADDR': b''
+              , 'wsgi.version': (1, 0)
+              , 'wsgi.url_scheme': b'http'
+              , 'wsgi.errors': sys.stderr
+              , 'wsgi.multithread': True
+              , 'wsgi.multiprocess': False
+              , 'wsgi.run_once': False
+               }
+    if isinstance(sockname, tuple):
+        environ['SERVER_NAME'] = str(sockname[0])
+        environ['SERVER_PORT'] = str(sockname[1])
+    if isinstance(peername, tuple):
+        environ['REMOTE_ADDR'] = str(peername[0])
+    for name, value in headers:
+        key = name.upper().replace(b'-', b'_')
+        if key not in (b'CONTENT_TYPE', b'CONTENT_LENGTH'):
+            key = b'HTTP_' + key
+        if key in environ:
+            value = environ[key] + b', ' + value
+        environ[key] = value
+    return environ
+
+
+def call_app(website, environ):
+    """Given a website and a WSGI environ, return (status, headers, chunks).
+
+    This runs in a worker thread. We read the whole body here, since reading
+    it may block.
+
+    """
+    started = []
+    def start_response(status, headers, exc_info=None):
+        started[:] = [status, list(headers)]
+    result = website(environ, start_response)
+    try:
+        chunks = [chunk for chunk in result if chunk]
+    finally:
+        close = getattr(result, 'close', None)
+        if close is not None:
+            close()
+    if not started:
+        aspen.log_dammit("The app returned without calling start_response.")
+        return INTERNAL_SERVER_ERROR, [], []
+    status, headers = started
+    return status, headers, chunks
@@ -3,30 +3,196 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import logging
 import time
 import threading
 
+import cheroot.server
 import cheroot.wsgi
+from cheroot.workers import threadpool
 from aspen.network_engines import ThreadedEngine
 
 
+RESIZE_EVERY = 0.1      # seconds between looking at the size of the pool
+SHRINK_EVERY = 1.0      # seconds between retiring idle threads
+
+
+class ThreadPool(threadpool.ThreadPool):
+    """A pool of worker threads that grows and shrinks between min and max.
+
+    We add threads as soon as connections are waiting and none are idle, and
+    we retire one idle thread at a time, so that a burst of traffic doesn't
+    set us thrashing. If max isn't more than min, the pool stays put.
+
+    """
+
+    last_resize = 0
+    last_change = 0
+
+    def resize(self):
+        if self.max <= self.min:
+            return
+        now = time.time()
+        if now - self.last_resize < RESIZE_EVERY:
+            return
+        self.last_resize = now
+
+        # Threads we've asked to stop linger in the list until culled.
+        self._threads = [t for t in self._threads if t.isAlive()]
+        queued = self.qsize
+        idle = self.idle
+        if queued and not idle:
+            self.grow(queued)
+            self.last_change = now
+        elif not queued and idle > 1 and now - self.last_change >= SHRINK_EVERY:
+            self.shrink(1)
+            self.last_change = now
+
+
+class HTTPRequest(cheroot.server.HTTPRequest):
+    """Close the connection after server.keep_alive_requests requests.
+    """
+
+    def parse_request(self):
+        cheroot.server.HTTPRequest.parse_request(self)
+        limit = self.server.keep_alive_requests
+        if limit:
+            self.conn.served += 1
+            if self.conn.served >= limit:
+                self.close_connection = True
+
+
+class HTTPConnection(cheroot.server.HTTPConnection):
+    RequestHandlerClass = HTTPRequest
+    served = 0
+
+
+class WSGIServer(cheroot.wsgi.WSGIServer):
+    """A cheroot WSGIServer that can serve on a socket that's already listening.
+
+    Cheroot's own start method always creates and binds a new socket, and for
+    AF_UNIX it unlinks the path first. When a listener is given (see
+    aspen.prefork) we skip all that and accept on the listener instead.
+
+    """
+
+    ConnectionClass = HTTPConnection
+    keep_alive_requests = 0
+    listener = None
+
+    def __init__(self, *a, **kw):
+        cheroot.wsgi.WSGIServer.__init__(self, *a, **kw)
+        self.requests = ThreadPool(self, self.requests.min, self.requests.max)
+
+    def tick(self):
+        cheroot.wsgi.WSGIServer.tick(self)
+        self.requests.resize()
+
+    def start(self):
+        if self.listener is None:
+            return cheroot.wsgi.WSGIServer.start(self)
+
+        self._interrupt = None
+        if self.software is None:
+            self.software = b"%s Server" % self.version
+        self.socket = self.listener
+        self.socket.settimeout(1)   # so that we notice self.ready
+        self.requests.start()
+        self.ready = True
+        self._start_time = time.time()
+        while self.ready:
+            try:
+                self.tick()
+            except (KeyboardInterrupt, SystemExit):
+                raise
+            except:
+                self.error_log("Error in HTTPServer.tick", level=logging.ERROR,
+                               traceback=True)
+            if self.interrupt:
+                while self.interrupt is True:
+                    time.sleep(0.1)
+                if self.interrupt:
+                    raise self.interrupt
+
+    def stop(self):
+        if self.listener is None:
+            return cheroot.wsgi.WSGIServer.stop(self)
+
+        # Cheroot connects to its own socket to wake up accept, but other
+        # processes share ours, so we'd wake one of them instead. Our accept
+        # times out within a second anyway.
+        self.ready = False
+        if self._start_time is not None:
+            self._run_time += (time.time() - self._start_time)
+        self._start_time = None
+        self.socket = None
+        self.listener.close()
+        self.requests.stop(self.shutdown_timeout)
+
+
 class Engine(ThreadedEngine):
+    """Serve with cheroot.
+
+    Each of website.extra_sockets gets a server of its own, with its own pool
+    of threads, running in a thread of its own.
+
+    """
 
     cheroot_server = None
+    extra_servers = ()
 
     def bind(self):
+        website = self.website
+        self.cheroot_server = self.make_server(website.network_socket)
+        self.extra_servers = [ self.make_server(listener)
+                               for listener in website.extra_sockets
+                              ]
+
+    def make_server(self, listener):
         name = "Aspen! Cheroot!"
-        self.cheroot_server = cheroot.wsgi.WSGIServer( self.website.network_address
-                                                     , server_name=name
-                                                     , wsgi_app=self.website
-                                                      )
+        website = self.website
+        if listener is not None:
+            address = listener.getsockname()
+        else:
+            address = website.network_address
+        server = WSGIServer( address
+                           , server_name=name
+                           , wsgi_app=website
+                           , minthreads=website.threads
+                           , maxthreads=max(website.threads, website.max_threads)
+                            )
+        server.listener = listener
+        server.request_queue_size = website.backlog
+        server.timeout = website.socket_timeout
+        server.shutdown_timeout = website.drain_timeout
+        server.keep_alive_requests = website.keep_alive_requests
+        return server
 
     def start(self):
+        for server in self.extra_servers:
+            thread = threading.Thread(target=server.start,
+                                      name="aspen-cheroot-extra")
+            thread.daemon = True
+            thread.start()
         self.cheroot_server.start()
 
     def stop(self):
+        for server in self.extra_servers:
+            server.stop()
         self.cheroot_server.stop()
 
+    def worker_stats(self):
+        pools = [ getattr(server, 'requests', None)
+                  for server in [self.cheroot_server] + list(self.extra_servers)
+                 ]
+        pools = [pool for pool in pools if pool is not None]
+        if not pools:
+            return None
+        return { 'threads': sum(len(pool._threads) for pool in pools)
+               , 'idle': sum(pool.idle for pool in pools)
+               , 'queued': sum(pool.qsize for pool in pools)
+                }
+
     def start_checking(self, check_all):
 
         def loop():
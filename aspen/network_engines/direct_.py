@@ -0,0 +1,458 @@
+"""A threaded engine that parses HTTP straight into Aspen's Request.
+
+Other engines speak WSGI: the server parses a request into an environ, and
+Request.from_wsgi reconstructs the request from that as best it can. This
+engine cuts out the middleman. We read the request line and headers off the
+socket, and hand the bytes as they were on the wire to Request. On the way
+out we serialize the Response ourselves (see Response.to_wire). That means
+WSGI middleware wrapped around website.wsgi_app doesn't apply here.
+
+We handle keep-alive, pipelining, chunked request bodies, and Expect:
+100-continue. Use it with `--network_engine=direct`.
+
+Connections are accepted on the main thread and served by a fixed pool of
+worker threads, one connection at a time per thread, as with cheroot. We
+accept on website.extra_sockets too, if there are any.
+
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import errno
+import select
+import socket
+import threading
+import time
+import traceback
+import Queue
+
+import aspen
+from aspen.http.request import Request
+from aspen.http.response import Response
+from aspen.network_engines import ThreadedEngine, http_date, listen
+
+
+SOFTWARE = b"Aspen! Direct!"
+MAX_HEADERS = 100
+LIMIT = 65536           # the longest line we'll read
+BUFSIZE = 65536         # how much to read off the socket at a time
+COALESCE = 65536        # gather writes up to this size into one send
+
+STATUS_CONTINUE = b"HTTP/1.1 100 Continue\r\n\r\n"
+BAD_REQUEST = ( b"HTTP/1.1 %s\r\n"
+                b"Content-Length: 0\r\n"
+                b"Connection: close\r\n\r\n"
+               )
+FRAMING = set([ b'connection', b'content-length', b'expect', b'host'
+              , b'transfer-encoding'
+               ])
+HOP_BY_HOP = set([b'connection', b'keep-alive', b'transfer-encoding'])
+NO_BODY = (b'1', b'204', b'304')
+ACCEPT_AGAIN = ( errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR
+               , errno.ECONNABORTED
+                )
+
+
+class BadRequest(Exception):
+    status = b"400 Bad Request"
+
+class TooLarge(BadRequest):
+    status = b"413 Request Entity Too Large"
+
+
+class Input(object):
+    """Model a request body on the wire, as a file-like object for Body.
+
+    We send 100 Continue if the client is waiting for it, but only once Body
+    actually reads from us.
+
+    """
+
+    def __init__(self, conn, rfile, length, chunked, expect_continue,
+                 max_size=0):
+        self.conn = conn
+        self.rfile = rfile
+        self.length = length
+        self.chunked = chunked
+        self.max_size = max_size
+        self.expect_continue = expect_continue
+        self.done = False
+
+    def read(self):
+        if self.done:
+            return b''
+        if self.expect_continue:
+            self.conn.sendall(STATUS_CONTINUE)
+        if self.chunked:
+            raw = read_chunked(self.rfile, self.max_size)
+        else:
+            raw = self.rfile.read(self.length)
+            if len(raw) < self.length:
+                raise BadRequest("incomplete body")
+        self.done = True
+        return raw
+
+
+class Engine(ThreadedEngine):
+
+    listener = None
+    ready = False
+
+    def bind(self):
+        listener = self.website.network_socket
+        if listener is None:
+            listener = listen( self.website.network_address
+                             , self.website.network_sockfam
+                             , backlog=self.website.backlog
+                              )
+        self.listener = listener
+        self.listeners = [listener] + list(self.website.extra_sockets)
+        sockname = listener.getsockname()
+        if isinstance(sockname, tuple):
+            self.host = b'%s:%d' % (sockname[0], sockname[1])
+        else:
+            self.host = b'localhost'
+        self.queue = Queue.Queue()
+        self.threads = []
+        self.idle = 0
+        self.idle_lock = threading.Lock()
+        self.connections = {}   # socket => whether it's mid-request
+
+    def start(self):
+        self.ready = True
+        for i in range(self.website.threads):
+            thread = threading.Thread(target=self.work,
+                                      name="aspen-direct-%d" % i)
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+        for listener in self.listeners:
+            listener.setblocking(False) # other processes may beat us to it
+        while self.ready:
+            try:
+                readable = select.select(self.listeners, [], [], 1)[0]
+            except (select.error, socket.error), exc:
+                if not self.ready:
+                    break               # stop closed the listeners on us
+                if exc.args[0] == errno.EINTR:
+                    continue
+                raise
+            for listener in readable:
+                try:
+                    conn, addr = listener.accept()
+                except socket.error, exc:
+                    if not self.ready:
+                        break
+                    if exc.args[0] in ACCEPT_AGAIN:
+                        continue
+                    raise
+                conn.settimeout(self.website.socket_timeout)
+                self.queue.put((conn, addr))
+
+    def stop(self):
+        """Stop accepting, let in-flight requests finish, and stop the pool.
+        """
+        if not self.ready:
+            return
+        self.ready = False
+        for listener in self.listeners:
+            listener.close()
+        for thread in self.threads:
+            self.queue.put(None)        # after any connections still queued
+        deadline = time.time() + self.website.drain_timeout
+        while time.time() < deadline:
+            for conn, busy in list(self.connections.items()):
+                if not busy:
+                    hang_up(conn)
+            if not any(thread.is_alive() for thread in self.threads):
+                break
+            time.sleep(0.05)
+        for conn in list(self.connections):
+            hang_up(conn)
+
+    def worker_stats(self):
+        if self.listener is None:
+            return None
+        return { 'threads': len(self.threads)
+               , 'idle': self.idle
+               , 'queued': self.queue.qsize()
+                }
+
+    def start_checking(self, check_all):
+        def loop():
+            while True:
+                check_all()
+                time.sleep(0.5)
+        checker = threading.Thread(target=loop)
+        checker.daemon = True
+        checker.start()
+
+
+    # Workers
+    # =======
+
+    def work(self):
+        while True:
+            with self.idle_lock:
+                self.idle += 1
+            item = self.queue.get()
+            with self.idle_lock:
+                self.idle -= 1
+            if item is None:
+                break
+            try:
+                self.serve(*item)
+            except Exception:
+                aspen.log_dammit(traceback.format_exc())
+
+    def serve(self, conn, addr):
+        """Serve requests from one connection until it's done.
+        """
+        rfile = conn.makefile(str('rb'), BUFSIZE)
+        self.connections[conn] = False
+        limit = self.website.keep_alive_requests
+        served = 0
+        try:
+            while True:
+                line = rfile.readline(LIMIT)
+                while line in (b'\r\n', b'\n'):     # RFC 2616 sec 4.1
+                    line = rfile.readline(LIMIT)
+                if not line:
+                    break                           # they hung up
+                self.connections[conn] = True
+                try:
+                    request, keep_alive = self.read_request(line, conn, rfile)
+                except BadRequest, exc:
+                    conn.sendall(BAD_REQUEST % exc.status)
+                    aspen.log("Bad request: %s" % exc)
+                    break
+                served += 1
+                if served == limit:
+                    keep_alive = False
+                if isinstance(addr, tuple):
+                    request.remote_addr = addr[0]
+                request.website = self.website
+                response = self.website.handle_safely(request)
+                response.request = request
+                keep_alive = self.write_response(conn, request, response,
+                                                 keep_alive)
+                self.connections[conn] = False
+                if not keep_alive or not self.ready:
+                    break
+        except socket.error:
+            pass    # a timeout, or a reset connection
+        finally:
+            self.connections.pop(conn, None)
+            rfile.close()
+            conn.close()
+
+
+    # HTTP
+    # ====
+
+    def read_request(self, line, conn, rfile):
+        """Read the rest of a request, and return a Request and whether the
+        client wants to keep the connection open.
+        """
+        if not line.endswith(b'\n'):
+            raise BadRequest("request line too long")
+        parts = line.split()
+        if len(parts) != 3 or not parts[2].startswith(b'HTTP/'):
+            raise BadRequest("malformed request line")
+        method, uri, version = parts
+
+        # We only look at the few headers that frame the message. Request
+        # parses the whole lot, from the bytes as they came in.
+        lines = []
+        framing = {}
+        while True:
+            line = rfile.readline(LIMIT)
+            if not line.endswith(b'\n'):
+                raise BadRequest("incomplete headers")
+            if line in (b'\r\n', b'\n'):
+                break
+            line = line.rstrip(b'\r\n')
+            if line[0] in b' \t' and lines:         # folded
+                lines[-1] += b' ' + line.strip()
+                continue
+            name, colon, value = line.partition(b':')
+            if not colon:
+                raise BadRequest("malformed header")
+            name = name.strip().lower()
+            if name in FRAMING:
+                framing[name] = value.strip()
+            lines.append(line)
+            if len(lines) > MAX_HEADERS:
+                raise BadRequest("too many headers")
+        if b'host' not in framing and version == b'HTTP/1.0':
+            lines.append(b'Host: ' + self.host)
+
+        connection = framing.get(b'connection', b'').lower()
+        if version == b'HTTP/1.1':
+            keep_alive = connection != b'close'
+        else:
+            keep_alive = connection == b'keep-alive'
+
+        chunked = b'chunked' in framing.get(b'transfer-encoding', b'').lower()
+        length = framing.get(b'content-length', b'0')
+        if not length.isdigit():
+            raise BadRequest("bad Content-Length")
+        length = int(length)
+        max_size = self.website.max_body_size
+        if max_size and length > max_size:
+            raise TooLarge("body of %d bytes" % length)   # before 100 Continue
+        body = None
+        if chunked or length:
+            expect = framing.get(b'expect', b'').lower() == b'100-continue'
+            body = Input(conn, rfile, length, chunked, expect, max_size)
+
+        try:
+            request = Request(method, uri, SOFTWARE, version,
+                              b'\r\n'.join(lines), body)
+        except (BadRequest, socket.error):
+            raise
+        except Response, response:
+            raise BadRequest(response.body)
+        except Exception, exc:
+            raise BadRequest("%s: %s" % (exc.__class__.__name__, exc))
+        if body is not None and not body.done:
+            keep_alive = False      # we'd have to skip past it
+        return request, keep_alive
+
+    def write_response(self, conn, request, response, keep_alive):
+        """Write a Response, and return whether to keep the connection open.
+        """
+        status, headers, body = response.to_wire()
+        head = [b"HTTP/1.1 %s\r\n" % status]
+        names = set()
+        for name, value in headers:
+            lower = name.lower()
+            names.add(lower)
+            if lower in HOP_BY_HOP:
+                if lower == b'connection' and value.lower() == b'close':
+                    keep_alive = False
+                continue
+            head.append(b"%s: %s\r\n" % (name, value))
+
+        chunked = False
+        if request.line.method.raw == b'HEAD' or status.startswith(NO_BODY):
+            body = []
+        elif b'content-length' in names:
+            pass
+        elif isinstance(body, list):
+            head.append(b"Content-Length: %d\r\n" % sum(map(len, body)))
+        elif request.line.version.raw == b'HTTP/1.1':
+            chunked = True
+            head.append(b"Transfer-Encoding: chunked\r\n")
+        else:
+            keep_alive = False      # the end of the body is the end of it
+
+        if b'date' not in names:
+            head.append(b"Date: %s\r\n" % http_date())
+        head.append(b"Server: %s\r\n" % SOFTWARE)
+        if not keep_alive:
+            head.append(b"Connection: close\r\n")
+        elif request.line.version.raw == b'HTTP/1.0':
+            head.append(b"Connection: keep-alive\r\n")
+        head.append(b"\r\n")
+        head = b''.join(head)
+
+        try:
+            if isinstance(body, list):
+                send(conn, [head] + body)
+            else:
+                stream(conn, head, body, chunked)
+        finally:
+            close = getattr(response.body, 'close', None)
+            if close is not None:
+                close()     # to_wire wraps it, so we have to do this
+        return keep_alive
+
+
+def read_chunked(rfile, max_size=0):
+    """Given a file and a size limit (0 for none), read a chunked body from the
+    file, and return it.
+    """
+    chunks = []
+    total = 0
+    while True:
+        line = rfile.readline(LIMIT)
+        try:
+            size = int(line.split(b';', 1)[0].strip(), 16)
+        except ValueError:
+            raise BadRequest("bad chunk size")
+        if size == 0:
+            break
+        total += size
+        if max_size and total > max_size:
+            raise TooLarge("chunked body over %d bytes" % max_size)
+        chunk = rfile.read(size + 2)    # and CRLF
+        if len(chunk) < size + 2:
+            raise BadRequest("incomplete chunk")
+        chunks.append(chunk[:-2])
+    while True:                         # trailers
+        line = rfile.readline(LIMIT)
+        if line in (b'\r\n', b'\n', b''):
+            break
+    return b''.join(chunks)
+
+
+def send(conn, buffers):
+    """Given a socket and a list of bytestrings, send them all.
+
+    Python 2 sockets have no sendmsg, so we can't do a true vectored write.
+    Instead we gather small buffers into a single send, and send big ones
+    as they are, rather than copying them.
+
+    """
+    pending = []
+    size = 0
+    for buf in buffers:
+        if len(buf) >= COALESCE:
+            if pending:
+                conn.sendall(b''.join(pending))
+                pending = []
+                size = 0
+            conn.sendall(buf)
+        elif buf:
+            pending.append(buf)
+            size += len(buf)
+            if size >= COALESCE:
+                conn.sendall(b''.join(pending))
+                pending = []
+                size = 0
+    if pending:
+        conn.sendall(b''.join(pending))
+
+
+def stream(conn, head, body, chunked):
+    """Given a socket, a head, an iterable body, and a boolean, send them.
+
+    Each chunk goes out as soon as we have it, framed if chunked is True,
+    since a streaming body may be slow in coming.
+
+    """
+    buffers = [head]
+    for chunk in body:
+        if not chunk:
+            continue
+        if chunked:
+            buffers.extend([b"%x\r\n" % len(chunk), chunk, b"\r\n"])
+        else:
+            buffers.append(chunk)
+        send(conn, buffers)
+        buffers = []
+    if chunked:
+        buffers.append(b"0\r\n\r\n")
+    send(conn, buffers)
+
+
+def hang_up(conn):
+    """Given a socket, shut it down, waking up anyone reading from it.
+    """
+    try:
+        conn.shutdown(socket.SHUT_RDWR)
+    except socket.error:
+        pass
@@ -133,20 +133,44 @@ class GeventLoop(object):
 
 class Engine(CooperativeEngine):
 
-    wsgi_server = None # a WSGI server, per gevent
+    gevent_server = None # a WSGI server, per gevent
+    extra_servers = ()   # more of them, for website.extra_sockets
 
     def bind(self):
-        self.gevent_server = gevent.wsgi.WSGIServer( listener=self.website.network_address
-                                                   , application=self.website
-                                                   , log=None
-                                                    )
+        listener = self.website.network_socket
+        if listener is None:
+            listener = self.website.network_address
+        self.gevent_server = self.make_server(listener)
+        self.extra_servers = [ self.make_server(sock)
+                               for sock in self.website.extra_sockets
+                              ]
+
+    def make_server(self, listener):
+        return gevent.wsgi.WSGIServer( listener=listener
+                                     , application=self.website
+                                     , log=None
+                                      )
 
     def sleep(self, seconds):
         gevent.sleep(seconds)
 
+    def start_timeout(self, seconds, exception):
+        return gevent.Timeout.start_new(seconds, exception)
+
     def start(self):
+        for server in self.extra_servers:
+            server.start()
         self.gevent_server.serve_forever()
 
+    def stop(self):
+        deadline = time.time() + self.website.drain_timeout
+        for server in self.extra_servers:
+            server.close()      # stop accepting while we drain the main one
+        if self.gevent_server is not None:
+            self.gevent_server.stop(timeout=self.website.drain_timeout)
+        for server in self.extra_servers:
+            server.stop(timeout=max(deadline - time.time(), 0))
+
     def start_checking(self, check_all):
         def loop():
             while True:
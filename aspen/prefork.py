@@ -0,0 +1,403 @@
+"""Serve a website from several processes that share a listening socket.
+
+If website.workers is set, aspen.server hands off to a Master instead of
+serving in-process. The master binds the listening socket and then forks that
+many workers, each of which serves on the shared socket with the website's
+network engine. That way we get more than one core's worth of Python. The
+master doesn't handle requests itself. It replaces workers that die, and it
+passes signals along:
+
+    TERM, INT, QUIT     drain the workers and exit
+    HUP                 re-execute, start new workers, and drain the old ones
+
+With reuse_port, the master doesn't bind at all. Each worker binds its own
+socket with SO_REUSEPORT, and the kernel spreads connections evenly among
+them, instead of handing each one to whichever worker happens to be waiting.
+
+Workers can be recycled, to bound the damage from slow leaks. With
+max_requests, a worker asks to be replaced after serving that many requests
+(plus a random number up to max_requests_jitter, so they don't all go at
+once), and with max_rss, after its resident set grows past that many
+megabytes. The master starts the replacement first, and then drains the old
+worker as for a reload.
+
+Workers are forked after the website is configured, so they share the cost of
+that, but each of them runs the startup hooks, since those tend to set up
+things like database connections that don't survive a fork.
+
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import errno
+import os
+import random
+import signal
+import sys
+import time
+import traceback
+
+try:
+    import fcntl
+    import resource
+except ImportError:     # Windows, where we don't fork anyway
+    fcntl = resource = None
+
+import aspen
+from aspen import execution
+from aspen.network_engines import listen
+
+
+RESPAWN_DELAY = 1.0     # don't replace a worker that died younger than this
+                        # any faster than this, lest we spin
+PAGE_SIZE = resource.getpagesize() if resource is not None else 4096
+RSS_EVERY = 16          # requests between checks of a worker's RSS
+KILL_AFTER = 5.0        # seconds past website.drain_timeout that we wait for
+                        # a worker to stop before we kill it
+
+
+class Master(object):
+    """Fork and supervise worker processes for a website.
+    """
+
+    def __init__(self, website):
+        self.website = website
+        self.listener = None
+        self.reuse_port = False
+        self.workers = {}           # pid => time started
+        self.draining = {}          # pid => time asked to stop
+        self.pipes = {}             # pid => read end of a pipe from the worker
+        self.stopping = False
+        self.reexecuting = False
+
+    def run(self):
+        """Bind, fork workers, and supervise them until we're told to stop.
+        """
+        website = self.website
+        self.reuse_port = website.reuse_port
+        if self.reuse_port and isinstance(website.network_address, basestring):
+            aspen.log_dammit("Can't use SO_REUSEPORT with an AF_UNIX socket; "
+                             "sharing one socket instead.")
+            self.reuse_port = False
+        if self.reuse_port and (website.extra_sockets or
+                                not bound_to(website.network_socket,
+                                             website.network_address)):
+            aspen.log_dammit("Can't use SO_REUSEPORT with sockets passed to "
+                             "us; sharing them instead.")
+            self.reuse_port = False
+        if self.reuse_port:
+            if website.network_socket is not None:
+                website.network_socket.close()  # each worker binds its own
+                website.network_socket = None
+        elif website.network_socket is not None:
+            self.listener = website.network_socket  # handed to us; see below
+        else:
+            self.listener = listen( website.network_address
+                                  , website.network_sockfam
+                                  , backlog=website.backlog
+                                   )
+        self.install_signal_handlers()
+        if website.changes_reload:
+            execution.execute = self.reexecute
+        try:
+            for i in range(website.workers):
+                self.spawn()
+            self.drain_predecessors()
+            while not self.stopping:
+                self.reap()
+                self.recycle()
+                self.kill_overdue()
+                if website.changes_reload:
+                    execution.check_all()
+                time.sleep(0.5)
+        except:
+            self.reexecuting = False
+            raise
+        finally:
+            if self.reexecuting:
+                self.hand_off()
+            else:
+                self.stop_workers()
+                if self.listener is not None:
+                    self.listener.close()
+        if self.reexecuting:
+            execution._do_execv()
+
+    def install_signal_handlers(self):
+        def stop(signum, frame):
+            aspen.log_dammit("Received %s, stopping workers." % SIGNALS[signum])
+            self.stopping = True
+        def hup(signum, frame):
+            aspen.log_dammit("Received HUP, re-executing.")
+            self.reexecute()
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGQUIT, stop)
+        signal.signal(signal.SIGHUP, hup)
+
+    def reexecute(self):
+        """Re-execute the master, leaving the workers running for now.
+        """
+        self.stopping = self.reexecuting = True
+
+
+    # Reloading
+    # =========
+    # When we re-execute, our workers (which are still our children, since
+    # exec keeps our pid) keep serving until our next incarnation has started
+    # their replacements. Then it asks them to stop accepting and drain.
+
+    def hand_off(self):
+        """Arrange for our next incarnation to inherit our socket and workers.
+        """
+        if self.listener is not None:
+            execution.hand_off(self.listener, *self.website.extra_sockets)
+        pids = list(self.workers) + list(self.draining)
+        os.environ[execution.DRAIN_PIDS] = str(','.join(map(str, pids)))
+
+    def drain_predecessors(self):
+        """Ask the workers our last incarnation left us to drain.
+        """
+        pids = os.environ.pop(execution.DRAIN_PIDS, '')
+        pids = [int(pid) for pid in pids.split(',') if pid]
+        if pids:
+            aspen.log("Draining %d workers from before re-executing."
+                      % len(pids))
+        self.drain(pids)
+
+    def drain(self, pids):
+        """Given a list of pids, ask those workers to stop once they're done.
+        """
+        now = time.time()
+        for pid in pids:
+            self.workers.pop(pid, None)
+            self.draining[pid] = now
+            self.signal(pid, signal.SIGTERM)
+
+    def kill_overdue(self):
+        """Kill workers that have been draining for too long.
+        """
+        deadline = time.time() - self.website.drain_timeout - KILL_AFTER
+        for pid, asked in list(self.draining.items()):
+            if asked < deadline:
+                aspen.log_dammit("Killing worker %d, which didn't stop in time."
+                                 % pid)
+                self.signal(pid, signal.SIGKILL)
+
+
+    # Workers
+    # =======
+
+    def spawn(self):
+        """Fork a worker, and return its pid (in the master).
+        """
+        self.website.access_log.flush()     # or the worker would write out
+        aspen.logging.flush()               # the same lines again
+        reader, writer = os.pipe()
+        pid = os.fork()
+        if pid:
+            os.close(writer)
+            set_nonblocking(reader)
+            self.workers[pid] = time.time()
+            self.pipes[pid] = reader
+            return pid
+
+        status = 0
+        try:
+            os.close(reader)
+            for fd in self.pipes.values():  # our siblings'
+                os.close(fd)
+            self.pipes = {}
+            self.serve(writer)
+        except (KeyboardInterrupt, SystemExit):
+            pass
+        except:
+            aspen.log_dammit(traceback.format_exc())
+            status = 1
+        finally:
+            aspen.logging.flush()
+            os._exit(status)    # never return into the master's loop
+
+    def serve(self, pipe=None):
+        """Serve the website from this (worker) process.
+
+        On TERM we stop accepting, finish the requests we have (waiting up to
+        website.drain_timeout), and exit. Takes the write end of a pipe to the
+        master, on which we ask to be recycled.
+
+        """
+        def exit(signum, frame):
+            raise SystemExit
+        signal.signal(signal.SIGTERM, exit)
+        signal.signal(signal.SIGINT, exit)
+        signal.signal(signal.SIGQUIT, exit)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)   # that's for the master
+        os.environ.pop(execution.DRAIN_PIDS, None)
+
+        website = self.website
+        if self.listener is None:
+            website.network_socket = listen( website.network_address
+                                           , website.network_sockfam
+                                           , reuse_port=True
+                                           , backlog=website.backlog
+                                            )
+        else:
+            website.network_socket = self.listener
+        if pipe is not None and (website.max_requests or website.max_rss):
+            website.hooks.outbound.append(Recycler(website, pipe))
+        aspen.log("Worker %d starting." % os.getpid())
+        website.network_engine.bind()
+        try:
+            website.start()
+        finally:
+            website.stop()
+
+    def reap(self):
+        """Collect workers that have exited, and replace them unless stopping.
+        """
+        while self.workers or self.draining:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except OSError, err:
+                if err.errno == errno.EINTR:
+                    continue
+                if err.errno == errno.ECHILD:
+                    self.workers.clear()
+                    self.draining.clear()
+                    break
+                raise
+            if pid == 0:
+                break
+            pipe = self.pipes.pop(pid, None)
+            if pipe is not None:
+                os.close(pipe)
+            if self.draining.pop(pid, None) is not None:
+                continue
+            started = self.workers.pop(pid, None)
+            if started is None or self.stopping:
+                continue
+            aspen.log_dammit("Worker %d %s; starting another."
+                             % (pid, describe(status)))
+            if time.time() - started < RESPAWN_DELAY:
+                time.sleep(RESPAWN_DELAY)
+            self.spawn()
+
+    def recycle(self):
+        """Replace workers that have asked to be recycled.
+        """
+        for pid, pipe in self.pipes.items():
+            if pid not in self.workers:
+                continue    # already draining
+            try:
+                message = os.read(pipe, 64)
+            except OSError, err:
+                if err.errno in (errno.EAGAIN, errno.EINTR):
+                    continue
+                raise
+            if message and not self.stopping:
+                aspen.log("Recycling worker %d." % pid)
+                self.spawn()
+                self.drain([pid])
+
+    def stop_workers(self):
+        """Ask the workers to drain, wait for them, and kill any stragglers.
+        """
+        self.stopping = True
+        self.drain(list(self.workers))
+        while self.draining:
+            self.reap()
+            self.kill_overdue()
+            time.sleep(0.05)
+
+    def signal(self, pid, signum):
+        try:
+            os.kill(pid, signum)
+        except OSError, err:
+            if err.errno != errno.ESRCH:
+                raise
+
+
+class Recycler(object):
+    """An outbound hook that asks the master to replace this worker when it has
+    served enough requests or grown too big.
+    """
+
+    def __init__(self, website, pipe):
+        self.pipe = pipe
+        self.limit = 0
+        if website.max_requests:
+            jitter = random.randint(0, website.max_requests_jitter)
+            self.limit = website.max_requests + jitter
+        self.max_rss = website.max_rss * 1024 * 1024
+        self.count = 0
+        self.asked = False
+
+    def __call__(self, response):
+        self.count += 1
+        if not self.asked:
+            if self.limit and self.count >= self.limit:
+                self.ask("served %d requests" % self.count)
+            elif self.max_rss and self.count % RSS_EVERY == 0:
+                size = rss()
+                if size is not None and size > self.max_rss:
+                    self.ask("grew to %d MB" % (size // 1024 // 1024))
+        return response
+
+    def ask(self, why):
+        self.asked = True
+        aspen.log("Worker %d %s; asking to be recycled." % (os.getpid(), why))
+        try:
+            os.write(self.pipe, b'r')
+        except OSError:
+            pass    # the master has gone away; nevermind
+
+
+def rss():
+    """Return the resident set size of this process in bytes, or None.
+
+    We read the current size from /proc where we can. Elsewhere we fall back
+    to the peak size, which is good enough for a ceiling.
+
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * PAGE_SIZE
+    except (IOError, ValueError, IndexError):
+        pass
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return maxrss           # bytes
+    return maxrss * 1024        # kilobytes
+
+
+def set_nonblocking(fd):
+    flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+    fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+
+
+def bound_to(sock, address):
+    """Given a listening socket or None, and an address, return whether the
+    socket is one we bound to that address (or there's no socket).
+    """
+    if sock is None:
+        return True
+    name = sock.getsockname()
+    if isinstance(name, tuple):
+        return name[:2] == tuple(address)[:2]
+    return name == address
+
+
+SIGNALS = dict((getattr(signal, name), name[3:])
+               for name in ('SIGTERM', 'SIGINT', 'SIGQUIT', 'SIGHUP'))
+
+
+def describe(status):
+    """Given a status from os.waitpid, return a description of how it exited.
+    """
+    if os.WIFSIGNALED(status):
+        return "was killed by signal %d" % os.WTERMSIG(status)
+    return "exited with status %d" % os.WEXITSTATUS(status)
@@ -0,0 +1,127 @@
+"""Profile individual requests on demand, in production.
+
+If website.profiling_secret is set, then a request that carries a valid token
+in an X-Aspen-Profile header or an aspen_profile querystring parameter is run
+under cProfile. The top functions by cumulative time are logged, and returned
+to the client in Server-Timing headers. Other requests aren't affected.
+
+A token is an expiration time (in seconds since the epoch) and an HMAC of
+that and the URL path, joined by a colon. Make one like so:
+
+    $ python -c "from aspen.profiling import sign; print sign('secret', '/foo')"
+
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import hashlib
+import hmac
+import os
+import re
+import time
+
+import aspen
+
+try:
+    from cProfile import Profile
+except ImportError:     # e.g., Jython
+    from profile import Profile
+
+
+HEADER = b'X-Aspen-Profile'
+PARAM = b'aspen_profile'
+TOP_N = 20
+TTL = 300   # default lifetime of a token, in seconds
+
+unsafe_re = re.compile(r'[^\x20-\x7e]|["\\]')
+
+
+def sign(secret, path, expires=None):
+    """Given a secret, a URL path, and maybe an expiration time, return a token.
+    """
+    if expires is None:
+        expires = int(time.time()) + TTL
+    if isinstance(secret, unicode):
+        secret = secret.encode('UTF-8')
+    expires = str(int(expires))
+    mac = hmac.new(secret, b'%s:%s' % (expires, str(path)), hashlib.sha256)
+    return b'%s:%s' % (expires, mac.hexdigest())
+
+
+def constant_time_compare(a, b):
+    """Given two bytestrings, return whether they're equal, in constant time.
+    """
+    if len(a) != len(b):
+        return False
+    result = 0
+    for x, y in zip(a, b):
+        result |= ord(x) ^ ord(y)
+    return result == 0
+
+
+def is_requested(request, secret):
+    """Given a Request and a secret, return whether to profile the request.
+    """
+    token = request.headers.get(HEADER)
+    if token is None:
+        if PARAM not in request.line.uri.querystring.raw:  # cheap pre-check
+            return False
+        token = request.line.uri.querystring.get(PARAM)
+        if token is None:
+            return False
+    try:
+        token = str(token)
+    except UnicodeError:
+        return False        # ours are ASCII
+    expires = token.split(b':', 1)[0]
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    path = request.line.uri.path.raw
+    return constant_time_compare(token, sign(secret, path, expires))
+
+
+def profile(func, request):
+    """Given a function and a Request, call the one with the other, profiled.
+
+    Return the Response from func, with Server-Timing headers added.
+
+    """
+    profiler = Profile()
+    start = time.time()
+    response = profiler.runcall(func, request)
+    elapsed = time.time() - start
+
+    top = top_functions(profiler, TOP_N)
+    lines = ["Profile for %s (%.3f ms total):" % (request.line, elapsed * 1000)]
+    response.headers.add( 'Server-Timing'
+                        , 'total;dur=%.3f;desc="profiled"' % (elapsed * 1000)
+                         )
+    for i, (cumtime, ncalls, where) in enumerate(top):
+        lines.append("%9.3f ms %7d calls  %s" % (cumtime * 1000, ncalls, where))
+        desc = unsafe_re.sub('?', where)
+        response.headers.add( 'Server-Timing'
+                            , 'f%d;dur=%.3f;desc="%s"' % (i, cumtime * 1000, desc)
+                             )
+    aspen.log('\n'.join(lines))
+    return response
+
+
+def top_functions(profiler, n):
+    """Given a Profile object, return a list of (cumtime, ncalls, where).
+    """
+    profiler.create_stats()
+    out = []
+    for (filename, lineno, funcname), stat in profiler.stats.items():
+        primitive_calls, ncalls, tottime, cumtime, callers = stat
+        if filename == '~':     # builtins
+            where = funcname
+        else:
+            where = "%s:%d(%s)" % ( os.sep.join(filename.split(os.sep)[-2:])
+                                  , lineno
+                                  , funcname
+                                   )
+        out.append((cumtime, ncalls, where))
+    out.sort(reverse=True)
+    return out[:n]
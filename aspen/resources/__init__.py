@@ -46,6 +46,7 @@ from aspen.resources.static_resource import StaticResource
 # =============
 
 __cache__ = dict()  # cache, keyed to filesystem path
+__stats__ = dict(hits=0, misses=0)  # for /metrics; approximate under threads
 
 class Entry:
     """An entry in the global resource cache.
@@ -134,9 +135,11 @@ def get(request):
 
     mtime = os.stat(request.fs)[stat.ST_MTIME]
     if entry.mtime == mtime:  # cache hit
+        __stats__['hits'] += 1
         if entry.exc is not None:
             raise entry.exc
     else:  # cache miss
+        __stats__['misses'] += 1
         try:
             entry.resource = load(request, mtime)
         except:  # capture any Exception
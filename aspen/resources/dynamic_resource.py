@@ -3,7 +3,10 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import time
+
 from aspen import Response
+from aspen.deadlines import check
 from aspen.resources.pagination import split_and_escape, Page
 from aspen.resources.resource import Resource
 
@@ -43,16 +46,32 @@ class DynamicResource(Resource):
         # =================
 
         context = self.populate_context(request, response)
+        metrics = self.website.metrics.get(request.fs)
 
 
         # Exec page two.
         # ==============
 
+        check(request, "before page two")
+        start = time.time()
         try:
             exec self.pages[1] in context
         except Response, response:
             self.process_raised_response(response)
             raise
+        finally:
+            if metrics is not None:
+                metrics.page_two.record(time.time() - start)
+
+        # A simplate can set skip_rendering_for_head in page one or two to
+        # tell us that it doesn't need its content pages rendered to answer a
+        # HEAD request, since the body would just be thrown away.
+
+        if request.line.method == 'HEAD' and \
+                                        context.get('skip_rendering_for_head'):
+            get_response = self.get_head_response
+        else:
+            get_response = self.get_response
 
         # if __all__ is defined, only pass those variables to templates
         # if __all__ is not defined, pass full context to templates
@@ -64,13 +83,18 @@ class DynamicResource(Resource):
         # Hook.
         # =====
 
+        check(request, "before rendering")
+        start = time.time()
         try:
-            response = self.get_response(context)
+            response = get_response(context)
         except Response, response:
             self.process_raised_response(response)
             raise
         else:
             return response
+        finally:
+            if metrics is not None:
+                metrics.render.record(time.time() - start)
 
 
     def populate_context(self, request, response):
@@ -177,3 +201,13 @@ class DynamicResource(Resource):
         """Given a context dictionary, return a Response object.
         """
         raise NotImplementedError
+
+    def get_head_response(self, context):
+        """Given a context dictionary, return a Response object for HEAD.
+
+        This is only called if the simplate opts in with
+        skip_rendering_for_head. Subclasses with content pages override this
+        to skip rendering them.
+
+        """
+        return self.get_response(context)
@@ -68,6 +68,28 @@ class NegotiatedResource(DynamicResource):
     def get_response(self, context):
         """Given a context dict, return a response object.
         """
+        render, media_type = self.negotiate(context)
+        response = context['response']
+        response.body = render(context)
+        self._set_content_type(response, media_type)
+        return response
+
+    def get_head_response(self, context):
+        """Given a context dict, return a response object without rendering.
+
+        We still negotiate, so that Content-Type (or a 404/406) is the same as
+        it would be for a GET.
+
+        """
+        render, media_type = self.negotiate(context)
+        response = context['response']
+        response.body = b''
+        self._set_content_type(response, media_type)
+        return response
+
+    def negotiate(self, context):
+        """Given a context dict, return a (render, media_type) tuple.
+        """
         request = context['request']
 
         # find an Accept header
@@ -94,8 +116,9 @@ class NegotiatedResource(DynamicResource):
                 del failure
                 render = self.renderers[media_type] # KeyError is a bug
 
-        response = context['response']
-        response.body = render(context)
+        return render, media_type
+
+    def _set_content_type(self, response, media_type):
         if 'Content-Type' not in response.headers:
             response.headers['Content-Type'] = media_type
             if media_type.startswith('text/'):
@@ -103,8 +126,6 @@ class NegotiatedResource(DynamicResource):
                 if charset is not None:
                     response.headers['Content-Type'] += '; charset=' + charset
 
-        return response
-
     def _parse_specline(self, specline):
         """Given a bytestring, return a two-tuple.
 
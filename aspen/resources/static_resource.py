@@ -20,7 +20,7 @@ class StaticResource(Resource):
         """
         response = response or Response()
         # XXX Perform HTTP caching here.
-        response.body = self.raw
+        response.body = self.raw    # dropped at the end for HEAD; see Website
         response.headers['Content-Type'] = self.media_type
         if self.media_type.startswith('text/'):
             charset = self.website.charset_static
@@ -19,6 +19,8 @@ def _main(argv):
 
     import aspen
     from aspen import execution
+    from aspen.network_engines import listen
+    from aspen.prefork import Master
     from aspen.website import Website
 
 
@@ -62,24 +64,61 @@ def _main(argv):
     # restarting as needed. Wrap the whole thing in a try/except to
     # do some cleanup on shutdown.
 
+    passed = False  # whether someone else opened our sockets
     try:
-        if hasattr(socket, 'AF_UNIX'):
+        sockets = execution.inherited_sockets()
+        if sockets:
+            aspen.log("Serving on the sockets handed to us on re-execution.")
+        else:
+            sockets = execution.adopt( website.network_fd or
+                                       execution.activated_fds()
+                                      )
+            passed = bool(sockets)
+            if passed:
+                aspen.log("Serving on %d sockets passed to us." % len(sockets))
+        if sockets:
+            website.network_socket = sockets[0]
+            website.extra_sockets = sockets[1:]
+        elif hasattr(socket, 'AF_UNIX'):
             if website.network_sockfam == socket.AF_UNIX:
                 if os.path.exists(website.network_address):
                     aspen.log("Removing stale socket.")
                     os.remove(website.network_address)
-        if website.network_port is not None:
+        if sockets:
+            welcome = ' and '.join(map(describe, sockets))
+        elif website.network_port is not None:
             welcome = "port %d" % website.network_port
         else:
             welcome = website.network_address
-        aspen.log("Starting %s engine." % website.network_engine.name)
-        website.network_engine.bind()
-        aspen.log_dammit("Greetings, program! Welcome to %s." % welcome)
-        if website.changes_reload:
-            aspen.log("Aspen will restart when configuration scripts or "
-                      "Python modules change.")
-            execution.install(website)
-        website.start()
+        if website.workers:
+            aspen.log("Starting %d %s workers."
+                      % (website.workers, website.network_engine.name))
+            master = Master(website)
+            aspen.log_dammit("Greetings, program! Welcome to %s." % welcome)
+            if website.changes_reload:
+                aspen.log("Aspen will restart when configuration scripts or "
+                          "Python modules change.")
+                execution.install_extras(website)
+            master.run()
+        else:
+            aspen.log("Starting %s engine." % website.network_engine.name)
+            if website.network_socket is None:
+                website.network_socket = listen( website.network_address
+                                               , website.network_sockfam
+                                               , backlog=website.backlog
+                                                )
+            if not aspen.WINDOWS:
+                execution.hand_off( website.network_socket
+                                  , *website.extra_sockets
+                                   )
+                execution.execute = execution.graceful(website)
+            website.network_engine.bind()
+            aspen.log_dammit("Greetings, program! Welcome to %s." % welcome)
+            if website.changes_reload:
+                aspen.log("Aspen will restart when configuration scripts or "
+                          "Python modules change.")
+                execution.install(website)
+            website.start()
 
     except socket.error:
 
@@ -117,11 +156,22 @@ def _main(argv):
     except:
         aspen.log_dammit(traceback.format_exc())
     finally:
-        if hasattr(socket, 'AF_UNIX'):
+        if hasattr(socket, 'AF_UNIX') and not passed:
             if website.network_sockfam == socket.AF_UNIX:
                 if os.path.exists(website.network_address):
                     os.remove(website.network_address)
-        website.stop()
+        if website.workers:
+            aspen.logging.flush()   # the workers stop their own websites
+        else:
+            website.stop()
+
+def describe(sock):
+    """Given a listening socket, return a description for humans.
+    """
+    name = sock.getsockname()
+    if isinstance(name, tuple):
+        return "port %d" % name[1]
+    return name
 
 def main(argv=None):
     """http://aspen.io/cli/
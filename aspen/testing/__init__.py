@@ -56,11 +56,9 @@ class StubRequest:
         website = Website([ '--www_root', FSFIX
                           , '--project_root', os.path.join(FSFIX, '.aspen')
                            ] + list(a))
-        request.www_root = os.path.join(os.path.dirname(__file__), FSFIX)
         request.fs = fs
         request.context = {}
         request.website = website
-        request._media_type = None
         return request
 
 StubRequest = StubRequest()
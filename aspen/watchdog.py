@@ -0,0 +1,101 @@
+"""Log the stacks of requests that are taking too long.
+
+If website.slow_request_threshold is set, then Website.handle_safely registers
+each request with a Watchdog while it's in flight. A background thread checks
+in-flight requests every so often, and for any that have been running longer
+than the threshold it logs where the request's thread is right now, via
+sys._current_frames. It keeps doing that once per threshold until the request
+finishes, so you can see whether it's stuck in one place or making progress.
+
+This works for threaded engines. Under gevent every greenlet shares a thread
+ident, so the stacks we log will be the hub's, not the request's.
+
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os
+import sys
+import thread
+import threading
+import time
+import traceback
+
+import aspen
+
+
+class Watchdog(object):
+    """Track in-flight requests and log stack samples for slow ones.
+    """
+
+    def __init__(self, threshold, interval=None):
+        """Takes a threshold in seconds, and optionally a check interval.
+        """
+        self.threshold = threshold
+        self.interval = interval if interval is not None else \
+                        max(min(threshold / 2, 1.0), 0.01)
+        self.inflight = {}  # id(request) => [thread ident, start, request, last]
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def enter(self, request):
+        """Given a Request, start tracking it, and return a key for exit.
+        """
+        if self._pid != os.getpid():
+            self._start()
+        key = id(request)
+        self.inflight[key] = [thread.get_ident(), time.time(), request, None]
+        return key
+
+    def exit(self, key):
+        """Given a key from enter, stop tracking the request.
+        """
+        self.inflight.pop(key, None)
+
+    def check(self):
+        """Log a stack sample for each request over the threshold.
+        """
+        now = time.time()
+        get_frames = getattr(sys, '_current_frames', None)
+        frames = None
+        for entry in list(self.inflight.values()):
+            ident, start, request, last = entry
+            if now - start < self.threshold:
+                continue
+            if last is not None and now - last < self.threshold:
+                continue
+            entry[3] = now
+            if frames is None:
+                frames = get_frames() if get_frames is not None else {}
+            frame = frames.get(ident)
+            if frame is None:
+                stack = "(no stack available)\n"
+            else:
+                stack = ''.join(traceback.format_stack(frame))
+            aspen.log_dammit( "Slow request: %s (%s) has been running for %.1f "
+                              "seconds in thread %s, and is at:"
+                              % (request.line, request.fs, now - start, ident)
+                            , stack
+                             )
+
+    def _start(self):
+        """Start a checker thread for this process (again, after a fork).
+        """
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self.inflight.clear()   # the parent's requests aren't ours
+            checker = threading.Thread(target=self._run, name="aspen-watchdog")
+            checker.setDaemon(True)
+            checker.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.check()
+            except Exception:
+                aspen.log_dammit(traceback.format_exc())
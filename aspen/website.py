@@ -5,20 +5,28 @@ from __future__ import unicode_literals
 
 import datetime
 import os
+import random
 import sys
+import thread
+import threading
+import time
 import traceback
 from os.path import join, isfile
 from first import first
 
 import aspen
-from aspen import dispatcher, resources, sockets
+from aspen import deadlines, dispatcher, metrics, profiling, resources, sockets
+from aspen.admission import Admission, RETRY_AFTER
+from aspen.http import compression
 from aspen.http.request import Request
 from aspen.http.response import Response
 from aspen.configuration import Configurable
+from aspen.watchdog import Watchdog
 from aspen.utils import to_rfc822, utc
 
 # 2006-11-17 was the first release of aspen - v0.3
 THE_PAST = to_rfc822(datetime.datetime(2006, 11, 17, tzinfo=utc))
+PROMETHEUS = b'text/plain; version=0.0.4'
 
 
 class Website(Configurable):
@@ -33,7 +41,24 @@ class Website(Configurable):
     def __init__(self, argv=None):
         """Takes an argv list, without the initial executable name.
         """
+        self.access_log = aspen.logging.WRITER    # shared with aspen.log
+        self.metrics = metrics.Registry()
         self.configure(argv)
+        self.metrics.enabled = self.collect_metrics
+        self.watchdog = None
+        if self.slow_request_threshold:
+            self.watchdog = Watchdog(self.slow_request_threshold)
+        self.admission = None
+        if self.max_concurrency or self.concurrency_limits:
+            self.admission = Admission( self.max_concurrency
+                                      , self.concurrency_limits
+                                      , self.queue_target
+                                       )
+        self.deadlines = None
+        if self.request_timeout or self.request_timeouts:
+            self.deadlines = deadlines.Deadlines( self.request_timeout
+                                                , self.request_timeouts
+                                                 )
 
     def __call__(self, environ, start_response):
         return self.wsgi_app(environ, start_response)
@@ -68,6 +93,7 @@ class Website(Configurable):
         aspen.log_dammit("Shutting down Aspen website.")
         self.hooks.run('shutdown', self)
         self.network_engine.stop()
+        aspen.logging.flush()
 
 
     # Request Handling
@@ -76,13 +102,86 @@ class Website(Configurable):
     def handle_safely(self, request):
         """Given an Aspen request, return an Aspen response.
         """
+        response = self._admit(request)
+        if request.line.method == 'HEAD':
+            drop_body(response)
+        return response
+
+    def _admit(self, request):
+        """Serve metrics, or admit a request, watch it, and handle it.
+        """
+        if request.line.uri.path.raw == self.metrics_path:
+            return self.serve_metrics(request)
+        if self.deadlines is not None:
+            self.deadlines.stamp(request)   # before we queue for admission
+        pool = None
+        if self.admission is not None:
+            pool = self.admission.pool_for(request.line.uri.path.raw)
+            if pool is not None and not pool.acquire():
+                return self.shed(request)
+        watchdog = self.watchdog
+        if watchdog is not None:
+            key = watchdog.enter(request)
+        try:
+            if self.profiling_secret is not None:
+                if profiling.is_requested(request, self.profiling_secret):
+                    return profiling.profile(self._handle_safely, request)
+            return self._handle_safely(request)
+        finally:
+            if watchdog is not None:
+                watchdog.exit(key)
+            if pool is not None:
+                pool.release()
+
+    def _handle_safely(self, request):
+        """The guts of handle_safely, factored out so we can profile them.
+        """
+        start = time.time()
+        timeout = None
+        remaining = request.deadline_remaining()
+        if remaining is not None and remaining > 0:
+            timeout = self.network_engine.start_timeout(remaining,
+                             Response(503, "Request deadline exceeded."))
         try:
-            request = self.do_inbound(request)
-            response = self.handle(request)
+            try:
+                request = self.do_inbound(request)
+                response = self.handle(request)
+            finally:
+                if timeout is not None:
+                    timeout.cancel()    # so it can't go off in handle_error
+            fs = request.fs
         except:
+            fs = request.fs     # before an error page takes over
             response = self.handle_error(request)
 
         response = self.do_outbound(response)
+        self.metrics.record(fs, response.code, time.time() - start)
+        return response
+
+
+    def shed(self, request):
+        """Given an Aspen request we have no room for, return a 503.
+
+        We skip inbound hooks and dispatch, but outbound hooks still run, so
+        that it's logged.
+
+        """
+        response = Response(503, headers={'Retry-After': str(RETRY_AFTER)})
+        response.request = request
+        response = self.do_outbound(response)
+        self.metrics.record(request.fs, response.code, 0)
+        return response
+
+    def serve_metrics(self, request):
+        """Given an Aspen request, return website metrics for Prometheus.
+
+        This bypasses hooks, dispatch, and the resource cache entirely, so
+        that scraping is cheap and doesn't skew what it measures.
+
+        """
+        body = metrics.exposition(self)
+        response = Response(200, body, {'Content-Type': PROMETHEUS})
+        response.request = request
         return response
 
 
@@ -122,9 +221,13 @@ class Website(Configurable):
     # =======
 
     def do_inbound(self, request):
+        deadlines.check(request, "before inbound hooks")
         request = self.hooks.run('inbound_early', request)
+        deadlines.check(request, "after inbound_early hooks")
         request = self.hooks.run('inbound_core', request)
+        deadlines.check(request, "after dispatch")
         request = self.hooks.run('inbound_late', request)
+        deadlines.check(request, "after inbound_late hooks")
         return request
 
     def reset_inbound_core(self):
@@ -133,7 +236,11 @@ class Website(Configurable):
                                    ]
 
     def set_fs_etc(self, request):
+        start = time.time()
         dispatcher.dispatch(request)  # mutates request
+        resource_metrics = self.metrics.get(request.fs)
+        if resource_metrics is not None:
+            resource_metrics.dispatch.record(time.time() - start)
 
     def set_socket(self, request):
         request.socket = sockets.get(request)
@@ -197,6 +304,7 @@ class Website(Configurable):
             if fs is not None:
                 request.fs = fs
                 request.original_resource = request.resource
+                request.context.pop('deadline', None)   # out of time or no
                 request.resource = resources.get(request)
                 response = request.resource.respond(request, response)
 
@@ -219,6 +327,11 @@ class Website(Configurable):
 
     def do_outbound(self, response):
         response = self.hooks.run('outbound', response)
+        if self.compression:
+            compression.compress( response
+                                , self.compression_min_size
+                                , self.compression_level
+                                 )
         return response
 
     def reset_outbound(self):
@@ -226,38 +339,63 @@ class Website(Configurable):
 
     def log_access(self, response):
         """Log access. With our own format (not Apache's).
+
+        This runs for every response, so all we do here is record a tuple in
+        self.access_log, which is the buffer aspen.log writes to. Formatting
+        and writing happen in batches on its background thread. Only error responses pay for whence_raised, and
+        other responses are sampled per access_log_sample.
+
         """
 
-        if self.logging_threshold > 0: # short-circuit
+        if aspen.logging.LOGGING_THRESHOLD > 0: # short-circuit
             return
 
+        if response.code < 400:
+            sample = self.access_log_sample
+            if sample < 1.0 and random.random() >= sample:
+                return
+            whence = None
+        else:
+            whence = response.whence_raised()
+
+        request = response.request
+        record = ( thread.get_ident()
+                 , threading.currentThread().getName()
+                 , str(response)
+                 , request.line.uri.path.raw
+                 , request.fs
+                 , whence
+                  )
+        self.access_log.write((self.format_access, record))
+
+    def format_access(self, record):
+        """Given a record from log_access, return a log line, the same as
+        aspen.log would have written from the request's thread.
+        """
+        ident, name, response, path, fs, whence = record
+
 
         # What was the URL path translated to?
         # ====================================
 
-        fs = getattr(response.request, 'fs', '')
         if fs.startswith(self.www_root):
             fs = fs[len(self.www_root):]
             if fs:
                 fs = '.'+fs
         else:
             fs = '...' + fs[-21:]
-        msg = "%-24s %s" % (response.request.line.uri.path.raw, fs)
+        msg = "%-24s %s" % (path, fs)
 
 
         # Where was response raised from?
         # ===============================
 
-        filename, linenum = response.whence_raised()
-        if filename is not None:
-            response = "%s (%s:%d)" % (response, filename, linenum)
-        else:
-            response = str(response)
-
-        # Log it.
-        # =======
+        if whence is not None and whence[0] is not None:
+            response = "%s (%s:%d)" % ((response,) + whence)
 
-        aspen.log("%-36s %s" % (response, msg))
+        line = "%-36s %s" % (response, msg)
+        return aspen.logging.format_prefix(ident, name) + \
+               aspen.logging.stringify(line)
 
 
     # File Resolution
@@ -321,3 +459,26 @@ class Website(Configurable):
         context = resource.populate_context(request, response)
         exec resource.pages[1] in context  # let's let exceptions raise
         return response, context
+
+
+def drop_body(response):
+    """Given a Response to a HEAD request, drop its body in place.
+
+    We do this last, after outbound hooks and compression, so that the headers
+    are the same as for a GET. That includes the Content-Length a server would
+    work out from a string body, where we can. We're past error handling here,
+    so a unicode body that won't encode just doesn't get one.
+
+    """
+    body = response.body
+    if isinstance(body, unicode):
+        try:
+            body = body.encode(response.charset)
+        except UnicodeError:
+            body = b''
+    if isinstance(body, str):
+        if body and 'Content-Length' not in response.headers:
+            response.headers['Content-Length'] = str(len(body))
+    elif hasattr(body, 'close'):
+        body.close()
+    response.body = b''
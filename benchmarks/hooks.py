@@ -0,0 +1,60 @@
+"""Measure the per-request overhead of running hooks.
+
+Run this from the root of an aspen checkout:
+
+    python benchmarks/hooks.py
+
+We run a thing through five hook points with a few no-op hooks each, which is
+roughly what a website does per request, first with LoopedHooks (the way
+Hooks.run used to work), then with compiled HookLists, then with
+instrumentation turned on.
+
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import timeit
+
+from aspen.hooks import Hooks
+
+
+N = 100000
+POINTS = ['inbound_early', 'inbound_core', 'inbound_late', 'outbound',
+          'error_early']
+
+
+def noop(thing):
+    pass
+
+
+class LoopedHooks(object):
+
+    def run(self, hook_name, thing):
+        for func in getattr(self, hook_name, []):
+            thing = func(thing) or thing
+        return thing
+
+
+def main():
+    looped = LoopedHooks()
+    compiled = Hooks()
+    for hooks in (looped, compiled):
+        for name in POINTS[:-1]:
+            setattr(hooks, name, [noop, noop])
+        hooks.error_early = []
+
+    def run(hooks):
+        return lambda: [hooks.run(name, None) for name in POINTS]
+
+    for label, hooks in [('looped', looped), ('compiled', compiled)]:
+        elapsed = min(timeit.repeat(run(hooks), number=N, repeat=5))
+        print("%-12s usec per request: %6.2f" % (label, elapsed / N * 1e6))
+
+    compiled.instrument()
+    elapsed = min(timeit.repeat(run(compiled), number=N, repeat=5))
+    print("%-12s usec per request: %6.2f" % ('instrumented', elapsed / N * 1e6))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Benchmark aspen.http.request.Querystring against the old cgi.parse_qs parser.
+
+Run this from the root of an aspen checkout:
+
+    python benchmarks/querystring.py
+
+The querystrings look like what our API clients send: a mix of short filter
+values, some percent-encoded UTF-8, some repeated keys, and so on. For each
+size we time constructing the Querystring and reading one key (the common case
+in a simplate), and constructing it and reading every key.
+
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import cgi
+import timeit
+import urllib
+
+from aspen.http.mapping import Mapping
+from aspen.http.request import Querystring
+
+
+class OldQuerystring(Mapping):
+    """The parser we used before, for comparison.
+    """
+
+    def __init__(self, raw):
+        self.decoded = urllib.unquote_plus(raw).decode('UTF-8')
+        self.raw = raw
+        as_dict = cgi.parse_qs(raw, keep_blank_values=True, strict_parsing=False)
+        for k, vals in as_dict.items():
+            as_dict[k.decode('UTF-8')] = [v.decode('UTF-8') for v in vals]
+        Mapping.__init__(self, as_dict)
+
+
+VALUES = [ b'open', b'closed', b'2013-10-01', b'caf%C3%A9', b'a+b+c'
+         , b'%E2%98%84', b'100', b'', b'name%2Cdate', b'true'
+          ]
+
+def make_querystring(n):
+    pairs = []
+    for i in range(n):
+        key = b'filter[%d]' % (i % (n // 2 or 1))   # some repeated keys
+        pairs.append(key + b'=' + VALUES[i % len(VALUES)])
+    return b'&'.join(pairs)
+
+
+def bench(Class, raw, read_all, number):
+    if read_all:
+        def run():
+            qs = Class(raw)
+            for key in qs.keys():
+                qs.all(key)
+    else:
+        def run():
+            Class(raw).get(b'filter[0]')
+    return timeit.timeit(run, number=number) / number * 1e6
+
+
+def main():
+    print("%6s  %-8s  %10s  %10s  %7s" % ( "params", "access", "old (us)"
+                                         , "new (us)", "speedup"
+                                          ))
+    for n in (10, 50, 100, 200):
+        raw = make_querystring(n)
+        number = 20000 // n
+        for read_all in (False, True):
+            old = bench(OldQuerystring, raw, read_all, number)
+            new = bench(Querystring, raw, read_all, number)
+            access = "all keys" if read_all else "one key"
+            print("%6d  %-8s  %10.1f  %10.1f  %6.1fx" % ( n, access, old, new
+                                                        , old / new
+                                                         ))
+
+
+if __name__ == '__main__':
+    main()
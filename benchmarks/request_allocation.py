@@ -0,0 +1,77 @@
+"""Measure per-request object counts and memory for aspen.http.request.Request.
+
+Run this from the root of an aspen checkout:
+
+    python benchmarks/request_allocation.py
+
+We build a batch of typical requests (the way Website.wsgi_app does, via
+Request.from_wsgi) and walk the object graph hanging off of each one. Objects
+that are shared between requests (cached Method and Version instances, empty
+strings, and so on) are only counted once for the whole batch, so the
+per-request numbers reflect what each request actually costs us.
+
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import gc
+import sys
+import timeit
+import types
+from StringIO import StringIO
+
+from aspen.http.request import Request
+
+
+N = 1000
+
+STOP = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+        types.MethodType)
+
+
+def environ():
+    return { 'REQUEST_METHOD': b'GET'
+           , 'PATH_INFO': b'/foo/bar/baz.html'
+           , 'QUERY_STRING': b'page=2&sort=name'
+           , 'SERVER_PROTOCOL': b'HTTP/1.1'
+           , 'HTTP_HOST': b'example.com'
+           , 'HTTP_ACCEPT': b'text/html,application/xhtml+xml'
+           , 'HTTP_USER_AGENT': b'Mozilla/5.0 (X11; Linux x86_64)'
+           , 'HTTP_COOKIE': b'session=0123456789abcdef; theme=dark'
+           , 'wsgi.input': StringIO(b'')
+            }
+
+
+def walk(roots):
+    """Given a list of objects, return (count, bytes) for everything reachable.
+    """
+    seen = set()
+    stack = list(roots)
+    count = size = 0
+    while stack:
+        o = stack.pop()
+        if id(o) in seen or isinstance(o, STOP):
+            continue
+        seen.add(id(o))
+        count += 1
+        size += sys.getsizeof(o)
+        stack.extend(gc.get_referents(o))
+    return count, size
+
+
+def main():
+    requests = [Request.from_wsgi(environ()) for i in range(N)]
+    for request in requests:
+        request.context  # touch it, like a dynamic resource would
+    count, size = walk(requests)
+    elapsed = timeit.timeit(lambda: Request.from_wsgi(environ()), number=N)
+
+    print("objects per request:  %8.1f" % (count / N))
+    print("bytes per request:    %8.1f" % (size / N))
+    print("usec per request:     %8.1f" % (elapsed / N * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Benchmark aspen.http.response.Response as a WSGI callable.
+
+Run this from the root of an aspen checkout:
+
+    python benchmarks/response.py
+
+We build and serve batches of 10,000 responses that look like what a typical
+rendered simplate returns (a handful of headers and a single string body), and
+report how many responses per second we can build, how many we can get through
+Response.__call__, and both together.
+
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import timeit
+
+from aspen.http.response import Response
+
+
+N = 10000
+BODY = b"<html><body>Greetings, program!</body></html>" * 20
+
+
+def start_response(status, headers):
+    pass
+
+def build():
+    response = Response(200, BODY)
+    response.headers['Content-Type'] = 'text/html; charset=UTF-8'
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Frame-Options'] = 'SAMEORIGIN'
+    response.headers['Vary'] = 'Cookie'
+    return response
+
+def serve(response):
+    for chunk in response({}, start_response):
+        pass
+
+
+def main():
+    response = build()
+    for name, func in ( ("build", build)
+                      , ("serve", lambda: serve(response))
+                      , ("build and serve", lambda: serve(build()))
+                       ):
+        elapsed = min(timeit.repeat(func, number=N, repeat=7))
+        print("%-16s %8.0f responses per second" % (name, N / elapsed))
+
+
+if __name__ == '__main__':
+    main()
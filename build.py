@@ -15,6 +15,9 @@ TEST_DEPS = [ 'coverage-3.5.3.tar.gz'
             , 'py-1.4.17.tar.gz'
             , 'pytest-2.4.2.tar.gz'
             , 'pytest-cov-1.6.tar.gz'
+            , 'six-1.16.0.tar.gz'           # for the asyncio engine's tests:
+            , 'futures-3.3.0.tar.gz'        # trollius needs these two
+            , 'trollius-2.1.post2.tar.gz'
              ]
 
 def _virt(cmd, envdir='env'):
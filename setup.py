@@ -28,7 +28,10 @@ setup( author = 'Chad Whitacre'
      , entry_points = { 'console_scripts': [ 'aspen = aspen.server:main'
                                            , 'thrash = thrash:main'
                                            , 'fcgi_aspen = fcgi_aspen:main [fcgi]'
-                                            ] }
+                                            ]
+                      , 'aspen.network_engines': [ 'asyncio = aspen.network_engines.asyncio_'
+                                                  ]
+                       }
      , name = 'aspen'
      , packages = find_packages(exclude=[ 'aspen.tests'
                                         , 'aspen.tests.*'
@@ -45,5 +48,6 @@ setup( author = 'Chad Whitacre'
                           , 'first==2.0.0'
                            ]
      , extras_require = { 'fcgi' : [ 'flup' ]
+                        , 'asyncio' : [ 'trollius', 'futures' ]
                         }
       )
@@ -1,3 +1,10 @@
+import os
+import sys
+
+# Website.configure changes the working directory, so make sure nothing we
+# import later (network engines, say) is found relative to it.
+sys.path[:] = [os.path.abspath(path) for path in sys.path]
+
 import pytest
 from aspen.testing import fsfix
 from aspen.testing.fsfix import teardown
@@ -9,4 +16,3 @@ def mk():
 
 def pytest_runtest_teardown():
     teardown()
-
@@ -0,0 +1,135 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import threading
+import time
+
+from pytest import raises
+
+from aspen.admission import Admission, Pool
+from aspen.configuration import parse
+from aspen.http.request import Request
+from aspen.testing import StubRequest, handle
+
+
+# Pool
+
+def test_pool_admits_up_to_its_limit():
+    pool = Pool(2)
+    assert pool.acquire()
+    assert pool.acquire()
+    assert not pool.acquire()
+    assert (pool.inflight, pool.shed) == (2, 1)
+
+def test_pool_release_makes_room():
+    pool = Pool(1)
+    pool.acquire()
+    pool.release()
+    assert pool.acquire()
+
+def test_pool_with_a_target_waits_for_a_slot():
+    pool = Pool(1, target=0.01, interval=5)
+    pool.acquire()
+    threading.Timer(0.05, pool.release).start()
+    assert pool.acquire()   # within the interval, since the queue was empty
+    assert pool.shed == 0
+
+def test_pool_with_a_standing_queue_waits_only_for_the_target():
+    pool = Pool(1, target=0.01, interval=0.05)
+    pool.acquire()
+    pool.last_empty = time.time() - 1
+    start = time.time()
+    assert not pool.acquire()
+    assert time.time() - start < 0.5
+    assert pool.shed == 1
+
+def test_pool_without_a_target_doesnt_wait():
+    pool = Pool(1)
+    pool.acquire()
+    start = time.time()
+    assert not pool.acquire()
+    assert time.time() - start < 0.01
+
+
+# Admission
+
+def test_admission_uses_the_longest_matching_prefix():
+    admission = Admission(10, [(b'/api/', 5), (b'/api/search', 1)])
+    assert admission.pool_for(b'/api/search?q=foo').limit == 1
+    assert admission.pool_for(b'/api/users').limit == 5
+    assert admission.pool_for(b'/').limit == 10
+
+def test_admission_without_a_default_leaves_other_paths_alone():
+    admission = Admission(0, [(b'/api/', 5)])
+    assert admission.pool_for(b'/') is None
+
+
+# Website
+
+def request_to(website, path=b'/'):
+    request = StubRequest(path)
+    request.website = website
+    return request
+
+def test_website_has_no_admission_by_default(mk):
+    mk(('index.html', "Greetings, program!"))
+    assert handle().request.website.admission is None
+
+def test_website_sheds_requests_past_the_limit(mk):
+    mk(('index.html', "Greetings, program!"))
+    website = handle('/', '--max_concurrency=1').request.website
+    website.admission.default.acquire()     # someone else is in flight
+    response = website.handle_safely(request_to(website))
+    assert response.code == 503
+    assert response.headers['Retry-After'] == b'1'
+    assert website.admission.default.shed == 1
+
+def test_website_drops_the_body_when_shedding_head_requests(mk):
+    mk(('index.html', "Greetings, program!"))
+    website = handle('/', '--max_concurrency=1').request.website
+    website.hooks.outbound = [lambda response: setattr(response, 'body',
+                                                       b'Busy!') or response]
+    website.admission.default.acquire()
+    request = Request(b'HEAD', b'/', headers=b'Host: localhost')
+    request.website = website
+    response = website.handle_safely(request)
+    assert response.code == 503
+    assert response.body == b''
+    assert response.headers['Content-Length'] == b'5'
+
+def test_website_releases_slots_when_done(mk):
+    mk(('index.html', "Greetings, program!"))
+    website = handle('/', '--max_concurrency=1').request.website
+    assert website.handle_safely(request_to(website)).code == 200
+    assert website.admission.default.inflight == 0
+
+def test_website_releases_slots_after_errors(mk):
+    mk(('index.html.spt', "raise heck\n[---]\n"))
+    website = handle('/', '--max_concurrency=1').request.website
+    assert website.handle_safely(request_to(website)).code == 500
+    assert website.admission.default.inflight == 0
+
+def test_website_exposes_admission_metrics(mk):
+    mk(('index.html', "Greetings, program!"))
+    website = handle('/', '--max_concurrency=1', '--metrics_path=/metrics',
+                     '--concurrency_limits=/api/=2').request.website
+    body = website.handle_safely(StubRequest(b'/metrics')).body
+    assert b'aspen_requests_in_flight{prefix="/api/"} 0.0' in body
+    assert b'aspen_requests_shed_total{prefix=""} 0.0' in body
+
+
+# parse
+
+def test_parse_concurrency_limits_good():
+    actual = parse.concurrency_limits('/api/=20, /search=5')
+    assert actual == [(b'/api/', 20), (b'/search', 5)]
+
+def test_parse_concurrency_limits_empty():
+    assert parse.concurrency_limits('') == []
+
+def test_parse_concurrency_limits_bad():
+    raises(ValueError, parse.concurrency_limits, '/api/')
+    raises(ValueError, parse.concurrency_limits, 'api=5')
+    raises(ValueError, parse.concurrency_limits, '/api/=0')
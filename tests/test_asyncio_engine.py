@@ -0,0 +1,127 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import socket
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('trollius')
+
+from aspen.network_engines import listen
+from aspen.network_engines.asyncio_ import Engine, call_app
+from aspen.testing.fsfix import FSFIX
+from aspen.website import Website
+
+
+ECHO = ('index.spt', "[---]\nraw = request.body.raw\n[---] text/plain\n%(raw)s")
+
+
+@pytest.fixture
+def serve(mk, request):
+    def serve(*files, **kw):
+        mk(*files)
+        website = Website(['--www_root', FSFIX] + kw.get('argv', []))
+        website.network_engine = Engine('asyncio', website)
+        website.network_socket = listen(('127.0.0.1', 0), socket.AF_INET)
+        address = website.network_socket.getsockname()
+        website.network_engine.bind()
+        server = threading.Thread(target=website.network_engine.start)
+        server.daemon = True
+        server.start()
+        request.addfinalizer(website.network_engine.stop)
+        return address
+    return serve
+
+def converse(address, data, until):
+    client = socket.create_connection(address)
+    client.settimeout(5)
+    client.sendall(data)
+    received = b''
+    deadline = time.time() + 5
+    while received.count(b'HTTP/1.1 ') < until and time.time() < deadline:
+        chunk = client.recv(65536)
+        if not chunk:
+            break
+        received += chunk
+    client.close()
+    return received
+
+
+def test_asyncio_engine_serves_a_request(serve):
+    address = serve(('index.html', "Greetings, program!"))
+    response = converse(address, b"GET / HTTP/1.1\r\nHost: x\r\n\r\n", 1)
+    assert response.startswith(b"HTTP/1.1 200 OK\r\n")
+    assert response.endswith(b"\r\n\r\nGreetings, program!")
+    assert b"Content-Length: 19\r\n" in response
+
+def test_asyncio_engine_handles_pipelined_requests(serve):
+    address = serve(('index.html', "Greetings, program!"))
+    request = b"GET / HTTP/1.1\r\nHost: x\r\n\r\n"
+    response = converse(address, request * 3, 3)
+    assert response.count(b"Greetings, program!") == 3
+
+def test_asyncio_engine_closes_when_asked(serve):
+    address = serve(('index.html', "Greetings, program!"))
+    request = b"GET / HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n"
+    response = converse(address, request * 2, 2)
+    assert response.count(b"Greetings, program!") == 1
+    assert b"Connection: close\r\n" in response
+
+def test_asyncio_engine_reads_chunked_bodies(serve):
+    address = serve(ECHO)
+    request = ( b"POST / HTTP/1.1\r\nHost: x\r\nTransfer-Encoding: chunked\r\n"
+                b"\r\n5\r\nHello\r\n7\r\n, world\r\n0\r\n\r\n"
+               )
+    response = converse(address, request, 1)
+    assert response.endswith(b"Hello, world")
+
+def test_asyncio_engine_sends_100_continue(serve):
+    address = serve(ECHO)
+    request = ( b"POST / HTTP/1.1\r\nHost: x\r\nContent-Length: 5\r\n"
+                b"Expect: 100-continue\r\n\r\nHello"
+               )
+    response = converse(address, request, 2)
+    assert response.startswith(b"HTTP/1.1 100 Continue\r\n\r\nHTTP/1.1 200 OK")
+    assert response.endswith(b"Hello")
+
+def test_asyncio_engine_rejects_garbage(serve):
+    address = serve(('index.html', "Greetings, program!"))
+    response = converse(address, b"garbage\r\n\r\n", 1)
+    assert response.startswith(b"HTTP/1.1 400 Bad Request\r\n")
+
+def test_asyncio_engine_refuses_a_big_body(serve):
+    address = serve(ECHO, argv=['--max_body_size=4'])
+    request = ( b"POST / HTTP/1.1\r\nHost: x\r\nContent-Length: 5\r\n"
+                b"Expect: 100-continue\r\n\r\n"
+               )
+    response = converse(address, request, 1)
+    assert response.startswith(b"HTTP/1.1 413 Request Entity Too Large\r\n")
+    assert b"100 Continue" not in response
+
+def test_asyncio_engine_refuses_a_big_chunked_body(serve):
+    address = serve(ECHO, argv=['--max_body_size=10'])
+    request = ( b"POST / HTTP/1.1\r\nHost: x\r\nTransfer-Encoding: chunked\r\n"
+                b"\r\n5\r\nHello\r\n7\r\n, world\r\n0\r\n\r\n"
+               )
+    response = converse(address, request, 1)
+    assert response.startswith(b"HTTP/1.1 413 Request Entity Too Large\r\n")
+
+def test_asyncio_engine_times_out_a_slow_body(serve):
+    address = serve(ECHO, argv=['--socket_timeout=0.2'])
+    request = b"POST / HTTP/1.1\r\nHost: x\r\nContent-Length: 5\r\n\r\nHel"
+    start = time.time()
+    response = converse(address, request, 1)
+    assert response == b''
+    assert time.time() - start < 4
+
+
+# call_app
+
+def test_call_app_answers_500_if_the_app_never_starts_the_response():
+    def app(environ, start_response):
+        return [b'Greetings, program!']
+    assert call_app(app, {}) == (b'500 Internal Server Error', [], [])
@@ -0,0 +1,154 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import socket
+import threading
+import time
+
+import pytest
+
+from aspen.network_engines import cheroot_, listen
+from aspen.network_engines.cheroot_ import ThreadPool
+from aspen.testing.fsfix import FSFIX
+from aspen.website import Website
+
+
+@pytest.fixture
+def serve(mk, request):
+    def serve(*argv):
+        mk(('index.html', "Greetings, program!"))
+        website = Website(['--www_root', FSFIX] + list(argv))
+        website.network_socket = listen(('127.0.0.1', 0), socket.AF_INET)
+        address = website.network_socket.getsockname()
+        website.network_engine.bind()
+        server = threading.Thread(target=website.network_engine.start)
+        server.daemon = True
+        server.start()
+        request.addfinalizer(website.network_engine.stop)
+        deadline = time.time() + 5
+        while not website.network_engine.cheroot_server.ready:
+            assert time.time() < deadline
+            time.sleep(0.01)
+        return address
+    return serve
+
+def converse(address, data):
+    client = socket.create_connection(address)
+    client.settimeout(5)
+    client.sendall(data)
+    received = b''
+    while True:
+        chunk = client.recv(65536)
+        if not chunk:
+            break
+        received += chunk
+    client.close()
+    return received
+
+
+# bind
+
+def test_bind_applies_tuning_knobs(mk):
+    mk()
+    website = Website([ '--www_root', FSFIX, '--threads=3', '--max_threads=7'
+                      , '--backlog=64', '--socket_timeout=2.5'
+                      , '--keep_alive_requests=100'
+                       ])
+    website.network_engine.bind()
+    server = website.network_engine.cheroot_server
+    assert (server.requests.min, server.requests.max) == (3, 7)
+    assert server.request_queue_size == 64
+    assert server.timeout == 2.5
+    assert server.keep_alive_requests == 100
+
+def test_bind_keeps_the_pool_fixed_by_default(mk):
+    mk()
+    website = Website(['--www_root', FSFIX, '--threads=3'])
+    website.network_engine.bind()
+    requests = website.network_engine.cheroot_server.requests
+    assert (requests.min, requests.max) == (3, 3)
+
+
+def test_bind_makes_a_server_for_each_extra_socket(mk):
+    mk()
+    website = Website(['--www_root', FSFIX])
+    website.network_socket = listen(('127.0.0.1', 0), socket.AF_INET)
+    website.extra_sockets = [listen(('127.0.0.1', 0), socket.AF_INET)]
+    try:
+        website.network_engine.bind()
+        extra, = website.network_engine.extra_servers
+        assert extra.listener is website.extra_sockets[0]
+        assert website.network_engine.cheroot_server.listener is \
+                                                        website.network_socket
+    finally:
+        website.network_socket.close()
+        website.extra_sockets[0].close()
+
+
+# keep_alive_requests
+
+def test_keep_alive_requests_closes_the_connection(serve):
+    address = serve('--keep_alive_requests=2')
+    request = b"GET / HTTP/1.1\r\nHost: x\r\n\r\n"
+    response = converse(address, request * 3)
+    assert response.count(b"Greetings, program!") == 2
+    assert response.count(b"Connection: close\r\n") == 1
+
+
+# ThreadPool
+
+class StubThread(object):
+    def __init__(self, conn=None, alive=True):
+        self.conn = conn
+        self.alive = alive
+    def isAlive(self):
+        return self.alive
+
+def pool(min=2, max=5, busy=0, idle=0, queued=0):
+    pool = ThreadPool(None, min, max)
+    pool._threads = [StubThread(conn=object()) for i in range(busy)] + \
+                    [StubThread() for i in range(idle)]
+    for i in range(queued):
+        pool.put(object())
+    pool.calls = []
+    pool.grow = lambda n: pool.calls.append(('grow', n))
+    pool.shrink = lambda n: pool.calls.append(('shrink', n))
+    return pool
+
+def test_pool_grows_when_connections_are_waiting():
+    p = pool(busy=2, queued=2)
+    p.resize()
+    assert p.calls == [('grow', 2)]
+
+def test_pool_doesnt_grow_while_threads_are_idle():
+    p = pool(busy=1, idle=1, queued=1)
+    p.resize()
+    assert p.calls == []
+
+def test_pool_shrinks_one_idle_thread_at_a_time():
+    p = pool(idle=4)
+    p.resize()
+    assert p.calls == [('shrink', 1)]
+    p.last_resize = 0
+    p.resize()
+    assert p.calls == [('shrink', 1)]   # not again so soon
+
+def test_pool_culls_dead_threads():
+    p = pool(busy=2)
+    p._threads.append(StubThread(alive=False))
+    p.resize()
+    assert len(p._threads) == 2
+
+def test_pool_stays_put_if_max_isnt_more_than_min():
+    p = pool(min=2, max=2, busy=2, queued=3)
+    p.resize()
+    assert p.calls == []
+
+def test_pool_only_looks_every_so_often(monkeypatch):
+    monkeypatch.setattr(cheroot_, 'RESIZE_EVERY', 60)
+    p = pool(busy=2, queued=1)
+    p.resize()
+    p.resize()
+    assert p.calls == [('grow', 1)]
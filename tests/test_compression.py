@@ -0,0 +1,188 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import zlib
+
+from aspen.http.compression import compress, is_compressible, negotiate
+from aspen.http.request import Request
+from aspen.http.response import Response
+from aspen.website import Website
+from aspen.testing.fsfix import FSFIX
+
+
+BIG = b'Greetings, program! ' * 100
+
+
+def mkrequest(accept_encoding=b'gzip'):
+    headers = b'Host: localhost\r\nAccept-Encoding: ' + accept_encoding
+    return Request(headers=headers)
+
+def mkresponse(accept_encoding=b'gzip', body=BIG, code=200,
+                                                     media_type=b'text/html'):
+    response = Response(code, body, {'Content-Type': media_type})
+    response.request = mkrequest(accept_encoding)
+    return response
+
+def gunzip(body):
+    return zlib.decompress(body, 16 + zlib.MAX_WBITS)
+
+
+# negotiate
+
+def test_negotiate_prefers_gzip():
+    assert negotiate(b'deflate, gzip') == b'gzip'
+
+def test_negotiate_honors_qvalues():
+    assert negotiate(b'gzip;q=0.5, deflate') == b'deflate'
+
+def test_negotiate_honors_q_zero():
+    assert negotiate(b'gzip;q=0') is None
+
+def test_negotiate_honors_wildcard():
+    assert negotiate(b'*') == b'gzip'
+
+def test_negotiate_returns_None_for_identity():
+    assert negotiate(b'identity') is None
+
+def test_negotiate_returns_None_for_empty_header():
+    assert negotiate(b'') is None
+
+
+# is_compressible
+
+def test_text_is_compressible():
+    assert is_compressible(b'text/html; charset=UTF-8')
+
+def test_json_is_compressible():
+    assert is_compressible(b'application/json')
+
+def test_png_is_not_compressible():
+    assert not is_compressible(b'image/png')
+
+def test_svg_is_compressible():
+    assert is_compressible(b'image/svg+xml')
+
+def test_zip_is_not_compressible():
+    assert not is_compressible(b'application/zip')
+
+
+# compress
+
+def test_compress_gzips_string_body():
+    response = compress(mkresponse())
+    assert response.headers['Content-Encoding'] == b'gzip'
+    assert gunzip(response.body) == BIG
+
+def test_compress_deflates_string_body():
+    response = compress(mkresponse(b'deflate'))
+    assert response.headers['Content-Encoding'] == b'deflate'
+    assert zlib.decompress(response.body) == BIG
+
+def test_compress_sets_content_length():
+    response = compress(mkresponse())
+    assert response.headers['Content-Length'] == str(len(response.body))
+
+def test_compress_sets_vary():
+    response = compress(mkresponse())
+    assert response.headers['Vary'] == b'Accept-Encoding'
+
+def test_compress_extends_existing_vary():
+    response = mkresponse()
+    response.headers['Vary'] = b'Cookie'
+    compress(response)
+    assert response.headers['Vary'] == b'Cookie, Accept-Encoding'
+
+def test_compress_sets_vary_even_without_accept_encoding():
+    response = compress(mkresponse(b'identity'))
+    assert response.body == BIG
+    assert 'Content-Encoding' not in response.headers
+    assert response.headers['Vary'] == b'Accept-Encoding'
+
+def test_compress_skips_small_bodies():
+    response = compress(mkresponse(body=b'Greetings, program!'))
+    assert response.body == b'Greetings, program!'
+    assert 'Content-Encoding' not in response.headers
+    assert 'Vary' not in response.headers
+
+def test_compress_skips_compressed_media_types():
+    response = compress(mkresponse(media_type=b'image/png'))
+    assert response.body == BIG
+    assert 'Content-Encoding' not in response.headers
+
+def test_compress_skips_304():
+    response = compress(mkresponse(code=304))
+    assert response.body == BIG
+    assert 'Content-Encoding' not in response.headers
+
+def test_compress_skips_partial_content():
+    response = compress(mkresponse(code=206))
+    assert response.body == BIG
+    assert 'Content-Encoding' not in response.headers
+
+def test_compress_skips_ranges():
+    response = mkresponse()
+    response.headers['Content-Range'] = b'bytes 0-1999/4000'
+    compress(response)
+    assert response.body == BIG
+    assert 'Content-Encoding' not in response.headers
+
+def test_compress_encodes_unicode_with_the_charset():
+    response = compress(mkresponse(body=u'\u2604' * 1000))
+    assert gunzip(response.body) == b'\xe2\x98\x84' * 1000
+
+def test_compress_encodes_unicode_chunks_with_the_charset():
+    response = compress(mkresponse(body=iter([u'\u2604' * 1000])))
+    assert gunzip(b''.join(response.body)) == b'\xe2\x98\x84' * 1000
+
+def test_compress_skips_already_encoded_responses():
+    response = mkresponse()
+    response.headers['Content-Encoding'] = b'br'
+    compress(response)
+    assert response.body == BIG
+
+def test_compress_streams_iterable_bodies():
+    chunks = []
+    def body():
+        for i in range(3):
+            chunks.append(i)
+            yield BIG
+    response = mkresponse(body=body())
+    response.headers['Content-Length'] = str(len(BIG) * 3)
+    compress(response)
+    assert chunks == []     # nothing consumed yet
+    assert 'Content-Length' not in response.headers
+    assert gunzip(b''.join(response.body)) == BIG * 3
+
+def test_compress_closes_iterable_bodies():
+    closed = []
+    class Body(object):
+        def __iter__(self):
+            return iter([BIG])
+        def close(self):
+            closed.append(True)
+    response = compress(mkresponse(body=Body()))
+    response.body.close()
+    assert closed == [True]
+
+
+# website
+
+def test_website_compresses_when_configured(mk):
+    mk(('index.html', BIG))
+    website = Website(['--www_root', FSFIX, '--compression', 'yes'])
+    request = mkrequest()
+    request.website = website
+    response = website.handle_safely(request)
+    assert response.headers['Content-Encoding'] == b'gzip'
+    assert gunzip(response.body) == BIG
+
+def test_website_does_not_compress_by_default(mk):
+    mk(('index.html', BIG))
+    website = Website(['--www_root', FSFIX])
+    request = mkrequest()
+    request.website = website
+    response = website.handle_safely(request)
+    assert 'Content-Encoding' not in response.headers
+    assert response.body == BIG
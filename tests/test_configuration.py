@@ -275,3 +275,40 @@ def test_parse_network_address_with_port_too_high():
     actual = raises(ValueError, parse.network_address, u':65536').value.args[0]
     assert actual == "invalid port (out of range)"
 
+
+def test_parse_positive_int_good():
+    assert parse.positive_int('10') == 10
+
+def test_parse_positive_int_bad():
+    raises(ValueError, parse.positive_int, '0')
+
+def test_tuning_knobs_have_defaults(mk):
+    mk()
+    c = Configurable()
+    c.configure([])
+    assert (c.threads, c.max_threads, c.keep_alive_requests) == (10, 0, 0)
+    assert c.socket_timeout == 10
+    assert c.backlog == socket.SOMAXCONN
+
+def test_compression_min_size_cant_be_negative(mk):
+    mk()
+    raises(ConfigurationError, Website, ['--www_root', FSFIX,
+                                         '--compression_min_size=-1'])
+
+def test_network_fd_defaults_to_empty(mk):
+    mk()
+    assert Website(['--www_root', FSFIX]).network_fd == []
+
+def test_network_fd_takes_a_list_of_descriptors(mk):
+    mk()
+    website = Website(['--www_root', FSFIX, '--network_fd=3, 4'])
+    assert website.network_fd == [3, 4]
+
+def test_network_fd_rejects_nonsense():
+    raises(ValueError, parse.file_descriptors, 'three')
+    raises(ValueError, parse.file_descriptors, '-1')
+
+def test_aspens_mimetypes_dont_depend_on_the_working_directory():
+    from aspen.configuration import ASPENS_MIMETYPES
+    assert os.path.isabs(ASPENS_MIMETYPES)
+    assert os.path.isfile(ASPENS_MIMETYPES)
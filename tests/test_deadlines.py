@@ -0,0 +1,123 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import time
+
+from pytest import raises
+
+from aspen import Response
+from aspen.configuration import parse
+from aspen.deadlines import Deadlines, check
+from aspen.http.request import Request
+from aspen.testing import StubRequest, handle
+
+
+# Deadlines
+
+def test_deadlines_use_the_longest_matching_prefix():
+    deadlines = Deadlines(10, [(b'/api/', 5), (b'/api/search', 1)])
+    assert deadlines.timeout_for(b'/api/search?q=foo') == 1
+    assert deadlines.timeout_for(b'/api/users') == 5
+    assert deadlines.timeout_for(b'/') == 10
+
+def test_deadlines_without_a_default_leave_other_paths_alone():
+    deadlines = Deadlines(0, [(b'/api/', 5)])
+    assert deadlines.timeout_for(b'/') is None
+    request = Request(uri=b'/')
+    deadlines.stamp(request)
+    assert request.deadline_remaining() is None
+
+def test_deadlines_with_a_zero_prefix_turn_off_the_default():
+    deadlines = Deadlines(10, [(b'/stream/', 0)])
+    assert deadlines.timeout_for(b'/stream/feed') is None
+    request = Request(uri=b'/stream/feed')
+    deadlines.stamp(request)
+    assert request.deadline_remaining() is None
+    check(request, "after inbound_early")   # no 503
+
+def test_deadlines_stamp_requests():
+    request = Request(uri=b'/')
+    Deadlines(5).stamp(request)
+    assert 4 < request.deadline_remaining() <= 5
+
+def test_requests_have_no_deadline_by_default():
+    request = Request()
+    assert request.deadline_remaining() is None
+    assert request._context is None     # we didn't build it to find out
+
+def test_check_raises_503_past_the_deadline():
+    request = Request()
+    request.context['deadline'] = time.time() - 1
+    response = raises(Response, check, request, "after lunch").value
+    assert response.code == 503
+    assert response.body == "Request deadline exceeded after lunch."
+
+def test_check_lets_requests_with_time_left_through():
+    request = Request()
+    request.context['deadline'] = time.time() + 5
+    check(request, "after lunch")
+
+
+# Website
+
+def request_to(website, path=b'/'):
+    request = StubRequest(path)
+    request.website = website
+    return request
+
+def test_website_has_no_deadlines_by_default(mk):
+    mk(('index.html', "Greetings, program!"))
+    assert handle().request.website.deadlines is None
+
+def test_simplates_can_read_the_deadline(mk):
+    mk(('index.html.spt', "[---]\nleft = request.deadline_remaining()\n"
+                          "[---]\n%(left)s"))
+    response = handle('/', '--request_timeout=5')
+    assert 4 < float(response.body) <= 5
+
+def test_website_answers_503_after_slow_hooks(mk):
+    mk(('index.html', "Greetings, program!"))
+    website = handle('/', '--request_timeout=0.01').request.website
+    website.hooks.inbound_early.append(lambda request: time.sleep(0.02))
+    response = website.handle_safely(request_to(website))
+    assert response.code == 503
+    assert "after inbound_early hooks" in response.body
+
+def test_website_answers_503_after_slow_page_two(mk):
+    mk(('index.html.spt', "import time\n[---]\ntime.sleep(0.02)\n"
+                          "[---]\nGreetings, program!"))
+    response = handle('/', '--request_timeouts=/=0.01')
+    assert response.code == 503
+    assert "before rendering" in response.body
+
+def test_website_leaves_fast_requests_alone(mk):
+    mk(('index.html', "Greetings, program!"))
+    assert handle('/', '--request_timeout=5').code == 200
+
+def test_website_starts_and_cancels_an_engine_timeout(mk):
+    mk(('index.html', "Greetings, program!"))
+    website = handle('/', '--request_timeout=5').request.website
+    calls = []
+    class Timeout(object):
+        def cancel(self):
+            calls.append('cancel')
+    def start_timeout(seconds, exception):
+        calls.append((round(seconds), exception.code))
+        return Timeout()
+    website.network_engine.start_timeout = start_timeout
+    assert website.handle_safely(request_to(website)).code == 200
+    assert calls == [(5, 503), 'cancel']
+
+
+# parse
+
+def test_parse_request_timeouts_good():
+    actual = parse.request_timeouts('/api/=0.5, /reports/=30')
+    assert actual == [(b'/api/', 0.5), (b'/reports/', 30)]
+
+def test_parse_request_timeouts_bad():
+    raises(ValueError, parse.request_timeouts, '/api/')
+    raises(ValueError, parse.request_timeouts, 'api=5')
+    raises(ValueError, parse.request_timeouts, '/api/=-1')
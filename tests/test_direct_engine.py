@@ -0,0 +1,234 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import socket
+import threading
+import time
+
+import pytest
+from pytest import raises
+
+from aspen import Response
+from aspen.http.request import Request
+from aspen.network_engines import listen
+from aspen.network_engines.direct_ import COALESCE, Engine, send
+from aspen.testing.fsfix import FSFIX
+from aspen.website import Website
+
+
+ECHO = ('index.spt', "[---]\nraw = request.body.raw\n[---] text/plain\n%(raw)s")
+STREAM = """\
+from aspen import Response
+[---]
+raise Response(200, iter(['Greetings, ', 'program!']))
+[---]
+"""
+
+
+@pytest.fixture
+def serve(mk, request):
+    def serve(*files, **kw):
+        mk(*files)
+        website = Website(['--www_root', FSFIX] + kw.get('argv', []))
+        website.network_engine = Engine('direct', website)
+        website.network_socket = listen(('127.0.0.1', 0), socket.AF_INET)
+        address = website.network_socket.getsockname()
+        website.network_engine.bind()
+        server = threading.Thread(target=website.network_engine.start)
+        server.daemon = True
+        server.start()
+        request.addfinalizer(website.network_engine.stop)
+        return address
+    return serve
+
+def serve_on(website, extra_sockets, request):
+    website.network_engine = Engine('direct', website)
+    website.network_socket = listen(('127.0.0.1', 0), socket.AF_INET)
+    website.extra_sockets = extra_sockets
+    website.network_engine.bind()
+    server = threading.Thread(target=website.network_engine.start)
+    server.daemon = True
+    server.start()
+    request.addfinalizer(website.network_engine.stop)
+
+def converse(address, data, until):
+    client = socket.create_connection(address)
+    client.settimeout(5)
+    client.sendall(data)
+    received = b''
+    deadline = time.time() + 5
+    while received.count(b'HTTP/1.') < until and time.time() < deadline:
+        chunk = client.recv(65536)
+        if not chunk:
+            break
+        received += chunk
+    client.close()
+    return received
+
+
+def test_direct_engine_serves_a_request(serve):
+    address = serve(('index.html', "Greetings, program!"))
+    response = converse(address, b"GET / HTTP/1.1\r\nHost: x\r\n\r\n", 1)
+    assert response.startswith(b"HTTP/1.1 200 OK\r\n")
+    assert response.endswith(b"\r\n\r\nGreetings, program!")
+    assert b"Content-Length: 19\r\n" in response
+
+def test_direct_engine_serves_extra_sockets(mk, tmpdir, request):
+    mk(('index.html', "Greetings, program!"))
+    path = str(tmpdir.join('admin.sock'))
+    website = Website(['--www_root', FSFIX])
+    serve_on(website, [listen(path, socket.AF_UNIX)], request)
+    for address in (website.network_socket.getsockname(), path):
+        family = socket.AF_UNIX if address == path else socket.AF_INET
+        client = socket.socket(family, socket.SOCK_STREAM)
+        client.settimeout(5)
+        client.connect(address)
+        client.sendall(b"GET / HTTP/1.1\r\nHost: x\r\n"
+                       b"Connection: close\r\n\r\n")
+        response = client.makefile(str('rb')).read()
+        client.close()
+        assert response.endswith(b"\r\n\r\nGreetings, program!")
+
+def test_direct_engine_handles_pipelined_requests(serve):
+    address = serve(('index.html', "Greetings, program!"))
+    request = b"GET / HTTP/1.1\r\nHost: x\r\n\r\n"
+    response = converse(address, request * 3, 3)
+    assert response.count(b"Greetings, program!") == 3
+
+def test_direct_engine_closes_when_asked(serve):
+    address = serve(('index.html', "Greetings, program!"))
+    request = b"GET / HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n"
+    response = converse(address, request * 2, 2)
+    assert response.count(b"Greetings, program!") == 1
+    assert b"Connection: close\r\n" in response
+
+def test_direct_engine_reads_chunked_bodies(serve):
+    address = serve(ECHO)
+    request = ( b"POST / HTTP/1.1\r\nHost: x\r\nTransfer-Encoding: chunked\r\n"
+                b"\r\n5\r\nHello\r\n7\r\n, world\r\n0\r\n\r\n"
+               )
+    response = converse(address, request, 1)
+    assert response.endswith(b"Hello, world")
+
+def test_direct_engine_sends_100_continue(serve):
+    address = serve(ECHO)
+    request = ( b"POST / HTTP/1.1\r\nHost: x\r\nContent-Length: 5\r\n"
+                b"Expect: 100-continue\r\n\r\nHello"
+               )
+    response = converse(address, request, 2)
+    assert response.startswith(b"HTTP/1.1 100 Continue\r\n\r\nHTTP/1.1 200 OK")
+    assert response.endswith(b"Hello")
+
+def test_direct_engine_unfolds_headers(serve):
+    address = serve(('index.spt', "[---]\nfoo = request.headers['X-Foo']\n"
+                                  "[---] text/plain\n%(foo)s"))
+    request = b"GET / HTTP/1.1\r\nHost: x\r\nX-Foo: bar:\r\n  baz\r\n\r\n"
+    response = converse(address, request, 1)
+    assert response.endswith(b"\r\n\r\nbar: baz")
+
+def test_direct_engine_supplies_host_for_http_1_0(serve):
+    address = serve(('index.html', "Greetings, program!"))
+    response = converse(address, b"GET / HTTP/1.0\r\n\r\n", 1)
+    assert response.startswith(b"HTTP/1.1 200 OK\r\n")
+    assert b"Connection: close\r\n" in response
+
+def test_direct_engine_chunks_streamed_bodies(serve):
+    address = serve(('index.html.spt', STREAM))
+    request = b"GET / HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n"
+    response = converse(address, request, 2)    # i.e., until they hang up
+    assert b"Transfer-Encoding: chunked\r\n" in response
+    assert response.endswith(b"\r\n\r\nb\r\nGreetings, \r\n8\r\nprogram!\r\n"
+                             b"0\r\n\r\n")
+
+def test_direct_engine_sends_no_body_for_head(serve):
+    address = serve(('index.html', "Greetings, program!"))
+    response = converse(address, b"HEAD / HTTP/1.1\r\nHost: x\r\n\r\n", 1)
+    assert response.startswith(b"HTTP/1.1 200 OK\r\n")
+    assert response.endswith(b"\r\n\r\n")
+
+def test_direct_engine_refuses_a_big_body(serve):
+    address = serve(ECHO, argv=['--max_body_size=4'])
+    request = ( b"POST / HTTP/1.1\r\nHost: x\r\nContent-Length: 5\r\n"
+                b"Expect: 100-continue\r\n\r\n"
+               )
+    response = converse(address, request, 1)
+    assert response.startswith(b"HTTP/1.1 413 Request Entity Too Large\r\n")
+    assert b"100 Continue" not in response
+
+def test_direct_engine_refuses_a_big_chunked_body(serve):
+    address = serve(ECHO, argv=['--max_body_size=10'])
+    request = ( b"POST / HTTP/1.1\r\nHost: x\r\nTransfer-Encoding: chunked\r\n"
+                b"\r\n5\r\nHello\r\n7\r\n, world\r\n0\r\n\r\n"
+               )
+    response = converse(address, request, 1)
+    assert response.startswith(b"HTTP/1.1 413 Request Entity Too Large\r\n")
+
+def test_direct_engine_rejects_garbage(serve):
+    address = serve(('index.html', "Greetings, program!"))
+    response = converse(address, b"garbage\r\n\r\n", 1)
+    assert response.startswith(b"HTTP/1.1 400 Bad Request\r\n")
+
+def test_direct_engine_rejects_a_missing_host(serve):
+    address = serve(('index.html', "Greetings, program!"))
+    response = converse(address, b"GET / HTTP/1.1\r\nX-Foo: bar\r\n\r\n", 1)
+    assert response.startswith(b"HTTP/1.1 400 Bad Request\r\n")
+
+
+# send
+
+class StubSocket(object):
+    def __init__(self):
+        self.sent = []
+    def sendall(self, data):
+        self.sent.append(data)
+
+def test_send_gathers_small_buffers():
+    conn = StubSocket()
+    send(conn, [b'foo', b'', b'bar', b'baz'])
+    assert conn.sent == [b'foobarbaz']
+
+def test_send_doesnt_copy_big_buffers():
+    conn = StubSocket()
+    big = b'x' * COALESCE
+    send(conn, [b'head', big, b'tail'])
+    assert conn.sent == [b'head', big, b'tail']
+    assert conn.sent[1] is big
+
+
+# write_response
+
+class Closeable(object):
+    def __init__(self):
+        self.closed = False
+    def __iter__(self):
+        return iter([b'Greetings, ', b'program!'])
+    def close(self):
+        self.closed = True
+
+class HungUpSocket(object):
+    def sendall(self, data):
+        raise socket.error(32, "Broken pipe")
+
+def write_to(conn, mk):
+    mk()
+    engine = Engine('direct', Website(['--www_root', FSFIX]))
+    body = Closeable()
+    response = Response(200, body)
+    response.request = Request(b'GET', b'/', headers=b'Host: localhost')
+    return body, lambda: engine.write_response(conn, response.request,
+                                               response, True)
+
+def test_write_response_closes_streamed_bodies(mk):
+    conn = StubSocket()
+    body, write = write_to(conn, mk)
+    write()
+    assert b''.join(conn.sent).endswith(b'program!\r\n0\r\n\r\n')
+    assert body.closed
+
+def test_write_response_closes_streamed_bodies_when_the_client_hangs_up(mk):
+    body, write = write_to(HungUpSocket(), mk)
+    raises(socket.error, write)
+    assert body.closed
+
@@ -3,7 +3,14 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import os
+import socket
+import threading
+
+from pytest import raises
+
 from aspen import execution
+from aspen.network_engines import listen
 
 class Foo:
     pass
@@ -22,3 +29,123 @@ def test_startup_basically_works():
 
 
 
+
+
+def test_inherited_sockets_are_none_by_default(monkeypatch):
+    monkeypatch.delenv(execution.INHERITED_FDS, raising=False)
+    assert execution.inherited_sockets() == []
+
+def test_hand_off_round_trips_through_inherited_sockets(monkeypatch):
+    monkeypatch.setattr(execution, 'listeners', [])
+    sock = listen(('127.0.0.1', 0), socket.AF_INET)
+    execution.hand_off(sock)
+    sock.close()    # the hand-off keeps its own copy open
+    monkeypatch.setenv( execution.INHERITED_FDS
+                      , str(execution.listeners[0].fileno())
+                       )
+    inherited, = execution.inherited_sockets()
+    try:
+        assert execution.INHERITED_FDS not in os.environ
+        client = socket.create_connection(inherited.getsockname())
+        conn, addr = inherited.accept()
+        conn.close()
+        client.close()
+    finally:
+        inherited.close()
+
+def test_hand_off_keeps_several_sockets_in_order(monkeypatch, tmpdir):
+    monkeypatch.setattr(execution, 'listeners', [])
+    path = str(tmpdir.join('admin.sock'))
+    public = listen(('127.0.0.1', 0), socket.AF_INET)
+    admin = listen(path, socket.AF_UNIX)
+    execution.hand_off(public, admin)
+    fds = [str(os.dup(sock.fileno())) for sock in execution.listeners]
+    monkeypatch.setenv(execution.INHERITED_FDS, str(','.join(fds)))
+    inherited = execution.inherited_sockets()
+    try:
+        assert [sock.getsockname() for sock in inherited] == \
+                                        [public.getsockname(), path]
+        assert [sock.family for sock in inherited] == \
+                                        [socket.AF_INET, socket.AF_UNIX]
+    finally:
+        for sock in inherited + execution.listeners + [public, admin]:
+            sock.close()
+
+def test_inherited_sockets_read_like_any_other(monkeypatch):
+    sock = listen(('127.0.0.1', 0), socket.AF_INET)
+    sock.settimeout(1)  # leaves the descriptor non-blocking
+    monkeypatch.setenv(execution.INHERITED_FDS, str(os.dup(sock.fileno())))
+    inherited, = execution.inherited_sockets()
+    try:
+        client = socket.create_connection(inherited.getsockname())
+        conn, addr = inherited.accept()
+        conn.settimeout(5)
+        client.sendall(b"Greetings, program!\r\n")
+        assert conn.makefile(str('rb')).readline() == b"Greetings, program!\r\n"
+        conn.close()
+        client.close()
+    finally:
+        inherited.close()
+        sock.close()
+
+def test_from_fd_finds_the_family():
+    sock = socket.socket(socket.AF_INET6, socket.SOCK_STREAM)
+    sock.bind(('::1', 0))
+    sock.listen(5)
+    adopted = execution.from_fd(sock.fileno())
+    try:
+        assert adopted.family == socket.AF_INET6
+        assert adopted.getsockname() == sock.getsockname()
+    finally:
+        adopted.close()
+        sock.close()
+
+def test_adopt_closes_the_descriptors_its_given():
+    sock = listen(('127.0.0.1', 0), socket.AF_INET)
+    fd = os.dup(sock.fileno())
+    adopted, = execution.adopt([fd])
+    try:
+        assert adopted.fileno() != fd
+        raises(OSError, os.fstat, fd)
+    finally:
+        adopted.close()
+        sock.close()
+
+def test_activated_fds_follow_systemd(monkeypatch):
+    monkeypatch.setenv(execution.LISTEN_FDS, str('2'))
+    monkeypatch.setenv(execution.LISTEN_PID, str(os.getpid()))
+    monkeypatch.setenv(execution.LISTEN_FDNAMES, str('http:admin'))
+    assert execution.activated_fds() == [3, 4]
+    assert execution.LISTEN_FDS not in os.environ
+    assert execution.LISTEN_PID not in os.environ
+    assert execution.LISTEN_FDNAMES not in os.environ
+
+def test_activated_fds_are_for_our_pid_only(monkeypatch):
+    monkeypatch.setenv(execution.LISTEN_FDS, str('2'))
+    monkeypatch.setenv(execution.LISTEN_PID, str(os.getpid() + 1))
+    assert execution.activated_fds() == []
+    assert execution.LISTEN_FDS not in os.environ
+
+def test_activated_fds_are_none_by_default(monkeypatch):
+    monkeypatch.delenv(execution.LISTEN_FDS, raising=False)
+    assert execution.activated_fds() == []
+
+def test_graceful_stops_the_website_then_re_executes(monkeypatch):
+    calls = []
+    monkeypatch.setattr(execution, '_do_execv', lambda: calls.append('execv'))
+    website = Foo()
+    website.stop = lambda: calls.append('stop')
+    execute = execution.graceful(website)
+    execute()
+    execute()
+    assert calls == ['stop', 'execv']
+
+def test_graceful_defers_to_the_main_thread(monkeypatch):
+    kills = []
+    monkeypatch.setattr(os, 'kill', lambda *a: kills.append(a))
+    execute = execution.graceful(Foo())
+    for i in range(2):
+        checker = threading.Thread(target=execute)
+        checker.start()
+        checker.join()
+    assert len(kills) == 1
@@ -3,7 +3,7 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
-from aspen.hooks import Hooks
+from aspen.hooks import HookList, Hooks
 
 
 def test_hooks_is_barely_instantiable():
@@ -19,3 +19,52 @@ def test_hooks_can_Be_run():
 
 
 
+
+def test_hooks_run_returns_thing_for_unknown_hook():
+    thing = object()
+    actual = Hooks().run('nope', thing)
+    assert actual is thing
+
+def test_hooks_wraps_lists_in_hook_lists():
+    hooks = Hooks()
+    hooks.yeah_hook = [lambda thing: thing]
+    assert isinstance(hooks.yeah_hook, HookList)
+
+def test_hooks_run_in_order():
+    hooks = Hooks()
+    hooks.yeah_hook = [lambda l: l + [1], lambda l: l + [2]]
+    actual = hooks.run('yeah_hook', [])
+    assert actual == [1, 2]
+
+def test_hooks_that_return_None_pass_thing_through():
+    hooks = Hooks()
+    hooks.yeah_hook = [lambda l: l.append(1), lambda l: l.append(2)]
+    actual = hooks.run('yeah_hook', [])
+    assert actual == [1, 2]
+
+def test_hook_list_is_recompiled_when_mutated():
+    hooks = Hooks()
+    hooks.yeah_hook = [lambda l: l + [1]]
+    assert hooks.run('yeah_hook', []) == [1]
+    hooks.yeah_hook.append(lambda l: l + [2])
+    assert hooks.run('yeah_hook', []) == [1, 2]
+    hooks.yeah_hook[:] = []
+    assert hooks.run('yeah_hook', []) == []
+
+def test_hooks_arent_timed_by_default():
+    hooks = Hooks()
+    hooks.yeah_hook = [lambda thing: thing]
+    hooks.run('yeah_hook', None)
+    assert hooks.timings is None
+
+def test_instrumented_hooks_are_timed():
+    def yeah(thing):
+        pass
+    hooks = Hooks()
+    hooks.yeah_hook = [yeah]
+    hooks.run('yeah_hook', None)
+    hooks.instrument()
+    hooks.run('yeah_hook', None)
+    hooks.run('yeah_hook', None)
+    histogram = hooks.timings[('yeah_hook', 'test_hooks.yeah')]
+    assert histogram.count == 2
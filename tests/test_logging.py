@@ -5,10 +5,11 @@ from __future__ import unicode_literals
 
 import re
 import sys
+import time
 from StringIO import StringIO
 
 import aspen.logging
-from aspen.logging import log, log_dammit
+from aspen.logging import BatchWriter, log, log_dammit
 
 
 pat = re.compile("pid-\d* thread--?\d* \(MainThread\) (.*)")
@@ -29,9 +30,11 @@ def capture(*a, **kw):
         __threshold__ = aspen.logging.LOGGING_THRESHOLD
         if 'threshold' in kw:
             aspen.logging.LOGGING_THRESHOLD = kw.pop('threshold')
+        aspen.logging.flush()
         sys.stdout = StringIO()
         func(*a, **kw)
-        output = sys.stdout.getvalue()
+        aspen.logging.flush()
+        output = sys.stdout.getvalue().decode('utf8')
     finally:
         aspen.logging.LOGGING_THRESHOLD = __threshold__
         sys.stdout = sys.__stdout__
@@ -54,3 +57,48 @@ def test_logging_unicode_works():
     actual = capture("oh \u2614 heck", level=4)
     assert actual == ["oh \u2614 heck"]
 
+
+
+# BatchWriter
+
+def capture_flush(writer):
+    try:
+        sys.stdout = StringIO()
+        writer.flush()
+        output = sys.stdout.getvalue()
+    finally:
+        sys.stdout = sys.__stdout__
+    return output
+
+def test_batch_writer_writes_on_flush():
+    writer = BatchWriter(interval=60)
+    writer.write(b"oh")
+    writer.write(b"heck")
+    assert capture_flush(writer) == b"oh\nheck\n"
+
+def test_batch_writer_formats_items():
+    writer = BatchWriter(lambda item: b"%s-%s" % item, interval=60)
+    writer.write((b"oh", b"heck"))
+    assert capture_flush(writer) == b"oh-heck\n"
+
+def test_batch_writer_drops_oldest_when_full():
+    writer = BatchWriter(capacity=2, interval=60)
+    for item in (b"one", b"two", b"three"):
+        writer.write(item)
+    assert writer.dropped == 1
+    expected = b"(dropped 1 lines from a full buffer)\ntwo\nthree\n"
+    assert capture_flush(writer) == expected
+
+def test_batch_writer_writes_from_background_thread():
+    writer = BatchWriter(batch_size=1, interval=60)
+    try:
+        sys.stdout = StringIO()
+        writer.write(b"oh heck")
+        for i in range(100):
+            if not writer.buffer:
+                break
+            time.sleep(0.01)
+        output = sys.stdout.getvalue()
+    finally:
+        sys.stdout = sys.__stdout__
+    assert output == b"oh heck\n"
@@ -0,0 +1,156 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from aspen.metrics import ( Histogram, NBUCKETS, Registry, bucket_for
+                          , cumulative, escape, upper_bound
+                           )
+from aspen.http.request import Request
+from aspen.testing import handle, StubRequest
+from aspen.testing.fsfix import FSFIX
+
+
+# Histogram
+
+def test_bucket_upper_bound_is_close():
+    for value in (0.000123, 0.5, 1, 3, 100.5):
+        bound = upper_bound(bucket_for(value))
+        assert value <= bound <= value * 1.04
+
+def test_tiny_values_go_in_the_first_bucket():
+    assert bucket_for(0) == bucket_for(1e-9) == 0
+
+def test_huge_values_go_in_the_last_bucket():
+    assert bucket_for(1e9) == NBUCKETS - 1
+
+def test_histogram_counts():
+    histogram = Histogram()
+    for value in (1, 2, 3, 0):
+        histogram.record(value)
+    assert histogram.count == 4
+    assert histogram.sum == 6
+    assert histogram.max == 3
+
+def test_histogram_percentiles_are_close():
+    histogram = Histogram()
+    for i in range(1, 1001):
+        histogram.record(i / 1000)
+    assert 0.49 <= histogram.percentile(50) <= 0.53
+    assert 0.98 <= histogram.percentile(99) <= 1.0
+    assert histogram.percentile(100) == 1.0
+
+def test_empty_histogram_percentile_is_zero():
+    assert Histogram().percentile(99) == 0.0
+
+def test_histogram_buckets_are_sorted_and_sparse():
+    histogram = Histogram()
+    for value in (3, 0, 1, 3):
+        histogram.record(value)
+    buckets = histogram.buckets()
+    assert [n for bound, n in buckets] == [1, 1, 2]
+    assert [bound for bound, n in buckets] == sorted(b for b, n in buckets)
+
+def test_histogram_snapshot():
+    histogram = Histogram()
+    histogram.record(0.25)
+    snapshot = histogram.snapshot()
+    assert snapshot['count'] == 1
+    assert snapshot['p99'] == 0.25
+
+
+# Registry
+
+def test_registry_records_totals():
+    registry = Registry()
+    registry.record('/foo', 200, 0.5)
+    registry.record('/foo', 500, 0.5)
+    metrics = registry.get('/foo')
+    assert (metrics.count, metrics.errors, metrics.total.count) == (2, 1, 2)
+
+def test_disabled_registry_records_nothing():
+    registry = Registry(enabled=False)
+    registry.record('/foo', 200, 0.5)
+    assert registry.get('/foo') is None
+    assert registry.snapshot() == {}
+
+def test_registry_snapshot():
+    registry = Registry()
+    registry.record('/foo', 200, 0.5)
+    snapshot = registry.snapshot()
+    assert snapshot['/foo']['count'] == 1
+    assert snapshot['/foo']['total']['count'] == 1
+
+
+# Website
+
+def test_website_records_metrics_per_resource(mk):
+    mk(('index.html.spt', "[---]\nGreetings, program!"))
+    response = handle()
+    metrics = response.request.website.metrics.snapshot()
+    fs = FSFIX + '/index.html.spt'
+    assert metrics[fs]['count'] == 1
+    for name in ('dispatch', 'page_two', 'render', 'total'):
+        assert metrics[fs][name]['count'] == 1
+
+def test_website_records_errors(mk):
+    mk(('index.html.spt', "raise heck\n[---]\n"))
+    response = handle()
+    metrics = response.request.website.metrics.snapshot()
+    assert metrics[FSFIX + '/index.html.spt']['errors'] == 1
+
+def test_website_doesnt_record_metrics_when_disabled(mk):
+    mk(('index.html.spt', "[---]\nGreetings, program!"))
+    response = handle('/', '--collect_metrics=no')
+    assert response.request.website.metrics.snapshot() == {}
+
+
+# Prometheus
+
+def test_cumulative_rolls_up_buckets():
+    histogram = Histogram()
+    for value in (0.0001, 0.003, 0.003, 20):
+        histogram.record(value)
+    counts = cumulative(histogram)
+    assert counts[0] == 1       # le=0.001
+    assert counts[2] == 3       # le=0.005
+    assert counts[-2] == 3      # le=10
+    assert counts[-1] == 4      # le=+Inf
+
+def test_escape_escapes_label_values():
+    assert escape('a"b\\c\nd') == 'a\\"b\\\\c\\nd'
+
+def test_metrics_path_serves_prometheus_text(mk):
+    mk(('index.html.spt', "[---]\nGreetings, program!"))
+    website = handle().request.website
+    website.metrics_path = b'/metrics'
+    request = StubRequest(b'/metrics')
+    response = website.handle_safely(request)
+    assert response.code == 200
+    assert response.headers['Content-Type'] == b'text/plain; version=0.0.4'
+    fs = FSFIX + '/index.html.spt'
+    assert b'aspen_requests_total{fs="%s"} 1.0' % fs in response.body
+    assert b'aspen_request_seconds_count{fs="%s"} 1' % fs in response.body
+    assert b'aspen_resource_cache_entries' in response.body
+
+def test_metrics_path_bypasses_hooks_and_metrics(mk):
+    mk(('index.html', "Greetings, program!"))
+    website = handle('/', '--metrics_path=/metrics').request.website
+    website.hooks.inbound_early = [lambda request: 1/0]
+    response = website.handle_safely(StubRequest(b'/metrics'))
+    assert response.code == 200
+    assert list(website.metrics.resources) == [FSFIX + '/index.html']
+
+def test_metrics_path_drops_the_body_for_head(mk):
+    mk(('index.html', "Greetings, program!"))
+    website = handle('/', '--metrics_path=/metrics').request.website
+    request = Request(b'HEAD', b'/metrics', headers=b'Host: localhost')
+    response = website.handle_safely(request)
+    assert response.code == 200
+    assert response.body == b''
+    assert int(response.headers['Content-Length']) > 0
+
+def test_metrics_path_is_off_by_default(mk):
+    mk(('index.html', "Greetings, program!"))
+    response = handle('/metrics')
+    assert response.code == 404
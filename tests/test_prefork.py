@@ -0,0 +1,301 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os
+import signal
+import socket
+import threading
+import time
+import urllib2
+
+from pytest import raises
+
+from aspen import execution, prefork
+from aspen.configuration import parse
+from aspen.network_engines import SO_REUSEPORT, listen
+from aspen.prefork import Master, Recycler, bound_to, rss
+from aspen.testing.fsfix import FSFIX
+from aspen.website import Website
+
+
+class Foo:
+    pass
+
+def StubWebsite(workers=2):
+    website = Foo()
+    website.workers = workers
+    website.reuse_port = False
+    website.changes_reload = False
+    website.network_address = ('127.0.0.1', 0)
+    website.network_sockfam = socket.AF_INET
+    website.network_socket = None
+    website.extra_sockets = []
+    website.drain_timeout = 5
+    website.max_requests = 0
+    website.max_requests_jitter = 0
+    website.max_rss = 0
+    website.access_log = Foo()
+    website.access_log.flush = lambda: None
+    website.network_engine = Foo()
+    website.network_engine.bind = lambda: None
+    website.start = lambda: time.sleep(60)
+    website.stop = lambda: None
+    return website
+
+def wait_for(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while not predicate() and time.time() < deadline:
+        time.sleep(0.05)
+    return predicate()
+
+
+# listen
+
+def test_listen_returns_a_listening_socket():
+    sock = listen(('127.0.0.1', 0), socket.AF_INET)
+    try:
+        client = socket.create_connection(sock.getsockname())
+        conn, addr = sock.accept()
+        conn.close()
+        client.close()
+    finally:
+        sock.close()
+
+def test_listen_can_reuse_port():
+    if SO_REUSEPORT is None:
+        return
+    one = listen(('127.0.0.1', 0), socket.AF_INET, reuse_port=True)
+    two = listen(one.getsockname(), socket.AF_INET, reuse_port=True)
+    assert one.getsockname() == two.getsockname()
+    one.close()
+    two.close()
+
+
+# engine
+
+def test_cheroot_engine_serves_on_network_socket(mk):
+    mk(('index.html', "Greetings, program!"))
+    website = Website(['--www_root', FSFIX])
+    website.network_socket = listen(('127.0.0.1', 0), socket.AF_INET)
+    host, port = website.network_socket.getsockname()
+    website.network_engine.bind()
+    server = threading.Thread(target=website.network_engine.start)
+    server.daemon = True
+    server.start()
+    try:
+        assert wait_for(lambda: website.network_engine.cheroot_server.ready)
+        body = urllib2.urlopen('http://%s:%d/' % (host, port)).read()
+        assert body == b"Greetings, program!"
+    finally:
+        website.network_engine.stop()
+    server.join(5)
+    assert not server.is_alive()
+
+
+# Master
+
+def test_master_spawns_and_stops_workers():
+    master = Master(StubWebsite())
+    master.listener = listen(('127.0.0.1', 0), socket.AF_INET)
+    try:
+        pids = [master.spawn(), master.spawn()]
+        assert sorted(master.workers) == sorted(pids)
+        master.stop_workers()
+        assert master.workers == {}
+    finally:
+        master.listener.close()
+
+def test_master_replaces_dead_workers(monkeypatch):
+    monkeypatch.setattr(prefork, 'RESPAWN_DELAY', 0)
+    master = Master(StubWebsite())
+    master.listener = listen(('127.0.0.1', 0), socket.AF_INET)
+    try:
+        pid = master.spawn()
+        os.kill(pid, signal.SIGKILL)
+        assert wait_for(lambda: master.reap() or pid not in master.workers)
+        assert len(master.workers) == 1
+    finally:
+        master.stop_workers()
+        master.listener.close()
+
+def test_master_doesnt_replace_workers_when_stopping():
+    master = Master(StubWebsite())
+    master.listener = listen(('127.0.0.1', 0), socket.AF_INET)
+    try:
+        pid = master.spawn()
+        master.stopping = True
+        os.kill(pid, signal.SIGKILL)
+        assert wait_for(lambda: master.reap() or not master.workers)
+    finally:
+        master.stop_workers()
+        master.listener.close()
+
+def test_reexecute_stops_the_master():
+    master = Master(StubWebsite())
+    master.reexecute()
+    assert master.stopping and master.reexecuting
+
+def test_master_drains_workers_and_reaps_them():
+    master = Master(StubWebsite())
+    master.listener = listen(('127.0.0.1', 0), socket.AF_INET)
+    try:
+        pid = master.spawn()
+        master.stopping = True
+        master.drain([pid])
+        assert pid in master.draining and pid not in master.workers
+        assert wait_for(lambda: master.reap() or not master.draining)
+    finally:
+        master.stop_workers()
+        master.listener.close()
+
+def test_master_kills_workers_that_dont_drain_in_time(monkeypatch):
+    monkeypatch.setattr(prefork, 'KILL_AFTER', 0)
+    website = StubWebsite()
+    website.drain_timeout = 0
+    master = Master(website)
+    master.listener = listen(('127.0.0.1', 0), socket.AF_INET)
+    try:
+        pid = master.spawn()
+        master.stopping = True
+        master.draining[pid] = time.time() - 1  # as if we'd asked nicely
+        del master.workers[pid]
+        master.kill_overdue()
+        pid_, status = os.waitpid(pid, 0)
+        assert os.WIFSIGNALED(status)
+    finally:
+        master.listener.close()
+
+def test_master_hands_off_its_socket_and_workers(monkeypatch):
+    monkeypatch.setattr(execution, 'listeners', [])
+    master = Master(StubWebsite())
+    master.listener = listen(('127.0.0.1', 0), socket.AF_INET)
+    master.workers = {101: 0, 102: 0}
+    try:
+        master.hand_off()
+        pids = os.environ.pop(execution.DRAIN_PIDS)
+        assert sorted(pids.split(',')) == ['101', '102']
+        assert [sock.getsockname() for sock in execution.listeners] == \
+                                                [master.listener.getsockname()]
+    finally:
+        for sock in execution.listeners:
+            sock.close()
+        master.listener.close()
+
+def test_master_hands_off_extra_sockets_too(monkeypatch):
+    monkeypatch.setattr(execution, 'listeners', [])
+    website = StubWebsite()
+    website.extra_sockets = [listen(('127.0.0.1', 0), socket.AF_INET)]
+    master = Master(website)
+    master.listener = listen(('127.0.0.1', 0), socket.AF_INET)
+    try:
+        master.hand_off()
+        os.environ.pop(execution.DRAIN_PIDS)
+        assert [sock.getsockname() for sock in execution.listeners] == \
+                                    [ master.listener.getsockname()
+                                    , website.extra_sockets[0].getsockname()
+                                     ]
+    finally:
+        for sock in execution.listeners + website.extra_sockets:
+            sock.close()
+        master.listener.close()
+
+def test_bound_to_tells_our_sockets_from_passed_ones():
+    sock = listen(('127.0.0.1', 0), socket.AF_INET)
+    try:
+        assert bound_to(None, ('0.0.0.0', 8080))
+        assert bound_to(sock, sock.getsockname())
+        assert not bound_to(sock, ('0.0.0.0', 8080))
+    finally:
+        sock.close()
+
+def test_master_drains_its_predecessors(monkeypatch):
+    signals = []
+    master = Master(StubWebsite())
+    monkeypatch.setattr(master, 'signal', lambda *a: signals.append(a))
+    monkeypatch.setenv(execution.DRAIN_PIDS, str('101,102'))
+    master.drain_predecessors()
+    assert sorted(master.draining) == [101, 102]
+    assert signals == [(101, signal.SIGTERM), (102, signal.SIGTERM)]
+    assert execution.DRAIN_PIDS not in os.environ
+
+def test_master_recycles_workers_that_ask():
+    master = Master(StubWebsite())
+    master.listener = listen(('127.0.0.1', 0), socket.AF_INET)
+    try:
+        old = master.spawn()
+        reader, writer = os.pipe()
+        os.close(master.pipes[old])
+        master.pipes[old] = reader
+        os.write(writer, b'r')
+        master.recycle()
+        assert old in master.draining
+        assert len(master.workers) == 1 and old not in master.workers
+        os.close(writer)
+    finally:
+        master.stop_workers()
+        master.listener.close()
+
+
+# Recycler
+
+def recycler(max_requests=0, jitter=0, max_rss=0):
+    website = StubWebsite()
+    website.max_requests = max_requests
+    website.max_requests_jitter = jitter
+    website.max_rss = max_rss
+    reader, writer = os.pipe()
+    return Recycler(website, writer), reader
+
+def test_recycler_asks_after_max_requests():
+    recycler_, reader = recycler(max_requests=3)
+    for i in range(2):
+        recycler_(None)
+    assert not recycler_.asked
+    recycler_(None)
+    assert recycler_.asked
+    assert os.read(reader, 64) == b'r'
+
+def test_recycler_asks_only_once():
+    recycler_, reader = recycler(max_requests=1)
+    for i in range(3):
+        recycler_(None)
+    os.close(recycler_.pipe)
+    assert os.read(reader, 64) == b'r'
+
+def test_recycler_adds_jitter():
+    limits = set(recycler(max_requests=10, jitter=5)[0].limit for i in range(50))
+    assert min(limits) >= 10 and max(limits) <= 15 and len(limits) > 1
+
+def test_recycler_asks_when_rss_is_too_big(monkeypatch):
+    monkeypatch.setattr(prefork, 'rss', lambda: 2 * 1024 * 1024)
+    recycler_, reader = recycler(max_rss=1)
+    for i in range(prefork.RSS_EVERY):
+        recycler_(None)
+    assert recycler_.asked
+
+def test_recycler_passes_responses_through():
+    assert recycler(max_requests=1)[0]('response') == 'response'
+
+def test_rss_is_positive():
+    assert rss() > 0
+
+def test_describe_describes_exit_status():
+    assert prefork.describe(256) == "exited with status 1"
+    assert prefork.describe(9) == "was killed by signal 9"
+
+
+# configuration
+
+def test_parse_workers_good():
+    assert parse.workers('4') == 4
+
+def test_parse_workers_bad():
+    raises(ValueError, parse.workers, '-1')
+
+def test_workers_default_to_single_process(mk):
+    mk()
+    website = Website(['--www_root', FSFIX])
+    assert website.workers == 0
+    assert website.network_socket is None
@@ -0,0 +1,84 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import time
+
+from aspen.http.request import Request
+from aspen.profiling import constant_time_compare, is_requested, sign
+from aspen.testing import handle
+
+
+def request(path=b'/', headers=b''):
+    return Request(uri=path, headers=b'Host: localhost\r\n' + headers)
+
+def profiled(mk, token):
+    mk(('index.html.spt', "[---]\nGreetings, program!"))
+    website = handle('/', '--profiling_secret=sekrit').request.website
+    profiled_request = request(b'/', b'X-Aspen-Profile: ' + token)
+    profiled_request.website = website
+    return website.handle_safely(profiled_request)
+
+
+def test_sign_is_deterministic():
+    assert sign('sekrit', b'/', 1000) == sign('sekrit', b'/', 1000)
+
+def test_sign_depends_on_path():
+    assert sign('sekrit', b'/', 1000) != sign('sekrit', b'/foo', 1000)
+
+def test_constant_time_compare():
+    assert constant_time_compare(b'abc', b'abc')
+    assert not constant_time_compare(b'abc', b'abd')
+    assert not constant_time_compare(b'abc', b'ab')
+
+def test_is_requested_with_good_header():
+    token = sign('sekrit', b'/')
+    assert is_requested(request(b'/', b'X-Aspen-Profile: ' + token), 'sekrit')
+
+def test_is_requested_with_good_querystring():
+    token = sign('sekrit', b'/')
+    assert is_requested(request(b'/?aspen_profile=' + token), 'sekrit')
+
+def test_is_requested_without_token():
+    assert not is_requested(request(b'/'), 'sekrit')
+
+def test_is_requested_with_wrong_secret():
+    token = sign('hacker', b'/')
+    assert not is_requested(request(b'/', b'X-Aspen-Profile: ' + token), 'sekrit')
+
+def test_is_requested_with_wrong_path():
+    token = sign('sekrit', b'/admin')
+    assert not is_requested(request(b'/', b'X-Aspen-Profile: ' + token), 'sekrit')
+
+def test_is_requested_with_expired_token():
+    token = sign('sekrit', b'/', time.time() - 1)
+    assert not is_requested(request(b'/', b'X-Aspen-Profile: ' + token), 'sekrit')
+
+def test_is_requested_with_garbage():
+    assert not is_requested(request(b'/', b'X-Aspen-Profile: garbage'), 'sekrit')
+
+def test_is_requested_with_non_ascii_querystring():
+    assert not is_requested(request(b'/?aspen_profile=%C3%A9'), 'sekrit')
+
+def test_non_ascii_token_doesnt_break_the_request(mk):
+    mk(('index.html.spt', "[---]\nGreetings, program!"))
+    website = handle('/', '--profiling_secret=sekrit').request.website
+    weird = request(b'/?aspen_profile=%C3%A9')
+    weird.website = website
+    response = website.handle_safely(weird)
+    assert response.code == 200
+    assert 'Server-Timing' not in response.headers
+
+def test_profiled_request_gets_server_timing(mk):
+    response = profiled(mk, sign('sekrit', b'/'))
+    assert response.code == 200
+    assert response.body == "Greetings, program!"
+    timings = response.headers.all('Server-Timing')
+    assert timings[0].startswith(b'total;dur=')
+    assert len(timings) > 1
+
+def test_badly_signed_request_isnt_profiled(mk):
+    response = profiled(mk, sign('hacker', b'/'))
+    assert response.code == 200
+    assert 'Server-Timing' not in response.headers
@@ -0,0 +1,134 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from pytest import raises
+
+from aspen import Response
+from aspen.auth import User
+from aspen.hooks import Hooks
+from aspen.hooks import ratelimit
+from aspen.hooks.filters import by_regex
+from aspen.hooks.ratelimit import Buckets, by_forwarded_ip, by_header, \
+                                  by_ip, by_user, token_bucket
+from aspen.http.request import Request
+
+
+def request_from(addr=b'10.0.0.1', headers=b'', uri=b'/'):
+    request = Request(uri=uri, headers=b'Host: localhost\r\n' + headers)
+    request.remote_addr = addr
+    return request
+
+
+# Buckets
+# =======
+
+def test_buckets_start_full():
+    buckets = Buckets(rate=1, burst=3)
+    assert [buckets.take('a')[0] for i in range(4)] == [True, True, True, False]
+
+def test_buckets_are_per_key():
+    buckets = Buckets(rate=1, burst=1)
+    assert buckets.take('a')[0]
+    assert buckets.take('b')[0]
+    assert not buckets.take('a')[0]
+
+def test_buckets_refill_lazily(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, 'time', lambda: now[0])
+    buckets = Buckets(rate=2, burst=2)
+    buckets.take('a'); buckets.take('a')
+    assert buckets.take('a') == (False, 0, 0.5)
+    now[0] += 0.5
+    assert buckets.take('a') == (True, 0, 0.5)
+    now[0] += 60
+    assert buckets.take('a') == (True, 1, 0)
+
+def test_buckets_are_bounded():
+    buckets = Buckets(rate=1, burst=1, size=8, shards=4)
+    for i in range(100):
+        buckets.take(i)
+    assert len(buckets) <= 8
+
+def test_buckets_drop_the_least_recently_used():
+    buckets = Buckets(rate=1, burst=1, size=2, shards=1)
+    buckets.take('a'); buckets.take('b')
+    buckets.take('a')                   # a is fresher than b now
+    buckets.take('c')
+    lock, table, queue = buckets.shards[0]
+    assert sorted(table) == ['a', 'c']
+
+def test_buckets_dont_let_the_queue_grow_without_bound():
+    buckets = Buckets(rate=1, burst=1, size=4, shards=1)
+    for i in range(100):
+        buckets.take('a')
+        buckets.take('b')
+    lock, table, queue = buckets.shards[0]
+    assert len(queue) <= 2 * buckets.capacity
+    assert list(queue)[-2:] == [(198, 'a'), (199, 'b')]
+
+
+# Keys
+# ====
+
+def test_by_ip_keys_on_remote_addr():
+    assert by_ip(request_from(b'10.0.0.2')) == b'10.0.0.2'
+
+def test_by_forwarded_ip_takes_the_last_hop():
+    request = request_from(headers=b'X-Forwarded-For: 1.2.3.4, 10.9.8.7')
+    assert by_forwarded_ip(request) == b'10.9.8.7'
+
+def test_by_forwarded_ip_falls_back_to_remote_addr():
+    assert by_forwarded_ip(request_from(b'10.0.0.3')) == b'10.0.0.3'
+
+def test_by_user_skips_anonymous_users():
+    request = request_from()
+    request.context['user'] = User(None)
+    assert by_user(request) is None
+    request.context['user'] = User('alice')
+    assert by_user(request) == 'alice'
+
+def test_by_header_keys_on_header():
+    request = request_from(headers=b'X-Api-Key: sekrit')
+    assert by_header('X-Api-Key')(request) == b'sekrit'
+
+
+# Hook
+# ====
+
+def test_token_bucket_passes_requests_under_the_limit():
+    hook = token_bucket(rate=1, burst=2)
+    request = request_from()
+    assert hook(request) is request
+    assert hook(request) is request
+
+def test_token_bucket_raises_429_over_the_limit():
+    hook = token_bucket(rate=0.5, burst=1)
+    hook(request_from())
+    response = raises(Response, hook, request_from()).value
+    assert response.code == 429
+    assert response.headers['Retry-After'] == b'2'
+    assert response.headers['RateLimit-Limit'] == b'1'
+    assert response.headers['RateLimit-Remaining'] == b'0'
+    assert response.headers['RateLimit-Reset'] == b'2'
+
+def test_token_bucket_requires_a_positive_rate():
+    raises(ValueError, token_bucket, rate=0)
+    raises(ValueError, token_bucket, rate=-1, burst=5)
+
+def test_token_bucket_passes_requests_without_a_key():
+    hook = token_bucket(rate=1, burst=1, key=by_header('X-Api-Key'))
+    request = request_from()
+    assert hook(request) is request
+    assert hook(request) is request
+    assert len(hook.buckets) == 0
+
+def test_token_bucket_composes_with_by_regex():
+    hook = by_regex(token_bucket(rate=1, burst=1), {'/api': True}, False)
+    hooks = Hooks()
+    hooks.inbound_early = [hook]
+    for i in range(3):
+        hooks.run('inbound_early', request_from(uri=b'/'))
+    hooks.run('inbound_early', request_from(uri=b'/api/foo'))
+    raises(Response, hooks.run, 'inbound_early', request_from(uri=b'/api/foo'))
@@ -23,6 +23,44 @@ def test_raw_is_raw():
     actual = request
     assert actual == expected
 
+def test_str_of_request_is_raw():
+    request = Request(uri=b'/foo')
+    expected = b"GET /foo HTTP/1.1\r\nHost: localhost\r\n\r\n"
+    actual = str(request)
+    assert actual == expected
+
+def test_request_has_no_dict():
+    request = Request()
+    assert not hasattr(request, '__dict__')
+
+def test_requests_share_method_and_version_objects():
+    a, b = Request(), Request()
+    assert a.line.method is b.line.method
+    assert a.line.version is b.line.version
+
+def test_context_is_built_lazily():
+    request = Request()
+    assert request._context is None
+    context = request.context
+    assert request._context is context
+    assert request.context is context
+
+def test_context_has_method_flags():
+    context = Request(method=b'POST').context
+    assert context['POST'] is True
+    assert context.GET is False
+
+def test_context_can_be_replaced():
+    request = Request()
+    request.context = {}
+    assert request.context == {}
+
+def test_remote_addr_is_None_by_default():
+    assert Request().remote_addr is None
+
+def test_remote_addr_comes_from_wsgi():
+    assert StubRequest().remote_addr == b'0.0.0.0'
+
 def test_blank_by_default():
     raises(AttributeError, lambda: Request().version)
 
@@ -108,6 +146,13 @@ def test_headers_access_is_case_insensitive():
     actual = headers['foo']
     assert actual == expected
 
+def test_headers_cookie_is_parsed_lazily():
+    headers = BaseHeaders(b"Cookie: foo=bar")
+    assert not headers.cookie_touched
+    actual = headers.cookie[b'foo'].value
+    assert actual == b'bar'
+    assert headers.cookie_touched
+
 def test_headers_dont_unicodify_cookie():
     headers = BaseHeaders(b"Cookie: somecookiedata")
     expected = b"somecookiedata"
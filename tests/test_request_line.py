@@ -413,6 +413,22 @@ def test_path_params_api():
     assert request.line.uri.path.parts[0].params == params[0]
     assert request.line.uri.path.parts[1].params == params[1]
 
+def test_path_parts_are_cached():
+    a, b = Path(b"/foo/bar.html"), Path(b"/foo/bar.html")
+    assert a.parts is not b.parts
+    assert a.parts[0] is b.parts[0]
+
+def test_path_parts_without_params_have_empty_params():
+    path = Path(b"/foo/b%C3%A4r/")
+    assert path.parts == [u'foo', u'b\xe4r', u'']
+    assert [part.params for part in path.parts] == [{}, {}, {}]
+
+def test_path_cache_is_bounded():
+    from aspen.http import request
+    for i in range(request.PATH_CACHE_SIZE + 10):
+        Path(b"/%d" % i)
+    assert len(request.__path_cache__) <= request.PATH_CACHE_SIZE
+
 
 # Querystring
 # ===========
@@ -453,4 +469,22 @@ def test_querystring_unquotes_plus():
     assert querystring.decoded == u"baz= +", querystring.decoded
     assert querystring['baz'] == " +"
 
+def test_querystring_splits_on_semicolons_too():
+    querystring = Querystring(b"baz=buz;baz=bloo&foo")
+    assert querystring == {'baz': [u'buz', u'bloo'], 'foo': [u'']}, querystring
+
+def test_querystring_decodes_values_for_dict():
+    querystring = Querystring(b"baz=%e2%98%84&foo=b+r&foo=%41")
+    expected = {'baz': [u"\u2604"], 'foo': [u"b r", u"A"]}
+    assert dict(querystring) == expected
+    assert dict(querystring.iteritems()) == expected
+    assert querystring.setdefault('baz', None) == [u"\u2604"]
+
+def test_querystring_chokes_on_bad_unicode_between_good_values():
+    raises(UnicodeDecodeError, Querystring, b"foo=bar&baz=%e2%98&buz=%e2%98%84")
+
+def test_querystring_get_decodes():
+    querystring = Querystring(b"baz=%e2%98%84")
+    assert querystring.get('baz') == u"\u2604"
+    assert querystring.get('missing', 'default') == 'default'
 
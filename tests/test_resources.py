@@ -7,7 +7,10 @@ from textwrap import dedent
 from pytest import raises
 
 from aspen import Response
+from aspen.http.request import Request
 from aspen.testing import check, handle
+from aspen.testing.fsfix import FSFIX, mk
+from aspen.website import Website
 from aspen.resources.pagination import split
 
 
@@ -173,6 +176,69 @@ def test_templating_without_script_works():
     assert actual == expected
 
 
+# HEAD
+
+def head(content, filename='index.html', argv=(), methods=(b'HEAD',)):
+    mk((filename, content))     # index so we can HEAD /
+    website = Website(['--www_root', FSFIX] + list(argv))
+    responses = []
+    for method in methods:
+        request = Request(method, b'/', headers=b'Host: localhost\r\n'
+                                                b'Accept-Encoding: gzip')
+        request.website = website
+        responses.append(website.handle_safely(request))
+    return responses[0] if len(responses) == 1 else responses
+
+def test_head_for_static_resource_has_no_body():
+    response = head("Greetings, program!")
+    assert response.code == 200
+    assert response.body == b''
+
+def test_head_for_static_resource_has_content_length():
+    response = head("Greetings, program!")
+    assert response.headers['Content-Length'] == b'19'
+    assert response.headers['Content-Type'] == b'text/html'
+
+def test_head_for_dynamic_resource_renders_by_default():
+    response = head("[---]\nGreetings, program!", 'index.html.spt')
+    assert response.body == b''
+    assert response.headers['Content-Length'] == b'19'
+
+def test_head_has_the_same_headers_as_get_with_compression():
+    get, response = head( "Greetings, program! " * 100
+                        , argv=['--compression=yes']
+                        , methods=(b'GET', b'HEAD')
+                         )
+    assert response.body == b''
+    assert response.headers['Content-Encoding'] == b'gzip'
+    assert response.headers['Vary'] == b'Accept-Encoding'
+    assert response.headers['Content-Length'] == \
+                                            str(len(get.body)).encode('ascii')
+
+def test_head_gives_non_ascii_unicode_bodies_a_length_in_their_charset():
+    response = head("comet = u'\\u2604'\n[---]\n[---] text/plain\n%(comet)s",
+                    'index.spt')
+    assert response.body == b''
+    assert response.headers['Content-Length'] == b'3'
+
+def test_head_for_dynamic_resource_can_skip_rendering():
+    response = head( "skip_rendering_for_head = True\n[---]\n"
+                     "response.headers['X-Foo'] = 'bar'\n[---]\n"
+                     "%(heck)s"
+                   , 'index.html.spt'
+                    )
+    assert response.code == 200
+    assert response.body == b''
+    assert response.headers['X-Foo'] == b'bar'
+    assert response.headers['Content-Type'] == b'text/html; charset=UTF-8'
+
+def test_skip_rendering_for_head_doesnt_affect_get():
+    actual = check( "skip_rendering_for_head = True\n[---]\n[---]\n"
+                    "Greetings, program!"
+                   )
+    assert actual == "Greetings, program!"
+
+
 # Test offset calculation
 
 def check_offsets(raw, offsets):
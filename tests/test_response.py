@@ -45,6 +45,15 @@ def test_response_body_as_iterable_comes_through_untouched():
     actual = list(response({}, start_response).body)
     assert actual == expected
 
+def test_response_closes_its_body_when_the_server_closes_the_iterable():
+    closed = []
+    class Body(list):
+        def close(self):
+            closed.append(True)
+    response = Response(body=Body([b"Greetings, program!"]))
+    response({}, lambda status, headers: None).close()
+    assert closed == [True]
+
 def test_response_body_can_be_unicode():
     try:
         Response(body=u'Greetings, program!')
@@ -57,5 +66,63 @@ def test_response_headers_protect_against_crlf_injection():
         response.headers['Location'] = 'foo\r\nbar'
     raises(CRLFInjection, inject)
 
+def test_response_cookie_is_not_parsed_until_accessed():
+    response = Response()
+    assert not response.headers.cookie_touched
+
+def test_response_without_cookie_sets_no_set_cookie_header():
+    response = Response()
+    def start_response(status, headers):
+        assert 'Set-Cookie' not in [k for k, v in headers]
+    response({}, start_response)
+
+def test_response_with_cookie_sets_set_cookie_header():
+    response = Response()
+    response.headers.cookie[str('foo')] = str('bar')
+    actual = []
+    def start_response(status, headers):
+        actual.extend(v for k, v in headers if k == 'Set-Cookie')
+    response({}, start_response)
+    assert actual == ['foo=bar']
+
+def test_response_headers_are_stored_as_bytestrings():
+    response = Response()
+    response.headers['Content-Type'] = u'text/plain'
+    headers = dict(response.headers.items())
+    assert headers == {b'Content-Type': [b'text/plain']}
+    assert all(type(k) is str for k in headers)
+    assert all(type(v) is str for v in headers[b'Content-Type'])
+
+def test_response_headers_must_be_ascii_when_set():
+    response = Response()
+    def set_it():
+        response.headers['Location'] = u'/caf\xe9'
+    raises(ValueError, set_it)
+
+def test_response_headers_add_protects_against_crlf_injection():
+    response = Response()
+    def inject():
+        response.headers.add('Location', 'foo\r\nbar')
+    raises(CRLFInjection, inject)
+
+def test_response_string_body_is_not_wrapped_in_a_generator():
+    response = Response(body=b"Greetings, program!")
+    actual = response({}, lambda status, headers: None).body
+    assert actual == [b"Greetings, program!"]
+
+
+
 
+def test_response_to_wire_gives_status_headers_and_body():
+    response = Response(200, b"Greetings, program!", {'Content-Type': 'text/plain'})
+    response.headers.cookie[str('foo')] = str('bar')
+    status, headers, body = response.to_wire()
+    assert status == b"200 OK"
+    assert (b'Content-Type', b'text/plain') in headers
+    assert (b'Set-Cookie', b'foo=bar') in headers
+    assert body == [b"Greetings, program!"]
 
+def test_response_to_wire_encodes_unicode_chunks():
+    response = Response(body=iter([u"Greetings, ", b"program!"]))
+    status, headers, body = response.to_wire()
+    assert list(body) == [b"Greetings, ", b"program!"]
@@ -0,0 +1,71 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import sys
+import time
+from StringIO import StringIO
+
+import aspen.logging
+from aspen.testing import StubRequest, handle
+from aspen.watchdog import Watchdog
+
+
+def capture_check(watchdog):
+    __threshold__ = aspen.logging.LOGGING_THRESHOLD
+    try:
+        aspen.logging.LOGGING_THRESHOLD = 0
+        aspen.logging.flush()
+        sys.stdout = StringIO()
+        watchdog.check()
+        aspen.logging.flush()
+        output = sys.stdout.getvalue()
+    finally:
+        aspen.logging.LOGGING_THRESHOLD = __threshold__
+        sys.stdout = sys.__stdout__
+    return output
+
+
+def test_watchdog_tracks_inflight_requests():
+    watchdog = Watchdog(60, interval=60)
+    key = watchdog.enter(StubRequest(b'/foo'))
+    assert key in watchdog.inflight
+    watchdog.exit(key)
+    assert watchdog.inflight == {}
+
+def test_watchdog_ignores_fast_requests():
+    watchdog = Watchdog(60, interval=60)
+    watchdog.enter(StubRequest(b'/foo'))
+    assert capture_check(watchdog) == b''
+
+def test_watchdog_logs_stack_of_slow_requests():
+    watchdog = Watchdog(0.001, interval=60)
+    watchdog.enter(StubRequest(b'/foo'))
+    time.sleep(0.01)
+    output = capture_check(watchdog)
+    assert b'Slow request: GET /foo HTTP/1.1' in output
+    assert b'in capture_check' in output    # the stack of the request thread
+
+def test_watchdog_logs_at_most_once_per_threshold():
+    watchdog = Watchdog(0.05, interval=60)
+    watchdog.enter(StubRequest(b'/foo'))
+    time.sleep(0.06)
+    assert capture_check(watchdog) != b''
+    assert capture_check(watchdog) == b''
+
+def test_website_has_no_watchdog_by_default(mk):
+    mk(('index.html', "Greetings, program!"))
+    assert handle().request.website.watchdog is None
+
+def test_website_tracks_requests_with_watchdog(mk):
+    mk(('index.html', "Greetings, program!"))
+    website = handle('/', '--slow_request_threshold=60').request.website
+    seen = []
+    website.hooks.inbound_early.append(
+                        lambda request: seen.append(len(website.watchdog.inflight)))
+    request = StubRequest(b'/')
+    request.website = website
+    website.handle_safely(request)
+    assert seen == [1]
+    assert website.watchdog.inflight == {}
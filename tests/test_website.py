@@ -5,7 +5,10 @@ from __future__ import unicode_literals
 
 import os
 import StringIO
+import sys
 
+import aspen.logging
+from aspen import Response
 from aspen.testing import handle, StubRequest
 from aspen.testing.fsfix import FSFIX
 from aspen.website import Website
@@ -159,3 +162,66 @@ def test_call_wraps_wsgi_middleware():
 
 
 
+
+
+# Access logging
+
+def log_access(response, *argv):
+    """Return the records that website.log_access buffers for response.
+    """
+    website = Website(list(argv))
+    __threshold__ = aspen.logging.LOGGING_THRESHOLD
+    try:
+        aspen.logging.LOGGING_THRESHOLD = 0
+        response.request = StubRequest(b'/foo')
+        website.log_access(response)
+    finally:
+        aspen.logging.LOGGING_THRESHOLD = __threshold__
+    records = [item[1] for item in website.access_log.buffer
+                       if isinstance(item, tuple)]
+    website.access_log.buffer.clear()
+    return records
+
+def test_log_access_buffers_a_record():
+    ident, name, response, path, fs, whence = log_access(Response(200))[0]
+    assert (name, response, path, whence) == \
+                                        ('MainThread', '200 OK', '/foo', None)
+
+def test_log_access_formats_a_line():
+    record = log_access(Response(200))[0]
+    line = Website([]).format_access(record)
+    assert line.endswith(b'200 OK                               /foo                     ...')
+
+def test_log_access_formats_lines_the_same_as_aspen_log():
+    record = log_access(Response(200))[0]
+    line = Website([]).format_access(record)
+    __threshold__ = aspen.logging.LOGGING_THRESHOLD
+    aspen.logging.flush()
+    sys.stdout = StringIO.StringIO()
+    try:
+        aspen.logging.LOGGING_THRESHOLD = 0
+        aspen.log("%-36s %s" % ('200 OK', '/foo                     ...'))
+        aspen.logging.flush()
+        expected = sys.stdout.getvalue()
+    finally:
+        aspen.logging.LOGGING_THRESHOLD = __threshold__
+        sys.stdout = sys.__stdout__
+    assert line + b'\n' == expected
+
+def test_websites_share_one_log_writer():
+    assert Website([]).access_log is Website([]).access_log is \
+                                                        aspen.logging.WRITER
+
+def test_log_access_samples_non_errors():
+    assert log_access(Response(200), '--access_log_sample=0') == []
+
+def test_log_access_doesnt_sample_errors():
+    assert len(log_access(Response(500), '--access_log_sample=0')) == 1
+
+def test_log_access_finds_whence_raised_for_errors():
+    try:
+        raise Response(404)
+    except Response, response:
+        records = log_access(response)
+    whence = records[0][-1]
+    assert whence[0].endswith('test_website.py')